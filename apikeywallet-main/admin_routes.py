@@ -0,0 +1,121 @@
+"""
+admin_routes.py - Administrative and operational routes
+
+Contains admin-only endpoints for inspecting the running application,
+such as live database pool and password hasher statistics, and for
+whole-instance backups.
+
+Dependencies:
+- Flask
+- Flask-Login
+- db_pool.py
+- password_hashing.py
+- logging_setup.py
+- backup.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+from datetime import datetime
+from functools import wraps
+
+# ================================
+# Third-party imports
+# ================================
+from flask import Blueprint, Response, current_app, jsonify, stream_with_context
+from flask_login import login_required, current_user
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from db_pool import pool_stats
+from password_hashing import get_hasher
+from logging_setup import logging_stats
+from backup import iter_backup
+
+# ================================
+# Blueprint setup
+# ================================
+admin = Blueprint('admin', __name__, url_prefix='/admin')
+
+# ================================
+# Helpers
+# ================================
+def admin_required(view):
+    """
+    Restrict a view to admin users.
+
+    Args:
+        view (callable): View function
+
+    Returns:
+        callable: Wrapped view returning 403 for non-admins
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required.'}), 403
+        return view(*args, **kwargs)
+    return wrapped
+
+# ================================
+# Routes
+# ================================
+@admin.route('/pool_stats')
+@login_required
+@admin_required
+def get_pool_stats():
+    """
+    Return live statistics for the shared database connection pool.
+
+    Returns:
+        JSON response with pool sizing, checked-out/overflow counts and wait times
+    """
+    return jsonify(pool_stats(db.engine)), 200
+
+@admin.route('/hasher_stats')
+@login_required
+@admin_required
+def get_hasher_stats():
+    """
+    Return load and rejection counters for the password hashing pool.
+
+    Returns:
+        JSON response with hasher configuration, in-flight hashes and totals
+    """
+    return jsonify(get_hasher().stats()), 200
+
+@admin.route('/logging_stats')
+@login_required
+@admin_required
+def get_logging_stats():
+    """
+    Return the logging pipeline's queue depth and dropped-record count.
+
+    Returns:
+        JSON response with queued and dropped record counts
+    """
+    return jsonify(logging_stats()), 200
+
+@admin.route('/backup')
+@login_required
+@admin_required
+def backup_instance():
+    """
+    Stream an encrypted backup archive of every user, category and key.
+
+    Returns:
+        Streaming tar response
+    """
+    generator = iter_backup(None, current_app.config['BACKUP_CHUNK_ROWS'])
+    filename = f"keyguardian-instance-backup-{datetime.utcnow():%Y%m%dT%H%M%SZ}.tar"
+    return Response(
+        stream_with_context(generator),
+        mimetype='application/x-tar',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
@@ -0,0 +1,674 @@
+"""
+api_routes.py - Versioned JSON API
+
+Contains the /api/v1 endpoints for scripts and other clients: key and
+category metadata, CRUD operations, delta sync, explicit decryption and
+personal access token management. Key values are never included in listings. Requests
+authenticated with an access token (see tokens.py) only see the
+categories the token is scoped to.
+
+Read endpoints are conditional. Each response carries a strong ETag
+derived from the user's data version (see versioning.py) and the request
+URL. A request whose If-None-Match matches is answered with 304 after a
+single scalar query, without loading any key or category rows.
+
+Dependencies:
+- Flask
+- Flask-Login
+- SQLAlchemy
+- models.py
+- encryption_service.py
+- queries.py
+- tokens.py
+- versioning.py
+- revisions.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import hashlib
+from functools import wraps
+
+# ================================
+# Third-party imports
+# ================================
+from flask import Blueprint, Response, jsonify, request, current_app
+from flask_login import current_user
+from itsdangerous import BadSignature
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from models import APIKey, Category, AccessToken
+from encryption_service import encrypt_for_user, reveal
+from queries import UNCATEGORIZED, keys_page, cursor_serializer
+from tokens import SCOPES, allowed_category_ids, category_allowed, create_token, revoke_token
+from versioning import bump_data_version, get_data_version
+from revisions import changes_since, record_deletions
+
+# ================================
+# Blueprint setup
+# ================================
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# ================================
+# Helpers
+# ================================
+def api_login_required(view):
+    """
+    Require an authenticated user, answering 401 JSON instead of redirecting.
+
+    Args:
+        view (callable): View function
+
+    Returns:
+        callable: Wrapped view
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Authentication required.'}), 401
+        return view(*args, **kwargs)
+    return wrapped
+
+def _etag(user_id, data_version):
+    """
+    Build the strong ETag for the current request URL at a data version.
+
+    Args:
+        user_id (int): Owner's user ID
+        data_version (int): User's data version
+
+    Returns:
+        str: Unquoted entity tag
+    """
+    query = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    allowed = allowed_category_ids()
+    scope = '*' if allowed is None else ','.join(str(c) for c in sorted(allowed))
+    source = f'v1:{user_id}:{data_version}:{scope}:{request.path}?{query}'
+    return hashlib.sha256(source.encode()).hexdigest()[:32]
+
+def conditional_json(build):
+    """
+    Answer a read request with 304 if unchanged, otherwise with fresh JSON.
+
+    The data version is read before the rows, so a concurrent change can
+    only make the body newer than its ETag. The next poll then sees a
+    different ETag and refetches; a stale body is never tagged as current.
+
+    Args:
+        build (callable): Returns `(payload, status)` when the body is needed
+
+    Returns:
+        Response: 304 or JSON response with ETag and Cache-Control set
+    """
+    data_version = get_data_version(current_user.id)
+    etag = _etag(current_user.id, data_version)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        payload, status = build()
+        response = jsonify(payload)
+        response.status_code = status
+        if status != 200:
+            return response
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.update(('Cookie', 'Authorization'))
+    return response
+
+def _key_json(row, category_name=None):
+    """
+    Serialize API key metadata.
+
+    Args:
+        row: APIKey instance or row with id, key_name, category_id and date_added
+        category_name (str, optional): Name of the key's category
+
+    Returns:
+        dict: Key metadata without its value
+    """
+    return {
+        'id': row.id,
+        'key_name': row.key_name,
+        'category_id': row.category_id,
+        'category_name': category_name or UNCATEGORIZED,
+        'date_added': row.date_added.isoformat() if row.date_added else None,
+    }
+
+def _owned_category(category_id):
+    """
+    Return the current user's category with the given ID, or None.
+    """
+    return db.session.execute(
+        select(Category).where(Category.id == category_id, Category.user_id == current_user.id)
+    ).scalar()
+
+def _validate_category_id(value):
+    """
+    Validate an optional category_id field from a JSON body.
+
+    Only 0 or null mean uncategorized. JSON true/false arrive as Python
+    bools, which are ints, so they are rejected explicitly.
+
+    Returns:
+        tuple: (category ID or None, error message or None)
+    """
+    if value is not None and type(value) is not int:
+        return None, 'category_id must be an integer, or 0 or null for uncategorized.'
+    return value or None, None
+
+def _validate_name(value, max_length, field):
+    """
+    Validate a required name field from a JSON body.
+
+    Returns:
+        tuple: (stripped name or None, error message or None)
+    """
+    if not isinstance(value, str) or not value.strip():
+        return None, f'{field} is required.'
+    value = value.strip()
+    if len(value) > max_length:
+        return None, f'{field} must be at most {max_length} characters.'
+    return value, None
+
+# ================================
+# Key routes
+# ================================
+@api.route('/keys')
+@api_login_required
+def list_keys():
+    """
+    List key metadata, one keyset-paginated page at a time.
+
+    Query parameters:
+        limit (int, optional): Page size, capped at KEYS_PAGE_SIZE_MAX
+        category_id (int, optional): Filter by category; 0 selects uncategorized keys
+        cursor (str, optional): Opaque `next_cursor` from the previous page
+
+    Returns:
+        JSON response with keys and the cursor for the next page, or 304
+    """
+    limit = request.args.get('limit', current_app.config['KEYS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['KEYS_PAGE_SIZE_MAX']))
+    category_id = request.args.get('category_id', type=int)
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after = tuple(cursor_serializer().loads(cursor))
+        except (BadSignature, TypeError, ValueError):
+            return jsonify({'error': 'Invalid cursor.'}), 400
+    if category_id is not None and not category_allowed(category_id):
+        return jsonify({'error': 'Category not found.'}), 404
+
+    def build():
+        rows, last = keys_page(current_user.id, limit, after=after, category_id=category_id,
+                               category_ids=allowed_category_ids())
+        return {
+            'keys': [_key_json(row, row.category_name) for row in rows],
+            'next_cursor': cursor_serializer().dumps(list(last)) if last else None,
+        }, 200
+
+    try:
+        return conditional_json(build)
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error in api list_keys: {str(e)}")
+        return jsonify({'error': 'An error occurred while fetching keys.'}), 500
+
+@api.route('/keys/<int:key_id>')
+@api_login_required
+def get_key(key_id):
+    """
+    Return one key's metadata.
+
+    Args:
+        key_id (int): API key ID
+
+    Returns:
+        JSON response with key metadata, 304, or 404
+    """
+    def build():
+        row = db.session.execute(
+            select(APIKey.id, APIKey.key_name, APIKey.category_id, APIKey.date_added, Category.name.label('category_name'))
+            .outerjoin(Category, Category.id == APIKey.category_id)
+            .where(APIKey.id == key_id, APIKey.user_id == current_user.id)
+        ).first()
+        if row is None or not category_allowed(row.category_id):
+            return {'error': 'API key not found.'}, 404
+        return _key_json(row, row.category_name), 200
+
+    try:
+        return conditional_json(build)
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error in api get_key: {str(e)}")
+        return jsonify({'error': 'An error occurred while fetching the key.'}), 500
+
+@api.route('/keys', methods=['POST'])
+@api_login_required
+def create_key():
+    """
+    Create a key.
+
+    Expects JSON: {"key_name": "...", "value": "...", "category_id": 1 (optional)}
+
+    Returns:
+        JSON response with the new key's metadata (201) or an error
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    key_name, error = _validate_name(data.get('key_name'), 120, 'key_name')
+    if error:
+        return jsonify({'error': error}), 400
+    value = data.get('value')
+    if not isinstance(value, str) or not value:
+        return jsonify({'error': 'value is required.'}), 400
+    category_id, error = _validate_category_id(data.get('category_id'))
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        category = None
+        if category_id is not None:
+            category = _owned_category(category_id)
+            if category is None:
+                return jsonify({'error': 'Category not found.'}), 404
+        api_key = APIKey(user_id=current_user.id, key_name=key_name,
+                         ciphertext=encrypt_for_user(current_user.id, value), category_id=category_id)
+        db.session.add(api_key)
+        bump_data_version(current_user.id)
+        db.session.commit()
+        return jsonify(_key_json(api_key, category.name if category else None)), 201
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error in api create_key: {str(e)}")
+        return jsonify({'error': 'An error occurred while creating the key.'}), 500
+
+@api.route('/keys/<int:key_id>', methods=['PUT', 'PATCH'])
+@api_login_required
+def update_key(key_id):
+    """
+    Rename a key and/or move it to another category.
+
+    Expects JSON with `key_name` and/or `category_id` (0 or null for uncategorized).
+
+    Args:
+        key_id (int): API key ID
+
+    Returns:
+        JSON response with the updated metadata or an error
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    try:
+        api_key = db.session.execute(
+            select(APIKey).where(APIKey.id == key_id, APIKey.user_id == current_user.id)
+        ).scalar()
+        if api_key is None:
+            return jsonify({'error': 'API key not found.'}), 404
+        if 'key_name' in data:
+            key_name, error = _validate_name(data['key_name'], 120, 'key_name')
+            if error:
+                return jsonify({'error': error}), 400
+            api_key.key_name = key_name
+        if 'category_id' in data:
+            category_id, error = _validate_category_id(data['category_id'])
+            if error:
+                return jsonify({'error': error}), 400
+            if category_id is not None and _owned_category(category_id) is None:
+                return jsonify({'error': 'Category not found.'}), 404
+            api_key.category_id = category_id
+        bump_data_version(current_user.id)
+        db.session.commit()
+        category = _owned_category(api_key.category_id) if api_key.category_id else None
+        return jsonify(_key_json(api_key, category.name if category else None)), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error in api update_key: {str(e)}")
+        return jsonify({'error': 'An error occurred while updating the key.'}), 500
+
+@api.route('/keys/<int:key_id>', methods=['DELETE'])
+@api_login_required
+def delete_key(key_id):
+    """
+    Delete a key.
+
+    Args:
+        key_id (int): API key ID
+
+    Returns:
+        JSON response indicating success or 404
+    """
+    try:
+        deleted = db.session.execute(
+            delete(APIKey).where(APIKey.id == key_id, APIKey.user_id == current_user.id)
+        ).rowcount
+        if not deleted:
+            db.session.rollback()
+            return jsonify({'error': 'API key not found.'}), 404
+        record_deletions(current_user.id, 'key', [key_id])
+        bump_data_version(current_user.id)
+        db.session.commit()
+        return jsonify({'success': True}), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error in api delete_key: {str(e)}")
+        return jsonify({'error': 'An error occurred while deleting the key.'}), 500
+
+@api.route('/keys/decrypt/<int:key_id>', methods=['POST'])
+@api_login_required
+def decrypt_key(key_id):
+    """
+    Decrypt and return one key's value.
+
+    Args:
+        key_id (int): API key ID
+
+    Returns:
+        JSON response with the decrypted key or an error
+    """
+    try:
+        api_key = db.session.execute(
+            select(APIKey).where(APIKey.id == key_id, APIKey.user_id == current_user.id)
+        ).scalar()
+        if api_key is None or not category_allowed(api_key.category_id):
+            return jsonify({'error': 'API key not found.'}), 404
+        response = jsonify({'key': reveal(api_key)})
+        response.headers['Cache-Control'] = 'no-store'
+        return response, 200
+    except Exception as e:
+        current_app.logger.error(f"Error in api decrypt_key: {str(e)}")
+        return jsonify({'error': 'An error occurred while decrypting the key.'}), 500
+
+# ================================
+# Category routes
+# ================================
+@api.route('/categories')
+@api_login_required
+def list_categories():
+    """
+    List categories with the number of keys in each.
+
+    Returns:
+        JSON response with categories, or 304
+    """
+    def build():
+        statement = (
+            select(Category.id, Category.name, func.count(APIKey.id).label('key_count'))
+            .outerjoin(APIKey, APIKey.category_id == Category.id)
+            .where(Category.user_id == current_user.id)
+            .group_by(Category.id, Category.name)
+            .order_by(Category.name, Category.id)
+        )
+        allowed = allowed_category_ids()
+        if allowed is not None:
+            statement = statement.where(Category.id.in_([c for c in allowed if c]))
+        rows = db.session.execute(statement).all()
+        return {'categories': [{'id': row.id, 'name': row.name, 'key_count': row.key_count} for row in rows]}, 200
+
+    try:
+        return conditional_json(build)
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error in api list_categories: {str(e)}")
+        return jsonify({'error': 'An error occurred while fetching categories.'}), 500
+
+@api.route('/categories/<int:category_id>')
+@api_login_required
+def get_category(category_id):
+    """
+    Return one category with its keys' metadata.
+
+    Args:
+        category_id (int): Category ID
+
+    Returns:
+        JSON response with the category and its keys, 304, or 404
+    """
+    def build():
+        category = _owned_category(category_id) if category_allowed(category_id) else None
+        if category is None:
+            return {'error': 'Category not found.'}, 404
+        keys = db.session.execute(
+            select(APIKey.id, APIKey.key_name, APIKey.category_id, APIKey.date_added)
+            .where(APIKey.user_id == current_user.id, APIKey.category_id == category_id)
+            .order_by(func.lower(APIKey.key_name), APIKey.id)
+        ).all()
+        return {'id': category.id, 'name': category.name,
+                'keys': [_key_json(row, category.name) for row in keys]}, 200
+
+    try:
+        return conditional_json(build)
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error in api get_category: {str(e)}")
+        return jsonify({'error': 'An error occurred while fetching the category.'}), 500
+
+@api.route('/categories', methods=['POST'])
+@api_login_required
+def create_category():
+    """
+    Create a category.
+
+    Expects JSON: {"name": "..."}
+
+    Returns:
+        JSON response with the new category (201) or an error
+    """
+    name, error = _validate_name((request.get_json(silent=True) or {}).get('name'), 50, 'name')
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        category = Category(name=name, user_id=current_user.id)
+        db.session.add(category)
+        bump_data_version(current_user.id)
+        db.session.commit()
+        return jsonify({'id': category.id, 'name': category.name}), 201
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error in api create_category: {str(e)}")
+        return jsonify({'error': 'An error occurred while creating the category.'}), 500
+
+@api.route('/categories/<int:category_id>', methods=['PUT', 'PATCH'])
+@api_login_required
+def update_category(category_id):
+    """
+    Rename a category.
+
+    Expects JSON: {"name": "..."}
+
+    Args:
+        category_id (int): Category ID
+
+    Returns:
+        JSON response with the updated category or an error
+    """
+    name, error = _validate_name((request.get_json(silent=True) or {}).get('name'), 50, 'name')
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        category = _owned_category(category_id)
+        if category is None:
+            return jsonify({'error': 'Category not found.'}), 404
+        category.name = name
+        bump_data_version(current_user.id)
+        db.session.commit()
+        return jsonify({'id': category.id, 'name': category.name}), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error in api update_category: {str(e)}")
+        return jsonify({'error': 'An error occurred while updating the category.'}), 500
+
+@api.route('/categories/<int:category_id>', methods=['DELETE'])
+@api_login_required
+def delete_category(category_id):
+    """
+    Delete a category; its keys become uncategorized.
+
+    Args:
+        category_id (int): Category ID
+
+    Returns:
+        JSON response indicating success or 404
+    """
+    try:
+        category = _owned_category(category_id)
+        if category is None:
+            return jsonify({'error': 'Category not found.'}), 404
+        db.session.execute(
+            update(APIKey)
+            .where(APIKey.user_id == current_user.id, APIKey.category_id == category_id)
+            .values(category_id=None, revision=None)
+        )
+        db.session.delete(category)
+        bump_data_version(current_user.id)
+        db.session.commit()
+        return jsonify({'success': True}), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error in api delete_category: {str(e)}")
+        return jsonify({'error': 'An error occurred while deleting the category.'}), 500
+
+# ================================
+# Sync routes
+# ================================
+@api.route('/changes')
+@api_login_required
+def changes():
+    """
+    Return the keys and categories created, updated or deleted since a revision.
+
+    Clients store the returned `revision` and pass it as `since` next time.
+    Requests authenticated with a category-scoped access token always get
+    a full snapshot of the categories they can see.
+
+    Query parameters:
+        since (int, optional): Revision of the previous sync; omit for a full snapshot
+
+    Returns:
+        JSON response with the current revision, changed rows and deleted IDs, or 304
+    """
+    since = request.args.get('since', '0')
+    if not since.isdigit():
+        return jsonify({'error': 'since must be a non-negative integer.'}), 400
+    since = int(since)
+
+    def build():
+        return changes_since(current_user.id, since, category_ids=allowed_category_ids()), 200
+
+    try:
+        return conditional_json(build)
+    except SQLAlchemyError as e:
+        current_app.logger.error(f"Database error in api changes: {str(e)}")
+        return jsonify({'error': 'An error occurred while fetching changes.'}), 500
+
+# ================================
+# Access token routes
+# ================================
+def _token_json(token):
+    """
+    Serialize access token metadata (never the token itself).
+    """
+    return {
+        'id': token.id,
+        'name': token.name,
+        'prefix': token.prefix,
+        'scopes': token.scopes.split(),
+        'category_ids': [int(c) for c in token.category_ids.split(',') if c] if token.category_ids is not None else None,
+        'created_at': token.created_at.isoformat() if token.created_at else None,
+        'expires_at': token.expires_at.isoformat() if token.expires_at else None,
+        'revoked_at': token.revoked_at.isoformat() if token.revoked_at else None,
+    }
+
+@api.route('/tokens')
+@api_login_required
+def list_tokens():
+    """
+    List the user's access tokens.
+
+    Returns:
+        JSON response with token metadata
+    """
+    tokens = db.session.execute(
+        select(AccessToken).where(AccessToken.user_id == current_user.id).order_by(AccessToken.id)
+    ).scalars().all()
+    return jsonify({'tokens': [_token_json(token) for token in tokens]}), 200
+
+@api.route('/tokens', methods=['POST'])
+@api_login_required
+def create_access_token():
+    """
+    Create an access token. The plaintext token is only returned here.
+
+    Expects JSON: {"name": "...", "scopes": [...] (optional), "category_ids": [...] (optional),
+    "expires_in_days": 90 (optional)}
+
+    Returns:
+        JSON response with the token metadata and plaintext token (201) or an error
+    """
+    data = request.get_json(silent=True) or {}
+    name, error = _validate_name(data.get('name'), 100, 'name')
+    if error:
+        return jsonify({'error': error}), 400
+    scopes = data.get('scopes') or list(SCOPES)
+    if not isinstance(scopes, list) or not set(scopes) <= set(SCOPES):
+        return jsonify({'error': f"scopes must be a list drawn from: {', '.join(SCOPES)}."}), 400
+    category_ids = data.get('category_ids')
+    if category_ids is not None and (not isinstance(category_ids, list) or not all(isinstance(c, int) for c in category_ids)):
+        return jsonify({'error': 'category_ids must be a list of integers.'}), 400
+    expires_in_days = data.get('expires_in_days')
+    if expires_in_days is not None and (not isinstance(expires_in_days, int) or expires_in_days < 1):
+        return jsonify({'error': 'expires_in_days must be a positive integer.'}), 400
+
+    try:
+        if category_ids:
+            owned = set(db.session.execute(
+                select(Category.id).where(Category.user_id == current_user.id, Category.id.in_(category_ids))
+            ).scalars())
+            missing = [c for c in category_ids if c and c not in owned]
+            if missing:
+                return jsonify({'error': f'Categories not found: {missing}'}), 404
+        token, plaintext = create_token(current_user.id, name, scopes, category_ids, expires_in_days)
+        db.session.commit()
+        payload = _token_json(token)
+        payload['token'] = plaintext
+        response = jsonify(payload)
+        response.headers['Cache-Control'] = 'no-store'
+        return response, 201
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error in api create_access_token: {str(e)}")
+        return jsonify({'error': 'An error occurred while creating the token.'}), 500
+
+@api.route('/tokens/<int:token_id>', methods=['DELETE'])
+@api_login_required
+def revoke_access_token(token_id):
+    """
+    Revoke an access token.
+
+    Args:
+        token_id (int): Token ID
+
+    Returns:
+        JSON response indicating success or 404
+    """
+    try:
+        token = db.session.execute(
+            select(AccessToken).where(AccessToken.id == token_id, AccessToken.user_id == current_user.id)
+        ).scalar()
+        if token is None:
+            return jsonify({'error': 'Token not found.'}), 404
+        revoke_token(token)
+        db.session.commit()
+        return jsonify({'success': True}), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f"Database error in api revoke_access_token: {str(e)}")
+        return jsonify({'error': 'An error occurred while revoking the token.'}), 500
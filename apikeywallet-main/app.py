@@ -1,16 +1,20 @@
 """
 app.py - Flask application factory and setup
 
-This file initializes the Flask app, configures extensions, sets up the database,
-login manager, and registers blueprints.
+This file defines the shared extensions (db, login_manager) and the
+create_app factory, which configures the app, the database and login
+manager, and registers blueprints and CLI commands.
 
 Dependencies:
 - Flask
 - Flask-SQLAlchemy
 - Flask-Login
-- Flask-Migrate
+- Flask-Migrate (CLI only)
 - SQLAlchemy
+- click
 - python-dotenv
+- config.py
+- logging_setup.py
 
 @author KeyGuardian Team
 """
@@ -18,56 +22,36 @@ Dependencies:
 # ================================
 # Standard library imports
 # ================================
-import os
 import logging
 from urllib.parse import urlparse
 
 # ================================
 # Third-party imports
 # ================================
+import click
 from flask import Flask, g
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
-from flask_migrate import Migrate
 from dotenv import load_dotenv
 
 # ================================
-# Environment setup
+# Project imports
 # ================================
-load_dotenv()
+from config import config_from_env
+from db_pool import build_engine_options, warm_up_pool
+from instrumentation import init_instrumentation
+from logging_setup import init_logging
+from password_hashing import init_password_hashing
 
-# ================================
-# Logging configuration
-# ================================
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # ================================
 # Initialize extensions
 # ================================
 db = SQLAlchemy()
-migrate = None
 login_manager = LoginManager()
-
-# ================================
-# Flask app factory
-# ================================
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(24))
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get("DATABASE_URL")
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ECHO'] = True  # Enable SQLAlchemy echo mode for debugging
-
-parsed_url = urlparse(app.config['SQLALCHEMY_DATABASE_URI'])
-logger.info(f"Database URL: {parsed_url.scheme}://{parsed_url.hostname}:{parsed_url.port}{parsed_url.path}")
-
-db.init_app(app)
-migrate = Migrate(app, db)
-
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login'
 login_manager.login_message = 'Please log in to access this page.'
 
@@ -79,77 +63,196 @@ def load_user(user_id):
     """
     Load a user by ID for Flask-Login session management.
 
+    Returns a cached UserSnapshot (id, email, is_admin) rather than an ORM
+    instance, so authenticated requests usually skip the user query.
+
     Args:
         user_id (int): User ID
 
     Returns:
-        User instance or None
+        UserSnapshot or None
     """
-    from models import User
-    return User.query.get(int(user_id))
+    from user_cache import load_user_snapshot
+    return load_user_snapshot(int(user_id))
 
 # ================================
 # Database session management
 # ================================
 def get_db_session():
     """
-    Create a new scoped SQLAlchemy session.
+    Return the scoped SQLAlchemy session bound to the shared engine.
+
+    This is the same session as `db.session`, so `g.db` and the models share
+    one connection pool instead of building an engine per request.
 
     Returns:
         scoped_session: SQLAlchemy session
     """
-    engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'], pool_pre_ping=True, pool_recycle=3600)
-    db_session = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
-    return db_session
+    return db.session
 
-@app.before_request
 def before_request():
     """
-    Attach a new database session to Flask's `g` before each request.
+    Attach the database session to Flask's `g` before each request.
     """
     g.db = get_db_session()
 
-@app.teardown_appcontext
 def shutdown_session(exception=None):
     """
-    Close the database session at the end of the request/app context.
+    Detach the database session at the end of the request/app context.
+
+    Flask-SQLAlchemy removes the scoped session itself, which returns the
+    connection to the pool.
 
     Args:
         exception (Exception, optional): Exception if any
     """
-    db_session = g.pop('db', None)
-    if db_session is not None:
-        db_session.close()
+    g.pop('db', None)
 
 # ================================
-# Import models
+# CLI commands
 # ================================
-from models import User, APIKey, Category
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create all tables on an empty database and mark it as migrated to head."""
+    from flask_migrate import stamp
+    import models  # noqa: F401 - registers the tables on db.metadata
+    db.create_all()
+    stamp()
+    click.echo('Database tables created and stamped at the latest migration.')
 
-# ================================
-# Create tables
-# ================================
-with app.app_context():
-    try:
-        db.create_all()
-        logger.info("Database tables created successfully")
-    except SQLAlchemyError as e:
-        logger.error(f"Error creating database tables: {str(e)}")
+def register_cli_commands(app):
+    """
+    Attach the project's CLI commands to the app.
+
+    Args:
+        app (Flask): Application
+    """
+    app.cli.add_command(init_db_command)
+
+    from index_check import check_indexes_command
+    app.cli.add_command(check_indexes_command)
+
+    from key_rotation import rotate_master_key_command
+    app.cli.add_command(rotate_master_key_command)
+
+    from importer import import_keys_command
+    app.cli.add_command(import_keys_command)
+
+    from backup import backup_command, verify_backup_command, restore_backup_command, rewrap_backup_command
+    app.cli.add_command(backup_command)
+    app.cli.add_command(verify_backup_command)
+    app.cli.add_command(restore_backup_command)
+    app.cli.add_command(rewrap_backup_command)
+
+    from tokens import create_token_command, revoke_token_command
+    app.cli.add_command(create_token_command)
+    app.cli.add_command(revoke_token_command)
+
+    from revisions import prune_tombstones_command
+    app.cli.add_command(prune_tombstones_command)
+
+    from assets import build_assets_command
+    app.cli.add_command(build_assets_command)
 
 # ================================
-# Register blueprints
+# Flask app factory
 # ================================
-from wallet_routes import main as wallet_blueprint
-app.register_blueprint(wallet_blueprint)
+def create_app(config=None):
+    """
+    Create and configure a KeyGuardian application.
+
+    Importing this module has no side effects beyond defining the shared
+    extensions. The schema is managed by migrations (`flask db upgrade`),
+    or by `flask init-db` on an empty database, and never created here.
+    Flask-Migrate, and with it Alembic, is only loaded when the app is
+    created by the `flask` command, or when MIGRATIONS_ENABLED is set.
+
+    Args:
+        config (dict, optional): Config values overriding the environment (see config.py)
+
+    Returns:
+        Flask: Configured application
+    """
+    load_dotenv()
+
+    app = Flask(__name__)
+    app.config.update(config_from_env())
+    if config:
+        app.config.update(config)
+    init_logging(app)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', build_engine_options(app.config))
+
+    parsed_url = urlparse(app.config['SQLALCHEMY_DATABASE_URI'] or '')
+    logger.info("Database URL: %s://%s:%s%s", parsed_url.scheme, parsed_url.hostname, parsed_url.port, parsed_url.path)
+
+    db.init_app(app)
+    if app.config.get('MIGRATIONS_ENABLED', click.get_current_context(silent=True) is not None):
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    login_manager.init_app(app)
+    init_password_hashing(app)
+
+    app.before_request(before_request)
+    app.teardown_appcontext(shutdown_session)
+
+    with app.app_context():
+        try:
+            warm_up_pool(db.engine, app.config['DB_POOL_WARMUP'])
+        except SQLAlchemyError as e:
+            logger.error(f"Error warming up database pool: {str(e)}")
+        init_instrumentation(app, db.engine)
+
+    # Blueprints
+    from wallet_routes import main as wallet_blueprint
+    app.register_blueprint(wallet_blueprint)
+
+    from auth_routes import auth as auth_blueprint
+    app.register_blueprint(auth_blueprint)
+
+    from category_routes import categories as category_blueprint
+    app.register_blueprint(category_blueprint)
+
+    from admin_routes import admin as admin_blueprint
+    app.register_blueprint(admin_blueprint)
+
+    from api_routes import api as api_blueprint
+    app.register_blueprint(api_blueprint)
+
+    # Data key cache and crypto pool sizing
+    from encryption_service import init_encryption
+    init_encryption(app)
+
+    # Access token authentication
+    from tokens import init_tokens
+    init_tokens(app, login_manager)
+
+    # User loader cache invalidation
+    from user_cache import init_user_cache
+    init_user_cache(app)
+
+    # Revision stamping for delta sync
+    from revisions import init_revisions
+    init_revisions()
+
+    # Search index updates
+    from search_index import init_search_index
+    init_search_index(app)
+
+    # Fingerprinted static assets
+    from assets import init_assets
+    init_assets(app)
 
-from auth_routes import auth as auth_blueprint
-app.register_blueprint(auth_blueprint)
+    # Response compression
+    from compression import init_compression
+    init_compression(app)
 
-from category_routes import categories as category_blueprint
-app.register_blueprint(category_blueprint)
+    register_cli_commands(app)
+    return app
 
 # ================================
 # Run the app
 # ================================
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    create_app().run(host="0.0.0.0", port=5000)
@@ -0,0 +1,406 @@
+"""
+assets.py - Fingerprinted, precompressed static assets
+
+`flask build-assets` writes a production copy of the static folder to
+static/dist:
+- every file gets a content hash in its name (css/styles.3f9c2a1b7d0e.css),
+  and url() references inside stylesheets are rewritten to the hashed names;
+- text assets get gzip (and, with the brotli package, brotli) variants,
+  kept only when smaller;
+- PNG and JPEG images are converted to WebP when Pillow is installed;
+- the Font Awesome solid font is subset to the icons the templates and
+  scripts use (with fontTools), and the Roboto weights the stylesheet needs
+  are self-hosted, so pages no longer block on third-party CDNs.
+- manifest.json maps each logical name to its hashed name.
+
+Icon and font sources come from the npm packages @fortawesome/fontawesome-free
+(5.x) and @fontsource/roboto under ASSET_VENDOR_DIR. When they are missing,
+the build skips them and base.html keeps loading both from the CDNs.
+
+At runtime, `init_assets` loads the manifest. `url_for('static', ...)` then
+returns hashed URLs, and the static view serves them with an immutable,
+one-year Cache-Control and the best precompressed variant the client
+accepts. Without a manifest, static files are served as before.
+
+Dependencies:
+- click
+- Flask
+- brotli (optional)
+- fontTools (optional)
+- Pillow (optional)
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+# ================================
+# Third-party imports
+# ================================
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import with_appcontext
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Text formats worth precompressing; images and woff2 fonts already are compressed
+COMPRESSIBLE = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.ico', '.ttf'}
+COMPRESS_MIN_SIZE = 256
+IMAGE_FORMATS = {'.png', '.jpg', '.jpeg'}
+WEBP_QUALITY = 80
+
+FONT_AWESOME_PACKAGE = '@fortawesome/fontawesome-free'
+ROBOTO_PACKAGE = '@fontsource/roboto'
+# Weights styles.css relies on; others are synthesized from the nearest one
+ROBOTO_WEIGHTS = (400, 700)
+
+ICON_CLASS = re.compile(r'\bfa-([a-z0-9-]+)')
+ICON_RULE = re.compile(r'\.fa-([a-z0-9-]+):before\s*\{\s*content:\s*"\\([0-9a-f]+)"')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+ICONS_CSS = """@font-face {
+  font-family: "Font Awesome 5 Free";
+  font-style: normal;
+  font-weight: 900;
+  font-display: block;
+  src: url("../fonts/fa-solid-900.woff2") format("woff2");
+}
+.fa, .fas {
+  -moz-osx-font-smoothing: grayscale;
+  -webkit-font-smoothing: antialiased;
+  display: inline-block;
+  font-style: normal;
+  font-variant: normal;
+  text-rendering: auto;
+  line-height: 1;
+  font-family: "Font Awesome 5 Free";
+  font-weight: 900;
+}
+"""
+
+FONT_FACE_CSS = """@font-face {{
+  font-family: "Roboto";
+  font-style: normal;
+  font-weight: {weight};
+  font-display: swap;
+  src: url("../fonts/{name}") format("woff2");
+}}
+"""
+
+# ================================
+# Build
+# ================================
+def _hashed_name(logical, data):
+    stem, ext = posixpath.splitext(logical)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+def _compress(data):
+    variants = {'gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+def _to_webp(data):
+    """
+    Return the image re-encoded as WebP, or None if Pillow is not installed
+    or WebP would not be smaller.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    with Image.open(io.BytesIO(data)) as image:
+        output = io.BytesIO()
+        image.save(output, 'WEBP', quality=WEBP_QUALITY, method=6)
+    webp = output.getvalue()
+    return webp if len(webp) < len(data) else None
+
+def _used_icons(template_folder, static_folder):
+    names = set()
+    for folder, extensions in ((template_folder, ('.html',)), (os.path.join(static_folder, 'js'), ('.js',))):
+        for root, _, files in os.walk(folder):
+            for filename in files:
+                if filename.endswith(extensions):
+                    with open(os.path.join(root, filename), encoding='utf-8') as f:
+                        names.update(ICON_CLASS.findall(f.read()))
+    return names
+
+def _subset_font(data, codepoints):
+    """
+    Return a WOFF2 font with only the given code points, or None if fontTools
+    (with brotli, for WOFF2 output) is not installed.
+    """
+    try:
+        from fontTools import subset
+        import brotli  # noqa: F401 - needed by fontTools to write WOFF2
+    except ImportError:
+        return None
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = []
+    font = subset.load_font(io.BytesIO(data), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    output = io.BytesIO()
+    subset.save_font(font, output, options)
+    return output.getvalue()
+
+def _icon_assets(vendor_dir, template_folder, static_folder, notes):
+    package = os.path.join(vendor_dir, FONT_AWESOME_PACKAGE)
+    css_path = os.path.join(package, 'css', 'all.css')
+    font_path = os.path.join(package, 'webfonts', 'fa-solid-900.woff2')
+    if not (os.path.exists(css_path) and os.path.exists(font_path)):
+        notes.append(f'Font Awesome not found under {package}; icons stay on the CDN')
+        return {}
+    with open(css_path, encoding='utf-8') as f:
+        codepoints = dict(ICON_RULE.findall(f.read()))
+    icons = sorted(name for name in _used_icons(template_folder, static_folder) if name in codepoints)
+    with open(font_path, 'rb') as f:
+        font = f.read()
+    subset_font = _subset_font(font, [int(codepoints[name], 16) for name in icons])
+    if subset_font is None:
+        notes.append('fontTools or brotli not installed; shipping the full Font Awesome solid font')
+    rules = ''.join(f'.fa-{name}:before {{ content: "\\{codepoints[name]}"; }}\n' for name in icons)
+    notes.append(f'Icons: {len(icons)} ({", ".join(icons)})')
+    return {
+        'fonts/fa-solid-900.woff2': subset_font or font,
+        'css/icons.css': (ICONS_CSS + rules).encode(),
+    }
+
+def _font_assets(vendor_dir, notes):
+    files_dir = os.path.join(vendor_dir, ROBOTO_PACKAGE, 'files')
+    assets = {}
+    css = []
+    for weight in ROBOTO_WEIGHTS:
+        name = f'roboto-latin-{weight}-normal.woff2'
+        path = os.path.join(files_dir, name)
+        if not os.path.exists(path):
+            notes.append(f'Roboto not found under {files_dir}; fonts stay on the CDN')
+            return {}
+        with open(path, 'rb') as f:
+            assets[f'fonts/{name}'] = f.read()
+        css.append(FONT_FACE_CSS.format(weight=weight, name=name))
+    assets['css/fonts.css'] = ''.join(css).encode()
+    return assets
+
+def _rewrite_css_urls(logical, css, manifest, static_url_path):
+    """
+    Point url() references in a stylesheet at the hashed files.
+    """
+    base = posixpath.dirname(logical)
+
+    def replace(match):
+        url = match.group(2)
+        if url.startswith(static_url_path + '/'):
+            target = url[len(static_url_path) + 1:]
+        elif '://' in url or url.startswith(('/', 'data:', '#')):
+            return match.group(0)
+        else:
+            target = posixpath.normpath(posixpath.join(base, url))
+        if target not in manifest:
+            return match.group(0)
+        return f'url("{posixpath.relpath(manifest[target], base)}")'
+
+    return CSS_URL.sub(replace, css.decode('utf-8')).encode('utf-8')
+
+def build_assets(static_folder, template_folder, vendor_dir, static_url_path='/static'):
+    """
+    Write fingerprinted, precompressed copies of the static files to static/dist.
+
+    The previous build is replaced. Stylesheets are written last, so their
+    url() references can point at the hashed names of images and fonts.
+
+    Args:
+        static_folder (str): App static folder
+        template_folder (str): App template folder, scanned for icon names
+        vendor_dir (str): Directory holding the npm icon and font packages
+        static_url_path (str): URL prefix of the static folder
+
+    Returns:
+        tuple: (manifest dict, list of build notes, total bytes per encoding
+        ('identity', 'gz', 'br'), counting files without a variant at full size)
+    """
+    output_dir = os.path.join(static_folder, DIST_DIR)
+    notes = []
+    sources = {}
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder and DIST_DIR in dirs:
+            dirs.remove(DIST_DIR)
+        for filename in files:
+            if filename == 'README.md' or filename.startswith('.'):
+                continue
+            path = os.path.join(root, filename)
+            with open(path, 'rb') as f:
+                sources[os.path.relpath(path, static_folder).replace(os.sep, '/')] = f.read()
+    sources.update(_icon_assets(vendor_dir, template_folder, static_folder, notes))
+    sources.update(_font_assets(vendor_dir, notes))
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    manifest = {}
+    totals = {'identity': 0, 'gz': 0, 'br': 0}
+    ordered = sorted(sources, key=lambda logical: (logical.endswith('.css'), logical))
+    for logical in ordered:
+        data = sources[logical]
+        target = logical
+        if posixpath.splitext(logical)[1].lower() in IMAGE_FORMATS:
+            webp = _to_webp(data)
+            if webp is None:
+                notes.append(f'{logical}: kept as is (Pillow not installed or WebP not smaller)')
+            else:
+                notes.append(f'{logical}: {len(data)} -> {len(webp)} bytes as WebP')
+                data = webp
+                target = posixpath.splitext(logical)[0] + '.webp'
+        elif logical.endswith('.css'):
+            data = _rewrite_css_urls(logical, data, manifest, static_url_path)
+
+        hashed = _hashed_name(target, data)
+        manifest[logical] = hashed
+        path = os.path.join(output_dir, *hashed.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        variants = {}
+        if posixpath.splitext(target)[1] in COMPRESSIBLE and len(data) >= COMPRESS_MIN_SIZE:
+            variants = _compress(data)
+        for encoding, body in variants.items():
+            with open(f'{path}.{encoding}', 'wb') as f:
+                f.write(body)
+        for encoding in totals:
+            totals[encoding] += len(variants.get(encoding, data))
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest, notes, totals
+
+# ================================
+# Serving
+# ================================
+def load_manifest(static_folder):
+    """
+    Read the build manifest and note which precompressed variants exist.
+
+    Args:
+        static_folder (str): App static folder
+
+    Returns:
+        dict or None: 'files' (logical to hashed name) and 'encodings'
+        (hashed name to available encodings), or None if no build exists
+    """
+    output_dir = os.path.join(static_folder, DIST_DIR)
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            files = json.load(f)
+    except FileNotFoundError:
+        return None
+    encodings = {
+        hashed: [encoding for encoding in ('br', 'gz')
+                 if os.path.exists(os.path.join(output_dir, *hashed.split('/')) + '.' + encoding)]
+        for hashed in files.values()
+    }
+    return {'files': files, 'encodings': encodings}
+
+def _hashed_url_defaults(endpoint, values):
+    """
+    Make url_for('static', filename=...) return the fingerprinted file.
+    """
+    if endpoint != 'static':
+        return
+    manifest = current_app.extensions.get('assets')
+    hashed = manifest['files'].get(values.get('filename')) if manifest else None
+    if hashed is not None:
+        values['filename'] = f'{DIST_DIR}/{hashed}'
+
+def serve_static(filename):
+    """
+    Static view: fingerprinted files are served precompressed and cached for
+    a year; everything else falls back to Flask's static file handling.
+
+    Args:
+        filename (str): Path below the static folder
+
+    Returns:
+        Response: The file
+    """
+    manifest = current_app.extensions.get('assets')
+    prefix = DIST_DIR + '/'
+    if not manifest or not filename.startswith(prefix) or filename[len(prefix):] not in manifest['encodings']:
+        return current_app.send_static_file(filename)
+
+    hashed = filename[len(prefix):]
+    encoding = None
+    for candidate, token in (('br', 'br'), ('gz', 'gzip')):
+        if candidate in manifest['encodings'][hashed] and request.accept_encodings[token]:
+            encoding = candidate
+            break
+    mimetype = mimetypes.guess_type(hashed)[0] or 'application/octet-stream'
+    response = send_from_directory(
+        current_app.static_folder, filename + (f'.{encoding}' if encoding else ''),
+        mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE,
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = 'br' if encoding == 'br' else 'gzip'
+    if manifest['encodings'][hashed]:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def init_assets(app):
+    """
+    Serve fingerprinted assets if `flask build-assets` has been run.
+
+    Registered unconditionally, so a build made while the app is running is
+    picked up on the next restart. Set ASSET_FINGERPRINTING=false to ignore
+    an existing build, e.g. while editing stylesheets.
+
+    Args:
+        app (Flask): Application
+    """
+    app.jinja_env.globals['asset_built'] = lambda logical: logical in app.extensions.get('assets', {}).get('files', {})
+    if not app.config['ASSET_FINGERPRINTING'] or app.static_folder is None:
+        return
+    manifest = load_manifest(app.static_folder)
+    if manifest is None:
+        return
+    app.extensions['assets'] = manifest
+    app.url_defaults(_hashed_url_defaults)
+    app.view_functions['static'] = serve_static
+
+# ================================
+# CLI command
+# ================================
+@click.command('build-assets')
+@click.option('--vendor-dir', default=None,
+              help='Directory with the npm icon and font packages (default: ASSET_VENDOR_DIR).')
+@with_appcontext
+def build_assets_command(vendor_dir):
+    """
+    Fingerprint, precompress and self-host the static assets into static/dist.
+    """
+    vendor_dir = vendor_dir or os.path.join(current_app.root_path, current_app.config['ASSET_VENDOR_DIR'])
+    manifest, notes, totals = build_assets(
+        current_app.static_folder, os.path.join(current_app.root_path, current_app.template_folder),
+        vendor_dir, current_app.static_url_path,
+    )
+    for note in notes:
+        click.echo(note)
+    click.echo(f"Built {len(manifest)} assets: {totals['identity']} bytes, {totals['gz']} with gzip, "
+               f"{totals['br']} with brotli (uncompressed where no variant was written).")
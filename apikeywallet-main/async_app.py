@@ -0,0 +1,377 @@
+"""
+async_app.py - Asyncio serving mode for the read-only wallet endpoints
+
+A small ASGI application serves the two hottest read endpoints without
+tying up a worker thread per request. It uses SQLAlchemy's async engine,
+so a process can keep many more requests in flight than it has threads:
+
+- POST /async/get_key/<id>            (same response as /get_key/<id>)
+- GET  /async/get_categories_and_keys (same response as /get_categories_and_keys)
+
+Every other path is passed to the regular Flask app through asgiref's
+WSGI adapter, so one ASGI server hosts both:
+
+    uvicorn --factory async_app:create_asgi_app
+
+Requests are authenticated with the Flask-Login session cookie, decoded
+with the Flask app's own session serializer and secret key. The user is
+resolved through the shared user snapshot cache. Queries use the same
+models. Unsealing runs on the crypto thread pool from utils.py. Unwrapping
+a data key on a cache miss also runs there. Legacy Fernet rows are
+decrypted but not re-sealed here, since the read path never writes; the
+next sync read upgrades them. JSON responses are compressed with the same
+settings as the WSGI app's (see compression.py).
+
+The async driver comes from ASYNC_DATABASE_URL, or is derived from
+DATABASE_URL (sqlite -> sqlite+aiosqlite, postgresql -> postgresql+asyncpg).
+This needs the optional `async` extra (asgiref, aiosqlite/asyncpg).
+
+Dependencies:
+- SQLAlchemy (asyncio)
+- asgiref (optional)
+- Werkzeug
+- compression.py
+- encryption_service.py
+- user_cache.py
+- logging_setup.py
+- utils.py
+- models.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import asyncio
+import json
+import logging
+import re
+
+# ================================
+# Third-party imports
+# ================================
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
+from itsdangerous import BadSignature
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.http import parse_cookie
+
+# ================================
+# Project imports
+# ================================
+from app import create_app
+from compression import available_encodings, compress_body, compression_levels, negotiate
+from encryption_service import associated_data, cached_cipher, cipher_from_wrapped
+from logging_setup import REQUEST_ID_HEADER, bind_request_id, current_request_id, unbind_request_id
+from models import User, APIKey, Category
+from user_cache import UserSnapshot, cached_snapshot, remember_snapshot
+from utils import decrypt_key, get_crypto_executor, unseal
+
+logger = logging.getLogger(__name__)
+
+ASYNC_PREFIX = '/async'
+
+# Sync driver -> async driver used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+# ================================
+# Classes
+# ================================
+class Unauthorized(Exception):
+    """
+    Raised when a request carries no valid, logged-in session.
+    """
+
+class AsyncReadApp:
+    """
+    ASGI app serving the async read endpoints and delegating the rest to Flask.
+
+    Attributes:
+        flask_app (Flask): Application whose config, secret key and sessions are shared
+        fallback (callable): ASGI app handling every other path
+        engine (AsyncEngine): Async engine for the read queries
+    """
+
+    def __init__(self, flask_app, fallback):
+        self.flask_app = flask_app
+        self.fallback = fallback
+        self.engine = create_async_engine(async_database_url(flask_app.config), **async_engine_options(flask_app.config))
+        self.routes = [
+            ('POST', re.compile(r'^/get_key/(\d+)$'), self.get_key),
+            ('GET', re.compile(r'^/get_categories_and_keys$'), self.get_categories_and_keys),
+        ]
+        self._session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self._session_cookie = flask_app.config['SESSION_COOKIE_NAME']
+        self._session_max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+        self._encodings = []
+        if flask_app.config['COMPRESSION_ENABLED']:
+            self._encodings = available_encodings(
+                [name.strip() for name in flask_app.config['COMPRESSION_ENCODINGS'].split(',') if name.strip()])
+        self._levels = compression_levels(flask_app.config)
+        self._min_size = flask_app.config['COMPRESSION_MIN_SIZE']
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http' and (scope['path'] == ASYNC_PREFIX or scope['path'].startswith(ASYNC_PREFIX + '/')):
+            await self._dispatch(scope, receive, send)
+        else:
+            await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _dispatch(self, scope, receive, send):
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        token = bind_request_id(headers.get(REQUEST_ID_HEADER.lower()))
+        try:
+            path = scope['path'][len(ASYNC_PREFIX):]
+            method = scope['method']
+            allowed = False
+            for route_method, pattern, handler in self.routes:
+                match = pattern.match(path)
+                if match is None:
+                    continue
+                allowed = True
+                if route_method != method:
+                    continue
+                await _drain(receive)
+                try:
+                    user = await self._authenticate(headers)
+                except Unauthorized:
+                    await _send_json(send, 401, {'error': 'Authentication required.'})
+                    return
+                status, payload = await handler(user, *(int(group) for group in match.groups()))
+                encoding = negotiate(headers.get('accept-encoding'), self._encodings)
+                compression = (encoding, self._levels.get(encoding), self._min_size) if encoding else None
+                await _send_json(send, status, payload, no_store=True, compression=compression)
+                return
+            if allowed:
+                await _send_json(send, 405, {'error': 'Method not allowed.'})
+            else:
+                await _send_json(send, 404, {'error': 'Not found.'})
+        finally:
+            unbind_request_id(token)
+
+    async def _authenticate(self, headers):
+        """
+        Resolve the logged-in user from the Flask session cookie.
+
+        Args:
+            headers (dict): Lower-cased request headers
+
+        Returns:
+            UserSnapshot: Authenticated user
+
+        Raises:
+            Unauthorized: If there is no valid session or the user no longer exists
+        """
+        cookie = parse_cookie(headers.get('cookie', '')).get(self._session_cookie)
+        if not cookie:
+            raise Unauthorized()
+        try:
+            session = self._session_serializer.loads(cookie, max_age=self._session_max_age)
+            user_id = int(session['_user_id'])
+        except (BadSignature, KeyError, TypeError, ValueError):
+            raise Unauthorized()
+
+        user = cached_snapshot(user_id)
+        if user is not None:
+            return user
+        async with self.engine.connect() as connection:
+            row = (await connection.execute(select(User.email, User.is_admin).where(User.id == user_id))).first()
+        if row is None:
+            raise Unauthorized()
+        user = UserSnapshot(user_id, row.email, row.is_admin)
+        remember_snapshot(user)
+        return user
+
+    async def get_key(self, user, key_id):
+        """
+        Decrypt and return one of the user's API keys.
+
+        Args:
+            user (UserSnapshot): Authenticated user
+            key_id (int): API key ID
+
+        Returns:
+            tuple: (status, JSON payload)
+        """
+        loop = asyncio.get_running_loop()
+        executor = get_crypto_executor()
+        try:
+            async with self.engine.connect() as connection:
+                row = (await connection.execute(
+                    select(APIKey.ciphertext, APIKey.encrypted_key)
+                    .where(APIKey.id == key_id, APIKey.user_id == user.id)
+                )).first()
+                if row is None:
+                    return 404, {'error': 'API Key not found or unauthorized.'}
+                if row.ciphertext is None:
+                    plaintext = await loop.run_in_executor(executor, decrypt_key, row.encrypted_key)
+                    return 200, {'key': plaintext}
+                cipher = cached_cipher(user.id)
+                if cipher is None:
+                    wrapped_key = (await connection.execute(
+                        select(User.wrapped_data_key).where(User.id == user.id)
+                    )).scalar()
+                    cipher = await loop.run_in_executor(executor, cipher_from_wrapped, user.id, wrapped_key)
+            plaintext = await loop.run_in_executor(executor, unseal, cipher, row.ciphertext, associated_data(user.id))
+            return 200, {'key': plaintext}
+        except (SQLAlchemyError, InvalidToken, InvalidTag, ValueError) as e:
+            logger.error('Error in async get_key route: %s', e)
+            return 500, {'error': 'An error occurred while retrieving the API key.'}
+
+    async def get_categories_and_keys(self, user):
+        """
+        Return the user's categories and key metadata grouped by category.
+
+        Args:
+            user (UserSnapshot): Authenticated user
+
+        Returns:
+            tuple: (status, JSON payload)
+        """
+        try:
+            async with self.engine.connect() as connection:
+                categories = (await connection.execute(
+                    select(Category.id, Category.name).where(Category.user_id == user.id).order_by(Category.name)
+                )).all()
+                keys = (await connection.execute(
+                    select(APIKey.id, APIKey.key_name, APIKey.category_id, APIKey.date_added, Category.name.label('category_name'))
+                    .outerjoin(Category, Category.id == APIKey.category_id)
+                    .where(APIKey.user_id == user.id)
+                    .order_by(APIKey.key_name)
+                )).all()
+        except SQLAlchemyError as e:
+            logger.error('Error in async get_categories_and_keys route: %s', e)
+            return 500, {'error': 'An error occurred while fetching categories and keys.'}
+
+        grouped_keys = {category.name: [] for category in categories}
+        grouped_keys['Uncategorized'] = []
+        for key in keys:
+            in_category = key.category_name is not None
+            grouped_keys[key.category_name if in_category else 'Uncategorized'].append({
+                'id': key.id,
+                'key_name': key.key_name,
+                'category_id': key.category_id if in_category else None,
+                'date_added': key.date_added.isoformat(),
+            })
+        return 200, {
+            'categories': [{'id': category.id, 'name': category.name} for category in categories],
+            'grouped_keys': grouped_keys,
+        }
+
+# ================================
+# Functions
+# ================================
+async def _drain(receive):
+    """
+    Consume the request body, which these endpoints ignore.
+    """
+    message = {'more_body': True}
+    while message.get('more_body'):
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+async def _send_json(send, status, payload, no_store=False, compression=None):
+    """
+    Send a complete JSON response, compressed as the middleware in
+    compression.py would if `compression` is (encoding, level, min_size).
+    """
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    headers = [(b'content-type', b'application/json')]
+    if compression is not None and len(body) >= compression[2]:
+        encoding, level, _ = compression
+        # Off the event loop: large wallets make for bodies of several hundred KB
+        body = await asyncio.to_thread(compress_body, body, encoding, level)
+        headers += [(b'content-encoding', encoding.encode()), (b'vary', b'Accept-Encoding')]
+    headers.append((b'content-length', str(len(body)).encode()))
+    if no_store:
+        headers.append((b'cache-control', b'no-store'))
+    request_id = current_request_id()
+    if request_id is not None:
+        headers.append((REQUEST_ID_HEADER.lower().encode(), request_id.encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+def async_database_url(config):
+    """
+    Return the async driver URL for the app's database.
+
+    Args:
+        config (dict): Flask app config
+
+    Returns:
+        URL: ASYNC_DATABASE_URL, or SQLALCHEMY_DATABASE_URI with its async driver
+
+    Raises:
+        ValueError: If no async driver is known for the database
+    """
+    if config.get('ASYNC_DATABASE_URL'):
+        return make_url(config['ASYNC_DATABASE_URL'])
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'].replace('postgres://', 'postgresql://', 1))
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver known for {backend}; set ASYNC_DATABASE_URL')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+def async_engine_options(config):
+    """
+    Build keyword arguments for the async engine.
+
+    SQLite file databases get a queue pool too: every aiosqlite connection
+    runs on its own thread, which an unpooled engine would start and stop
+    on every request. In-memory SQLite keeps SQLAlchemy's default pool.
+
+    Args:
+        config (dict): Flask app config
+
+    Returns:
+        dict: Keyword arguments for `create_async_engine`
+    """
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING'], 'pool_recycle': config['DB_POOL_RECYCLE']}
+    url = async_database_url(config)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return options
+        options['poolclass'] = AsyncAdaptedQueuePool
+    options.update(pool_size=config['ASYNC_DB_POOL_SIZE'], max_overflow=config['ASYNC_DB_MAX_OVERFLOW'])
+    return options
+
+def create_asgi_app(config=None):
+    """
+    Create the combined ASGI application: async read endpoints plus the Flask app.
+
+    Args:
+        config (dict, optional): Config overrides passed to create_app
+
+    Returns:
+        AsyncReadApp: ASGI application
+
+    Raises:
+        RuntimeError: If asgiref is not installed
+    """
+    try:
+        from asgiref.wsgi import WsgiToAsgi
+    except ImportError:
+        raise RuntimeError('The async serving mode needs asgiref; install the "async" extra')
+    flask_app = create_app(config)
+    return AsyncReadApp(flask_app, WsgiToAsgi(flask_app))
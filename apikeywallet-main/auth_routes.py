@@ -10,6 +10,7 @@ Dependencies:
 - WTForms
 - models.py
 - forms.py
+- password_hashing.py
 - app.py
 
 @author KeyGuardian Team
@@ -26,7 +27,8 @@ import traceback
 # ================================
 from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app
 from flask_login import login_user, login_required, logout_user, current_user
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 # ================================
 # Project imports
@@ -34,12 +36,37 @@ from sqlalchemy.exc import SQLAlchemyError
 from models import User
 from forms import RegistrationForm, LoginForm
 from app import db
+from password_hashing import HasherBusy, hash_password, verify_password, needs_rehash
 
 # ================================
 # Blueprint setup
 # ================================
 auth = Blueprint('auth', __name__)
 
+# ================================
+# Helpers
+# ================================
+def _rehash_password(user, password):
+    """
+    Upgrade a verified user's password hash to the configured method, best effort.
+
+    The password is already verified, so a saturated hasher or a failed
+    commit only postpones the upgrade to a later login; it never blocks
+    this one.
+
+    Args:
+        user (User): User who just proved their password
+        password (str): The verified password
+    """
+    try:
+        user.password_hash = hash_password(password)
+        db.session.commit()
+    except (HasherBusy, SQLAlchemyError) as e:
+        db.session.rollback()
+        current_app.logger.warning("Could not rehash password for user %s: %s", user.id, e)
+        return
+    current_app.logger.info("Rehashed password for user %s with %s", user.id, current_app.config['PASSWORD_HASH_METHOD'])
+
 # ================================
 # Routes
 # ================================
@@ -62,18 +89,23 @@ def register():
         email = form.email.data
         password = form.password.data
 
-        user = User.query.filter_by(email=email).first()
+        user = User.query.filter(func.lower(User.email) == email.lower()).first()
         if user:
             flash('Email already exists.', 'danger')
             return redirect(url_for('auth.register'))
 
-        new_user = User(email=email)
-        new_user.set_password(password)
+        new_user = User(email=email, password_hash=hash_password(password))
         # Optionally: make first user admin
         if User.query.count() == 0:
             new_user.is_admin = True
         db.session.add(new_user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # ix_user_lower_email: the same address, in any case, registered concurrently
+            db.session.rollback()
+            flash('Email already exists.', 'danger')
+            return redirect(url_for('auth.register'))
 
         flash('Registration successful. Please log in.', 'success')
         return redirect(url_for('auth.login'))
@@ -100,14 +132,19 @@ def login():
         password = form.password.data
 
         try:
-            user = User.query.filter_by(email=email).first()
-            if user and user.check_password(password):
+            user = User.query.filter(func.lower(User.email) == email.lower()).first()
+            if user and verify_password(user.password_hash, password):
+                if needs_rehash(user.password_hash):
+                    _rehash_password(user, password)
                 login_user(user)
                 # Optionally: pass is_admin to frontend via session or API if needed
                 return redirect(url_for('main.wallet'))
             else:
                 flash('Invalid email or password.', 'danger')
+        except HasherBusy:
+            raise
         except SQLAlchemyError as e:
+            db.session.rollback()
             current_app.logger.error(f"Database error during login: {str(e)}")
             flash('An error occurred while processing your request. Please try again later.', 'danger')
         except Exception as e:
@@ -0,0 +1,258 @@
+"""
+bench_async_reads.py - Sync vs. async serving of the read-only wallet endpoints
+
+Serves the same app two ways, in this process:
+- as WSGI on a server with a fixed pool of request threads, like one
+  threaded worker;
+- as ASGI under uvicorn, with /async/get_key/<id> and
+  /async/get_categories_and_keys on the async engine (async_app.py).
+
+A separate load-generator process then keeps N requests in flight against
+each endpoint for a fixed time. For each mode and concurrency it reports
+throughput, p50/p99 latency, errors, and the peak number of requests the
+server actually had in progress at once.
+
+SQLite answers in microseconds. To stand in for a networked database, each
+SQL statement is delayed by --db-latency-ms on both engines. The sync engine
+sleeps the worker thread; the async engine awaits. Use --db-latency-ms 0 to
+measure raw local SQLite.
+
+Needs the optional "async" extra (asgiref, aiosqlite, uvicorn).
+
+Usage:
+    python benchmarks/bench_async_reads.py --concurrency 8 64 256 --duration 5 --db-latency-ms 20
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ================================
+# Third-party imports
+# ================================
+from sqlalchemy import event
+from werkzeug.serving import BaseWSGIServer
+
+# ================================
+# Classes
+# ================================
+class BoundedThreadWSGIServer(BaseWSGIServer):
+    """
+    WSGI server handling connections on a fixed number of threads.
+    """
+
+    request_queue_size = 1024
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+class InFlight:
+    """
+    Track the number of requests a server is handling at once, and its peak.
+    """
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def exit(self):
+        with self._lock:
+            self.current -= 1
+
+    def take_peak(self):
+        with self._lock:
+            peak, self.peak = self.peak, self.current
+            return peak
+
+    def wrap_wsgi(self, app):
+        def wrapped(environ, start_response):
+            self.enter()
+            try:
+                return list(app(environ, start_response))
+            finally:
+                self.exit()
+        return wrapped
+
+    def wrap_asgi(self, app):
+        async def wrapped(scope, receive, send):
+            if scope['type'] != 'http':
+                return await app(scope, receive, send)
+            self.enter()
+            try:
+                await app(scope, receive, send)
+            finally:
+                self.exit()
+        return wrapped
+
+# ================================
+# Load generator (runs in its own process)
+# ================================
+async def _request(host, port, method, path, cookie):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nCookie: session={cookie}\r\n'
+                  f'Content-Length: 0\r\nConnection: close\r\n\r\n').encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+async def _generate_load(host, port, method, path, cookie, concurrency, duration):
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await _request(host, port, method, path, cookie)
+            except OSError:
+                status = None
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests_per_second': round(len(latencies) / elapsed),
+        'p50_ms': round(statistics.median(latencies), 1) if latencies else None,
+        'p99_ms': round(latencies[max(int(len(latencies) * 0.99) - 1, 0)], 1) if latencies else None,
+        'errors': errors,
+    }
+
+def load_main(argv):
+    host, port, method, path, cookie, concurrency, duration = argv
+    result = asyncio.run(_generate_load(host, int(port), method, path, cookie, int(concurrency), float(duration)))
+    print(json.dumps(result))
+
+# ================================
+# Functions
+# ================================
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def add_latency(sync_engine, async_engine, seconds):
+    """
+    Delay every statement on both engines to emulate a networked database.
+    """
+    from sqlalchemy.util import await_only
+
+    def blocking_delay(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(seconds)
+
+    def async_delay(conn, cursor, statement, parameters, context, executemany):
+        await_only(asyncio.sleep(seconds))
+
+    event.listen(sync_engine, 'before_cursor_execute', blocking_delay)
+    event.listen(async_engine.sync_engine, 'before_cursor_execute', async_delay)
+
+def run_load(port, method, path, cookie, concurrency, duration):
+    output = subprocess.run(
+        [sys.executable, __file__, '--load', '127.0.0.1', str(port), method, path, cookie, str(concurrency), str(duration)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 64, 256], help='Requests kept in flight')
+    parser.add_argument('--duration', type=float, default=5, help='Seconds per measurement')
+    parser.add_argument('--sync-threads', type=int, default=8, help='Request threads of the sync server')
+    parser.add_argument('--db-latency-ms', type=float, default=20, help='Delay added to every SQL statement')
+    parser.add_argument('--keys', type=int, default=200, help='Keys owned by the benchmark user')
+    parser.add_argument('--database-url', help='Database to benchmark against (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    import uvicorn
+    from asgiref.wsgi import WsgiToAsgi
+    from common import load_app, login_client
+    flask_app = load_app(args.database_url)
+    from app import db
+    from async_app import AsyncReadApp
+    from models import APIKey
+    from seeding import seed_dataset, SEED_PASSWORD
+
+    with flask_app.app_context():
+        email = seed_dataset(1, 5, args.keys)[0]
+        key_id = db.session.query(APIKey.id).order_by(APIKey.id).first()[0]
+        sync_engine = db.engine
+    cookie = login_client(flask_app, email, SEED_PASSWORD).get_cookie('session').value
+    # Warm the data key cache the way a running server would have it
+    login_client(flask_app, email, SEED_PASSWORD).post(f'/get_key/{key_id}')
+
+    asgi_app = AsyncReadApp(flask_app, WsgiToAsgi(flask_app))
+    if args.db_latency_ms:
+        add_latency(sync_engine, asgi_app.engine, args.db_latency_ms / 1000)
+
+    sync_port, async_port = free_port(), free_port()
+    sync_in_flight, async_in_flight = InFlight(), InFlight()
+    sync_server = BoundedThreadWSGIServer('127.0.0.1', sync_port, sync_in_flight.wrap_wsgi(flask_app), args.sync_threads)
+    threading.Thread(target=sync_server.serve_forever, daemon=True).start()
+    async_server = uvicorn.Server(uvicorn.Config(async_in_flight.wrap_asgi(asgi_app), host='127.0.0.1', port=async_port,
+                                                 log_level='warning', backlog=4096))
+    threading.Thread(target=async_server.run, daemon=True).start()
+    while not async_server.started:
+        time.sleep(0.05)
+
+    endpoints = {
+        'get_key': ('POST', f'/get_key/{key_id}'),
+        'get_categories_and_keys': ('GET', '/get_categories_and_keys'),
+    }
+    results = {}
+    for name, (method, path) in endpoints.items():
+        for concurrency in args.concurrency:
+            for mode, port, prefix, in_flight in (('sync', sync_port, '', sync_in_flight),
+                                                  ('async', async_port, '/async', async_in_flight)):
+                in_flight.take_peak()
+                result = run_load(port, method, prefix + path, cookie, concurrency, args.duration)
+                result['peak_in_flight'] = in_flight.take_peak()
+                results[f'{name}/{mode}/c{concurrency}'] = result
+                print(f"{name:>24} {mode:>5} c={concurrency:<4} {result['requests_per_second']:>6} req/s  "
+                      f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  in flight {result['peak_in_flight']:>4}  "
+                      f"errors {result['errors']}")
+
+    async_server.should_exit = True
+    sync_server.shutdown()
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--load':
+        load_main(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,123 @@
+"""
+bench_backup.py - Backup archive throughput
+
+Seeds a large dataset (2 million keys by default), then measures writing a
+whole-instance backup archive, verifying it in parallel and restoring it
+into the emptied tables. Reports rows/s, archive MB/s and the process's
+peak RSS, which should not grow with the dataset.
+
+Usage:
+    python benchmarks/bench_backup.py --users 100 --keys-per-user 20000
+    python benchmarks/bench_backup.py --database-url postgresql://localhost/keyguardian_bench --workers 8
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# ================================
+# Third-party imports
+# ================================
+from sqlalchemy import delete, func, select
+
+# ================================
+# Project imports
+# ================================
+from common import load_app
+
+# ================================
+# Functions
+# ================================
+def peak_rss_mb():
+    """
+    Return the peak resident set size of this process in MB.
+
+    Returns:
+        float: Peak RSS in MB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100, help='Users to seed')
+    parser.add_argument('--categories-per-user', type=int, default=10, help='Categories per seeded user')
+    parser.add_argument('--keys-per-user', type=int, default=20000, help='Keys per seeded user')
+    parser.add_argument('--chunk-rows', type=int, default=5000, help='Rows per archive chunk')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Verify/restore threads')
+    parser.add_argument('--database-url', help='Database to benchmark against (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    flask_app = load_app(args.database_url)
+    from app import db
+    from models import User, APIKey, Category
+    from seeding import seed_dataset
+    from backup import iter_backup, verify_archive, restore_archive
+
+    models = (User, Category, APIKey)
+    path = os.path.join(tempfile.mkdtemp(prefix='keyguardian-backup-'), 'backup.tar')
+    with flask_app.app_context():
+        start = time.perf_counter()
+        seed_dataset(args.users, args.categories_per_user, args.keys_per_user)
+        print(f'Seeded in {time.perf_counter() - start:.1f}s')
+        counts = [db.session.execute(select(func.count()).select_from(model)).scalar() for model in models]
+        total_rows = sum(counts)
+        rss_before = peak_rss_mb()
+
+        start = time.perf_counter()
+        with open(path, 'wb') as f:
+            for data in iter_backup(None, args.chunk_rows):
+                f.write(data)
+        backup_seconds = time.perf_counter() - start
+        archive_mb = os.path.getsize(path) / 1e6
+        rss_after_backup = peak_rss_mb()
+
+        start = time.perf_counter()
+        verified = verify_archive(path, args.workers)
+        verify_seconds = time.perf_counter() - start
+
+        for model in reversed(models):
+            db.session.execute(delete(model))
+        db.session.commit()
+        restore_workers = 1 if db.engine.dialect.name == 'sqlite' else args.workers
+        start = time.perf_counter()
+        restored = restore_archive(path, restore_workers)
+        restore_seconds = time.perf_counter() - start
+        restored_counts = [db.session.execute(select(func.count()).select_from(model)).scalar() for model in models]
+
+    result = {
+        'rows': total_rows,
+        'archive_mb': round(archive_mb, 1),
+        'backup_seconds': round(backup_seconds, 2),
+        'backup_rows_per_second': round(total_rows / backup_seconds),
+        'backup_mb_per_second': round(archive_mb / backup_seconds, 1),
+        'verify_seconds': round(verify_seconds, 2),
+        'verify_rows_per_second': round(total_rows / verify_seconds),
+        'restore_seconds': round(restore_seconds, 2),
+        'restore_rows_per_second': round(total_rows / restore_seconds),
+        'restore_workers': restore_workers,
+        'peak_rss_mb_before_backup': round(rss_before, 1),
+        'peak_rss_mb_after_backup': round(rss_after_backup, 1),
+        'errors': verified['errors'] + restored['errors'],
+    }
+    print(f"Backup:  {total_rows} rows -> {archive_mb:.1f} MB in {backup_seconds:.1f}s "
+          f"({result['backup_rows_per_second']} rows/s, {result['backup_mb_per_second']} MB/s)")
+    print(f"Verify:  {verify_seconds:.1f}s ({result['verify_rows_per_second']} rows/s, {args.workers} workers)")
+    print(f"Restore: {restore_seconds:.1f}s ({result['restore_rows_per_second']} rows/s, {restore_workers} workers)")
+    print(f"Peak RSS: {rss_before:.0f} MB before backup, {rss_after_backup:.0f} MB after")
+    print(json.dumps(result))
+    if result['errors'] or restored_counts != counts:
+        print(f'Restore mismatch: {counts} before, {restored_counts} after', file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
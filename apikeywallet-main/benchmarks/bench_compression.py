@@ -0,0 +1,117 @@
+"""
+bench_compression.py - Bandwidth and CPU cost of response compression
+
+Seeds one wallet per --keys size and fetches the wallet page,
+/get_categories_and_keys and /export_keys uncompressed. Each body is then
+compressed with every available encoding and level (gzip always, brotli
+and zstd when installed). For each, the script reports:
+- the compressed size and the ratio to the original;
+- the CPU time to compress;
+- the time to deliver the response (CPU time plus transfer) over links of
+  --links Mbit/s, to show where a higher level stops paying off.
+
+Finally it times full requests through the app with the middleware's
+default settings, with and without Accept-Encoding.
+
+Usage:
+    python benchmarks/bench_compression.py --keys 500 5000 --categories 30
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import json
+import statistics
+import time
+
+ENDPOINTS = ['/wallet', '/get_categories_and_keys', '/export_keys']
+LEVELS = {
+    'gzip': [1, 6, 9],
+    'br': [1, 4, 11],
+    'zstd': [1, 3, 10],
+}
+
+# ================================
+# Functions
+# ================================
+def cpu_ms(func, rounds):
+    """
+    Return the median CPU time of `func` in milliseconds.
+    """
+    timings = []
+    for _ in range(rounds):
+        start = time.process_time()
+        func()
+        timings.append((time.process_time() - start) * 1000)
+    return statistics.median(timings)
+
+def request_ms(client, path, headers, rounds):
+    """
+    Return the median wall-clock latency of GET `path` in milliseconds.
+    """
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        response.get_data()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', type=int, nargs='+', default=[500, 5000], help='Keys per benchmarked wallet')
+    parser.add_argument('--categories', type=int, default=30, help='Categories per wallet')
+    parser.add_argument('--rounds', type=int, default=5, help='Repetitions per measurement')
+    parser.add_argument('--links', type=float, nargs='+', default=[10, 100], help='Link speeds in Mbit/s')
+    parser.add_argument('--database-url', help='Database to benchmark against (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    from common import load_app, login_client
+    flask_app = load_app(args.database_url)
+    from compression import available_encodings, compress_body
+    from seeding import seed_dataset, SEED_PASSWORD
+
+    encodings = available_encodings(['gzip', 'br', 'zstd'])
+    print(f"Encodings: {', '.join(encodings)} (install brotli / zstandard for the others)")
+    results = []
+    for keys in args.keys:
+        with flask_app.app_context():
+            email = seed_dataset(1, args.categories, keys, email_prefix=f'compress{keys}')[0]
+        client = login_client(flask_app, email, SEED_PASSWORD)
+        for path in ENDPOINTS:
+            body = client.get(path, headers={'Accept-Encoding': 'identity'}).get_data()
+            print(f'\n{keys} keys, {path}: {len(body)} bytes uncompressed')
+            header = f"{'encoding':>10} {'bytes':>10} {'ratio':>6} {'cpu ms':>8}"
+            print(header + ''.join(f" {f'{link:g} Mbit/s':>13}" for link in args.links))
+            rows = [('identity', None, body, 0.0)]
+            for encoding in encodings:
+                for level in LEVELS[encoding]:
+                    compressed = compress_body(body, encoding, level)
+                    elapsed = cpu_ms(lambda: compress_body(body, encoding, level), args.rounds)
+                    rows.append((encoding, level, compressed, elapsed))
+            for encoding, level, compressed, elapsed in rows:
+                deliver = {link: elapsed + len(compressed) * 8 / (link * 1000) for link in args.links}
+                name = encoding if level is None else f'{encoding}-{level}'
+                print(f'{name:>10} {len(compressed):>10} {len(body) / len(compressed):>6.1f} {elapsed:>8.2f}'
+                      + ''.join(f' {deliver[link]:>10.1f} ms' for link in args.links))
+                results.append({
+                    'keys': keys, 'endpoint': path, 'encoding': encoding, 'level': level,
+                    'bytes': len(compressed), 'ratio': round(len(body) / len(compressed), 2),
+                    'cpu_ms': round(elapsed, 3),
+                    'deliver_ms': {str(link): round(value, 2) for link, value in deliver.items()},
+                })
+
+        for path in ENDPOINTS:
+            plain = request_ms(client, path, {'Accept-Encoding': 'identity'}, args.rounds)
+            compressed = request_ms(client, path, {'Accept-Encoding': 'gzip, br, zstd'}, args.rounds)
+            print(f'{keys} keys, {path} through the app: {plain:.1f} ms uncompressed, '
+                  f'{compressed:.1f} ms with default compression')
+            results.append({'keys': keys, 'endpoint': path, 'request_ms': {
+                'identity': round(plain, 2), 'default': round(compressed, 2)}})
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+bench_crypto.py - Micro-benchmarks for utils.encrypt_key / decrypt_key
+
+Measures the Fernet layer that runs on every add and reveal:
+- single-call encrypt_key and decrypt_key, for values from 32 B to 64 KB,
+  with decrypt_key given str, bytes and memoryview tokens;
+- batch encrypt_many and decrypt_many, with the crypto pool at several
+  CRYPTO_MAX_WORKERS sizes;
+- logging cost: decrypt_key with logging disabled vs. the app's queue
+  pipeline at DEBUG; a per-call debug record, logged or filtered out by
+  level; and the invalid-token path, which logs an error.
+
+Each measurement is the median of --repeat rounds of at least --min-time
+seconds. Results are printed and can be written as JSON with --output.
+With --baseline, every measurement is compared to an earlier JSON result.
+Any measurement more than --threshold percent slower is reported, and
+makes the script exit with status 1.
+
+Usage:
+    python benchmarks/bench_crypto.py --output crypto.json
+    python benchmarks/bench_crypto.py --baseline crypto.json --threshold 10
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+# ================================
+# Third-party imports
+# ================================
+from cryptography.fernet import Fernet
+
+os.environ.setdefault('ENCRYPTION_KEY', Fernet.generate_key().decode())
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ================================
+# Project imports
+# ================================
+import utils
+from config import config_from_env
+from logging_setup import configure_logging
+
+# ================================
+# Functions
+# ================================
+def measure(func, arg, min_time, repeat, values_per_call=1):
+    """
+    Time repeated calls of `func(arg)`.
+
+    The number of calls per round is calibrated so that a round takes at
+    least `min_time` seconds.
+
+    Args:
+        func (callable): Function to time
+        arg: Argument passed on every call
+        min_time (float): Minimum seconds per round
+        repeat (int): Number of rounds
+        values_per_call (int): Values processed per call, for batch functions
+
+    Returns:
+        dict: Median values per second and microseconds per value
+    """
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func(arg)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 4:
+            break
+        calls *= 4
+    calls = max(1, int(calls * min_time / elapsed))
+
+    rates = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func(arg)
+        rates.append(calls * values_per_call / (time.perf_counter() - start))
+    rate = statistics.median(rates)
+    return {'ops_per_second': round(rate, 1), 'us_per_op': round(1e6 / rate, 3)}
+
+def set_workers(workers):
+    """
+    Resize the crypto pool used by encrypt_many and decrypt_many.
+    """
+    utils.configure_crypto_pool(workers, utils.CRYPTO_BATCH_THRESHOLD)
+
+@contextlib.contextmanager
+def app_logging(level):
+    """
+    Route logging through the app's queue pipeline at `level`, written to /dev/null.
+    """
+    config = config_from_env()
+    config.update({'LOG_LEVEL': level, 'LOG_LEVELS': '', 'LOG_SAMPLE_RATES': ''})
+    logging.disable(logging.NOTSET)
+    # The listener keeps writing after the block, so the file stays open
+    with contextlib.redirect_stderr(open(os.devnull, 'w')):
+        configure_logging(config)
+    try:
+        yield
+    finally:
+        logging.disable(logging.CRITICAL)
+
+def bench_sizes(args, results):
+    for size in args.sizes:
+        plaintext = 'k' * size
+        token = utils.encrypt_key(plaintext)
+        inputs = {'str': token, 'bytes': token.encode(), 'memoryview': memoryview(token.encode())}
+        results[f'encrypt_key/{size}B'] = measure(utils.encrypt_key, plaintext, args.min_time, args.repeat)
+        for kind, value in inputs.items():
+            results[f'decrypt_key/{kind}/{size}B'] = measure(utils.decrypt_key, value, args.min_time, args.repeat)
+
+def bench_batches(args, results):
+    plaintexts = [f'sk-{i:06d}-' + 'k' * (args.batch_value_size - 10) for i in range(args.batch)]
+    tokens = utils.encrypt_many(plaintexts)
+    for workers in args.workers:
+        set_workers(workers)
+        results[f'encrypt_many/{args.batch}x{args.batch_value_size}B/workers={workers}'] = measure(
+            utils.encrypt_many, plaintexts, args.min_time, args.repeat, values_per_call=args.batch)
+        results[f'decrypt_many/{args.batch}x{args.batch_value_size}B/workers={workers}'] = measure(
+            utils.decrypt_many, tokens, args.min_time, args.repeat, values_per_call=args.batch)
+    set_workers(utils.CRYPTO_MAX_WORKERS)
+
+def bench_logging(args, results):
+    token = utils.encrypt_key('k' * 64)
+    invalid = Fernet(Fernet.generate_key()).encrypt(b'k' * 64)
+
+    def decrypt_with_debug_record(value):
+        utils.logger.debug('Decrypting key: %s...', value[:10])
+        return utils.decrypt_key(value)
+
+    def decrypt_invalid(value):
+        try:
+            utils.decrypt_key(value)
+        except Exception:
+            pass
+
+    results['logging/decrypt_key/disabled'] = measure(utils.decrypt_key, token, args.min_time, args.repeat)
+    results['logging/invalid_token/disabled'] = measure(decrypt_invalid, invalid, args.min_time, args.repeat)
+    with app_logging('DEBUG'):
+        results['logging/decrypt_key/debug'] = measure(utils.decrypt_key, token, args.min_time, args.repeat)
+        results['logging/decrypt_key+debug_record/debug'] = measure(
+            decrypt_with_debug_record, token, args.min_time, args.repeat)
+        results['logging/invalid_token/logged'] = measure(decrypt_invalid, invalid, args.min_time, args.repeat)
+    with app_logging('INFO'):
+        results['logging/decrypt_key+debug_record/info'] = measure(
+            decrypt_with_debug_record, token, args.min_time, args.repeat)
+
+def compare(baseline, results, threshold):
+    """
+    Return measurements that are more than `threshold` percent slower than the baseline.
+
+    Args:
+        baseline (dict): Results of an earlier run
+        results (dict): Results of this run
+        threshold (float): Allowed slowdown in percent
+
+    Returns:
+        list: (name, baseline ops/s, current ops/s, change in percent)
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = (current['ops_per_second'] - before['ops_per_second']) / before['ops_per_second'] * 100
+        if change < -threshold:
+            regressions.append((name, before['ops_per_second'], current['ops_per_second'], round(change, 1)))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32, 256, 1024, 4096, 16384, 65536],
+                        help='Plaintext sizes in bytes')
+    parser.add_argument('--batch', type=int, default=1000, help='Values per encrypt_many/decrypt_many call')
+    parser.add_argument('--batch-value-size', type=int, default=64, help='Plaintext size of batch values')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='CRYPTO_MAX_WORKERS values')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per round')
+    parser.add_argument('--repeat', type=int, default=5, help='Rounds per measurement (the median is reported)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare against the JSON results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=10, help='Allowed slowdown in percent')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = {}
+    bench_sizes(args, results)
+    bench_batches(args, results)
+    bench_logging(args, results)
+
+    for name, result in results.items():
+        print(f"{name:>48} {result['ops_per_second']:>12.0f} ops/s {result['us_per_op']:>10.2f} us/op")
+
+    report = {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'min_time': args.min_time,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f)['results'], results, args.threshold)
+        for name, before, current, change in regressions:
+            print(f'REGRESSION {name}: {before:.0f} -> {current:.0f} ops/s ({change}%)')
+        if regressions:
+            sys.exit(1)
+        print(f'No measurement is more than {args.threshold}% slower than {args.baseline}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+bench_envelope.py - Fernet vs. envelope (AES-GCM) encryption
+
+Compares the legacy Fernet scheme (base64 token in a Text column) with
+per-user envelope encryption (raw AES-GCM bytes in a binary column):
+single-call encrypt/decrypt throughput and stored bytes per value, across
+several value sizes.
+
+Usage:
+    python benchmarks/bench_envelope.py --iterations 20000
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+# ================================
+# Third-party imports
+# ================================
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+os.environ.setdefault('ENCRYPTION_KEY', Fernet.generate_key().decode())
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ================================
+# Project imports
+# ================================
+import utils
+
+# Keep decrypt_key's debug logging out of the comparison
+logging.disable(logging.INFO)
+
+# ================================
+# Functions
+# ================================
+def ops_per_second(func, value, iterations):
+    """
+    Time `iterations` calls of `func(value)`.
+
+    Args:
+        func (callable): Function to time
+        value: Argument passed on every call
+        iterations (int): Number of calls
+
+    Returns:
+        float: Calls per second
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(value)
+    return iterations / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000, help='Calls per measurement')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32, 64, 256, 1024, 4096], help='Value sizes in bytes')
+    args = parser.parse_args()
+
+    cipher = AESGCM(utils.generate_data_key())
+    context = b'keyguardian:user:1'
+    results = []
+    for size in args.sizes:
+        plaintext = 'k' * size
+        token = utils.encrypt_key(plaintext)
+        sealed = utils.seal(cipher, plaintext, context)
+        result = {
+            'size': size,
+            'fernet_bytes': len(token),
+            'sealed_bytes': len(sealed),
+            'fernet_encrypt_ops': ops_per_second(utils.encrypt_key, plaintext, args.iterations),
+            'sealed_encrypt_ops': ops_per_second(lambda value: utils.seal(cipher, value, context), plaintext, args.iterations),
+            'fernet_decrypt_ops': ops_per_second(utils.decrypt_key, token, args.iterations),
+            'sealed_decrypt_ops': ops_per_second(lambda value: utils.unseal(cipher, value, context), sealed, args.iterations),
+        }
+        results.append(result)
+        print(f"{size:>6} B: storage {result['fernet_bytes']:>6} -> {result['sealed_bytes']:>6} bytes | "
+              f"encrypt {result['fernet_encrypt_ops']:>9.0f} -> {result['sealed_encrypt_ops']:>9.0f} ops/s | "
+              f"decrypt {result['fernet_decrypt_ops']:>9.0f} -> {result['sealed_decrypt_ops']:>9.0f} ops/s")
+    print(json.dumps({'results': results}))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+bench_export_memory.py - Memory usage of the streaming key export
+
+Seeds users with increasing numbers of keys and measures the peak Python
+heap allocation (tracemalloc) while /export_keys is consumed chunk by chunk.
+With a streaming export the peak stays roughly flat as the key count grows;
+the script exits non-zero if the largest wallet's peak exceeds the smallest
+one's by more than --max-growth.
+
+Usage:
+    python benchmarks/bench_export_memory.py --sizes 1000 10000 100000
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import json
+import sys
+import tracemalloc
+
+# ================================
+# Project imports
+# ================================
+from common import load_app, login_client
+
+# ================================
+# Functions
+# ================================
+def measure_export(client):
+    """
+    Consume /export_keys chunk by chunk and record the peak heap usage.
+
+    Args:
+        client (FlaskClient): Logged-in test client
+
+    Returns:
+        tuple: (peak bytes allocated, response bytes streamed)
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    response = client.get('/export_keys', buffered=False)
+    streamed = 0
+    for chunk in response.response:
+        streamed += len(chunk)
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, streamed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Keys per user to test')
+    parser.add_argument('--database-url', default=None, help='Database to seed (default: temporary SQLite)')
+    parser.add_argument('--max-growth', type=float, default=3.0, help='Allowed peak ratio largest/smallest')
+    args = parser.parse_args()
+
+    flask_app = load_app(args.database_url)
+    from seeding import seed_dataset, SEED_PASSWORD
+
+    results = []
+    for size in sorted(args.sizes):
+        with flask_app.app_context():
+            email = seed_dataset(1, 10, size)[0]
+        peak, streamed = measure_export(login_client(flask_app, email, SEED_PASSWORD))
+        results.append({'keys': size, 'peak_bytes': peak, 'response_bytes': streamed})
+        print(f'{size:>9} keys: peak {peak / 1024:9.1f} KiB, streamed {streamed / 1024:10.1f} KiB')
+
+    growth = results[-1]['peak_bytes'] / max(results[0]['peak_bytes'], 1)
+    print(json.dumps({'results': results, 'peak_growth': round(growth, 2)}))
+    if growth > args.max_growth:
+        print(f'Peak memory grew {growth:.1f}x (limit {args.max_growth}x)', file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
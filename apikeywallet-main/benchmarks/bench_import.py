@@ -0,0 +1,125 @@
+"""
+bench_import.py - Bulk import throughput
+
+Generates a CSV, JSON or .env file with many keys (100k by default) spread
+over a set of categories, uploads it to /import_keys and reports rows per
+second and SQL statements issued. For comparison, a small sample is also
+added one key at a time through the /add_key form.
+
+Usage:
+    python benchmarks/bench_import.py --rows 100000 --format csv
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+
+# ================================
+# Third-party imports
+# ================================
+from sqlalchemy import func, select
+
+# ================================
+# Project imports
+# ================================
+from common import load_app, login_client, count_queries
+
+# ================================
+# Functions
+# ================================
+def build_file(file_format, rows, categories):
+    """
+    Build an import file in memory.
+
+    Args:
+        file_format (str): json, csv or env
+        rows (int): Number of keys
+        categories (int): Number of distinct categories (ignored for env)
+
+    Returns:
+        bytes: File contents
+    """
+    records = [
+        {'key_name': f'Service {i:07d}', 'value': f'sk-import-{i:07d}-' + 'x' * 32,
+         'category': f'Team {i % categories}' if categories else ''}
+        for i in range(rows)
+    ]
+    if file_format == 'json':
+        return json.dumps(records).encode()
+    if file_format == 'env':
+        return ''.join(f"SERVICE_{i:07d}={record['value']}\n" for i, record in enumerate(records)).encode()
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=['key_name', 'value', 'category'])
+    writer.writeheader()
+    writer.writerows(records)
+    return buffer.getvalue().encode()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000, help='Keys in the import file')
+    parser.add_argument('--categories', type=int, default=50, help='Distinct categories in the file')
+    parser.add_argument('--format', dest='file_format', choices=['json', 'csv', 'env'], default='csv')
+    parser.add_argument('--baseline-rows', type=int, default=200, help='Keys added one by one via /add_key')
+    parser.add_argument('--database-url', help='Database to benchmark against (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    flask_app = load_app(args.database_url)
+    from app import db
+    from models import APIKey
+    from seeding import seed_dataset, SEED_PASSWORD
+
+    with flask_app.app_context():
+        email = seed_dataset(1, 0, 0)[0]
+    client = login_client(flask_app, email, SEED_PASSWORD)
+
+    start = time.perf_counter()
+    for i in range(args.baseline_rows):
+        client.post('/add_key', data={'key_name': f'Manual {i}', 'api_key': f'sk-manual-{i}', 'category': 0})
+    baseline_rate = args.baseline_rows / (time.perf_counter() - start) if args.baseline_rows else 0.0
+
+    payload = build_file(args.file_format, args.rows, args.categories)
+    filename = '.env' if args.file_format == 'env' else f'keys.{args.file_format}'
+    with flask_app.app_context():
+        engine = db.engine
+    with count_queries(engine) as statements:
+        start = time.perf_counter()
+        response = client.post('/import_keys', data={'file': (io.BytesIO(payload), filename)},
+                               content_type='multipart/form-data')
+        elapsed = time.perf_counter() - start
+    report = response.get_json()
+
+    with flask_app.app_context():
+        stored = db.session.execute(select(func.count()).select_from(APIKey)).scalar() - args.baseline_rows
+
+    result = {
+        'format': args.file_format,
+        'rows': args.rows,
+        'file_bytes': len(payload),
+        'created': report.get('created'),
+        'failed': report.get('failed'),
+        'categories_created': report.get('categories_created'),
+        'stored': stored,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(args.rows / elapsed),
+        'statements': len(statements),
+        'add_key_rows_per_second': round(baseline_rate),
+    }
+    print(f"Imported {result['created']} of {args.rows} keys from {len(payload) / 1e6:.1f} MB of "
+          f"{args.file_format} in {elapsed:.1f}s ({result['rows_per_second']} rows/s, "
+          f"{result['statements']} SQL statements)")
+    print(f"/add_key one at a time: {result['add_key_rows_per_second']} rows/s")
+    print(json.dumps(result))
+    if response.status_code != 200 or report.get('failed') or stored != args.rows:
+        print('Import did not store every row', file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+bench_login_storm.py - Wallet latency during a concurrent login storm
+
+Serves the app with a threaded HTTP server. Many threads then hammer
+/login with wrong passwords (a credential-stuffing wave) while one client
+keeps loading its /wallet page. The wallet's p50/p95 latency is reported
+with no storm, with password hashing inline on the request threads, and
+with hashing on the bounded, admission-controlled pool. The outcome of
+every login attempt (rejected vs. shed with 503) is counted too.
+
+Usage:
+    python benchmarks/bench_login_storm.py --storm-threads 16 --duration 10
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+import urllib.parse
+from collections import Counter
+
+# ================================
+# Third-party imports
+# ================================
+from werkzeug.serving import make_server
+
+# ================================
+# Project imports
+# ================================
+from common import load_app
+
+# ================================
+# Functions
+# ================================
+def post_form(port, path, fields, cookie=None):
+    """
+    POST a form over HTTP and return (status, Set-Cookie header).
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    if cookie:
+        headers['Cookie'] = cookie
+    connection.request('POST', path, urllib.parse.urlencode(fields), headers)
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status, response.getheader('Set-Cookie')
+
+def get(port, path, cookie):
+    """
+    GET a page over HTTP and return its status.
+    """
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    connection.request('GET', path, headers={'Cookie': cookie})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    return response.status
+
+def run_scenario(port, cookie, email, storm_threads, duration):
+    """
+    Probe /wallet latency while `storm_threads` threads attempt logins.
+
+    Returns:
+        dict: Wallet latency percentiles and login outcome counts
+    """
+    stop = threading.Event()
+    outcomes = Counter()
+    lock = threading.Lock()
+
+    def storm():
+        while not stop.is_set():
+            status, _ = post_form(port, '/login', {'email': email, 'password': 'wrong-password'})
+            with lock:
+                outcomes[status] += 1
+
+    threads = [threading.Thread(target=storm, daemon=True) for _ in range(storm_threads)]
+    for thread in threads:
+        thread.start()
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        status = get(port, '/wallet', cookie)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if status != 200:
+            raise RuntimeError(f'/wallet returned HTTP {status}')
+        time.sleep(0.05)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'wallet_requests': len(latencies),
+        'wallet_p50_ms': round(statistics.median(latencies), 1),
+        'wallet_p95_ms': round(latencies[int(len(latencies) * 0.95) - 1], 1),
+        'login_attempts': sum(outcomes.values()),
+        'login_outcomes': {str(status): count for status, count in sorted(outcomes.items())},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--storm-threads', type=int, default=16, help='Concurrent login threads')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per scenario')
+    parser.add_argument('--hash-workers', type=int, default=1, help='PASSWORD_HASH_WORKERS for the bounded scenario')
+    parser.add_argument('--max-pending', type=int, default=4, help='PASSWORD_HASH_MAX_PENDING for the bounded scenario')
+    parser.add_argument('--queue-timeout', type=float, default=0.25, help='PASSWORD_HASH_QUEUE_TIMEOUT for the bounded scenario')
+    parser.add_argument('--database-url', help='Database to benchmark against (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    flask_app = load_app(args.database_url)
+    from seeding import seed_dataset, SEED_PASSWORD
+    from password_hashing import PasswordHasher
+
+    with flask_app.app_context():
+        email = seed_dataset(1, 5, 100)[0]
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    status, set_cookie = post_form(port, '/login', {'email': email, 'password': SEED_PASSWORD})
+    if status != 302 or not set_cookie:
+        raise RuntimeError(f'Login failed: HTTP {status}')
+    cookie = set_cookie.split(';', 1)[0]
+
+    scenarios = {
+        'no_storm': (None, 0),
+        'inline_hashing': (PasswordHasher(0, 0, 0), args.storm_threads),
+        'bounded_hashing': (PasswordHasher(args.hash_workers, args.max_pending, args.queue_timeout), args.storm_threads),
+    }
+    results = {}
+    for name, (hasher, storm_threads) in scenarios.items():
+        if hasher is not None:
+            flask_app.extensions['password_hasher'] = hasher
+        results[name] = run_scenario(port, cookie, email, storm_threads, args.duration)
+        result = results[name]
+        print(f"{name:>16}: wallet p50 {result['wallet_p50_ms']:7.1f} ms, p95 {result['wallet_p95_ms']:7.1f} ms; "
+              f"{result['login_attempts']} logins {result['login_outcomes']}")
+    server.shutdown()
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+bench_search.py - Type-ahead search latency at large wallet sizes
+
+Seeds one user with --keys keys (50k by default) whose names mix provider,
+environment and service words. It then measures:
+- the time to build the in-memory index;
+- per-query latency of SearchIndex.search, by query shape (one letter,
+  prefix, word prefix, substring, several words, no match);
+- the same queries answered by the LIKE fallback (search_database);
+- end-to-end /search requests through the Flask test client;
+- the cost of incremental updates (rename, add, delete).
+
+Usage:
+    python benchmarks/bench_search.py --keys 50000 --rounds 200
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime
+
+PROVIDERS = ['OpenAI', 'Stripe', 'Twilio', 'GitHub', 'AWS', 'Azure', 'SendGrid', 'Mailgun', 'Slack', 'Datadog',
+             'Cloudflare', 'Anthropic', 'Google Maps', 'Firebase', 'Heroku', 'Algolia', 'Sentry', 'PagerDuty']
+ENVIRONMENTS = ['production', 'staging', 'dev', 'test', 'sandbox', 'ci']
+PURPOSES = ['billing', 'webhooks', 'analytics', 'backup', 'deploy', 'search', 'notifications', 'reporting']
+
+QUERIES = {
+    'one_letter': 's',
+    'prefix': 'stri',
+    'exact_word': 'twilio',
+    'word_prefix': 'webh',
+    'substring': 'lgol',
+    'two_words': 'aws prod',
+    'no_match': 'zzzq',
+}
+
+# ================================
+# Functions
+# ================================
+def latency(func, rounds):
+    """
+    Call `func` repeatedly and return p50/p99 latency in milliseconds.
+    """
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p99_ms': round(timings[max(int(len(timings) * 0.99) - 1, 0)], 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', type=int, default=50000, help='Keys owned by the benchmark user')
+    parser.add_argument('--categories', type=int, default=50, help='Categories owned by the benchmark user')
+    parser.add_argument('--rounds', type=int, default=200, help='Calls per measurement')
+    parser.add_argument('--database-url', help='Database to benchmark against (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    from common import load_app, login_client
+    flask_app = load_app(args.database_url)
+    from sqlalchemy import insert
+    from app import db
+    from models import APIKey, Category
+    import search_index
+    from seeding import seed_dataset, SEED_PASSWORD
+
+    rng = random.Random(42)
+    with flask_app.app_context():
+        email = seed_dataset(1, 0, 0)[0]
+        from models import User
+        user_id = db.session.query(User.id).filter_by(email=email).scalar()
+        db.session.execute(insert(Category), [
+            {'name': f'{rng.choice(PROVIDERS)} {rng.choice(ENVIRONMENTS)} {c}', 'user_id': user_id}
+            for c in range(args.categories)
+        ])
+        db.session.execute(insert(APIKey), [
+            {'user_id': user_id, 'date_added': datetime.utcnow(), 'ciphertext': b'',
+             'key_name': f'{rng.choice(PROVIDERS)} {rng.choice(ENVIRONMENTS)} {rng.choice(PURPOSES)} {k}'}
+            for k in range(args.keys)
+        ])
+        db.session.commit()
+
+        start = time.perf_counter()
+        index = search_index.build_index(user_id)
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f'Built index of {len(index)} names in {build_ms:.0f} ms')
+
+        results = {'keys': args.keys, 'build_ms': round(build_ms, 1), 'index': {}, 'database': {}}
+        for name, query in QUERIES.items():
+            hits = len(index.search(query, 20))
+            results['index'][name] = latency(lambda: index.search(query, 20), args.rounds)
+            results['database'][name] = latency(lambda: search_index.search_database(user_id, query, 20),
+                                                max(args.rounds // 10, 5))
+            print(f"{name:>12} {query!r:>12} {hits:>3} hits | index p50 {results['index'][name]['p50_ms']:>7} ms "
+                  f"p99 {results['index'][name]['p99_ms']:>7} ms | LIKE p50 {results['database'][name]['p50_ms']:>8} ms")
+
+        key_ids = [row[0] for row in db.session.query(APIKey.id).filter_by(user_id=user_id).limit(args.rounds)]
+        next_id = max(index._names) + 1
+        renames = iter([[('key', key_id, f'Renamed {rng.choice(PROVIDERS)} {key_id}', None)] for key_id in key_ids])
+        adds = iter([[('key', next_id + i, f'New {rng.choice(PROVIDERS)} key {i}', None)] for i in range(args.rounds)])
+        deletes = iter([[('key_deleted', key_id, None, None)] for key_id in key_ids])
+        results['updates'] = {
+            'rename': latency(lambda: index.apply(next(renames), index.version), len(key_ids)),
+            'add': latency(lambda: index.apply(next(adds), index.version), args.rounds),
+            'delete': latency(lambda: index.apply(next(deletes), index.version), len(key_ids)),
+        }
+        for name, result in results['updates'].items():
+            print(f"{name:>12} update p50 {result['p50_ms']:>7} ms p99 {result['p99_ms']:>7} ms")
+
+        # Put the index back in line with the database for the HTTP run
+        search_index.build_index(user_id)
+
+    client = login_client(flask_app, email, SEED_PASSWORD)
+    source = client.get('/search?q=stri').get_json()['source']
+    results['http'] = latency(lambda: client.get('/search?q=stri'), args.rounds)
+    print(f"/search end to end ({source}): p50 {results['http']['p50_ms']} ms p99 {results['http']['p99_ms']} ms")
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+bench_startup.py - Cold start time of a worker process
+
+Starts fresh Python processes and times each cold-start phase: importing
+app.py, building the app with create_app, and serving a first request
+(GET /login) and a first authenticated request (GET /wallet). This is the
+cost every worker boot, recycle or autoscaled instance pays. Medians over
+several runs are reported.
+
+The database is created and seeded once up front, as migrations would do,
+so the timed processes only connect to it.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 10
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# ================================
+# Project imports
+# ================================
+from common import PROJECT_DIR, load_app
+
+# Runs in a fresh interpreter and prints the phase timings as JSON
+CHILD = r'''
+import json, logging, sys, time
+start = time.perf_counter()
+sys.path.insert(0, PROJECT_DIR)
+import app as app_module
+imported = time.perf_counter()
+flask_app = app_module.create_app({'SQLALCHEMY_DATABASE_URI': DATABASE_URL, 'WTF_CSRF_ENABLED': False})
+created = time.perf_counter()
+logging.disable(logging.WARNING)
+client = flask_app.test_client()
+assert client.get('/login').status_code == 200
+first_request = time.perf_counter()
+assert client.post('/login', data={'email': EMAIL, 'password': PASSWORD}).status_code == 302
+logged_in = time.perf_counter()
+assert client.get('/wallet').status_code == 200
+wallet = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first_request - created) * 1000,
+    'first_wallet_ms': (wallet - logged_in) * 1000,
+    'ready_ms': (first_request - start) * 1000,
+}))
+'''
+
+# ================================
+# Functions
+# ================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='Cold starts to measure')
+    parser.add_argument('--database-url', help='Database to benchmark against (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='keyguardian-bench-'), 'bench.db')
+    flask_app = load_app(database_url)
+    from seeding import seed_dataset, SEED_PASSWORD
+    with flask_app.app_context():
+        email = seed_dataset(1, 5, 100)[0]
+
+    child = CHILD.replace('PROJECT_DIR', repr(PROJECT_DIR)).replace('DATABASE_URL', repr(database_url))
+    child = child.replace('EMAIL', repr(email)).replace('PASSWORD', repr(SEED_PASSWORD))
+    env = {**os.environ, 'PASSWORD_HASH_WORKERS': '0'}
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', child], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    results = {phase: round(statistics.median(run[phase] for run in runs), 1) for phase in runs[0]}
+    for phase, value in results.items():
+        print(f'{phase:>18}: {value:8.1f} ms (median of {args.runs})')
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+bench_token_auth.py - Access token vs. session authentication
+
+Measures authenticated requests per second and SQL statements per request
+for the same JSON API calls made with a session cookie, with a bearer
+token, and by logging in with a password before each request (what
+automation did before access tokens existed). Both the conditional 304
+path, which is dominated by authentication, and full responses are timed.
+
+Usage:
+    python benchmarks/bench_token_auth.py --requests 2000 --keys 200
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import json
+import time
+
+# ================================
+# Project imports
+# ================================
+from common import load_app, login_client, count_queries
+
+# ================================
+# Functions
+# ================================
+def measure(engine, requests, call):
+    """
+    Time `requests` calls and count the SQL statements they issue.
+
+    Args:
+        engine (Engine): Engine to count statements on
+        requests (int): Number of calls
+        call (callable): Makes one request and returns the response
+
+    Returns:
+        dict: requests_per_second and statements_per_request
+    """
+    with count_queries(engine) as statements:
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = call()
+            if response.status_code not in (200, 304):
+                raise RuntimeError(f'Unexpected HTTP {response.status_code}')
+        elapsed = time.perf_counter() - start
+    return {
+        'requests_per_second': round(requests / elapsed),
+        'statements_per_request': round(len(statements) / requests, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per scenario')
+    parser.add_argument('--login-requests', type=int, default=50, help='Requests for the login-per-request scenario')
+    parser.add_argument('--keys', type=int, default=200, help='Keys owned by the benchmark user')
+    parser.add_argument('--database-url', help='Database to benchmark against (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    flask_app = load_app(args.database_url)
+    from app import db
+    from seeding import seed_dataset, SEED_PASSWORD
+
+    with flask_app.app_context():
+        email = seed_dataset(1, 5, args.keys)[0]
+        engine = db.engine
+    session_client = login_client(flask_app, email, SEED_PASSWORD)
+    token = session_client.post('/api/v1/tokens', json={'name': 'benchmark'}).get_json()['token']
+    token_client = flask_app.test_client()
+    bearer = {'Authorization': f'Bearer {token}'}
+
+    url = f'/api/v1/keys?limit={min(args.keys, 100)}'
+    session_etag = session_client.get(url).headers['ETag']
+    token_etag = token_client.get(url, headers=bearer).headers['ETag']
+
+    def login_then_get():
+        client = flask_app.test_client()
+        client.post('/login', data={'email': email, 'password': SEED_PASSWORD})
+        return client.get(url)
+
+    results = {
+        'session_304': measure(engine, args.requests, lambda: session_client.get(url, headers={'If-None-Match': session_etag})),
+        'token_304': measure(engine, args.requests, lambda: token_client.get(url, headers={**bearer, 'If-None-Match': token_etag})),
+        'session_200': measure(engine, args.requests, lambda: session_client.get(url)),
+        'token_200': measure(engine, args.requests, lambda: token_client.get(url, headers=bearer)),
+        'password_login_200': measure(engine, args.login_requests, login_then_get),
+    }
+    for name, result in results.items():
+        print(f"{name:>20}: {result['requests_per_second']:>6} req/s, {result['statements_per_request']} SQL statements/request")
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
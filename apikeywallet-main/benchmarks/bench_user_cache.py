@@ -0,0 +1,99 @@
+"""
+bench_user_cache.py - SQL statements saved by the user loader cache
+
+Logs in one seeded user and replays the wallet's AJAX calls (/copy_key,
+/get_key, /get_keys_page) plus the /wallet page. Each is run with the user
+loader cache enabled and with it disabled (USER_CACHE_TTL=0, which runs
+the user query on every request). The output is SQL statements per request
+and requests per second. Since the cache is configured at import time,
+each scenario runs in its own subprocess.
+
+Usage:
+    python benchmarks/bench_user_cache.py --requests 2000
+    python benchmarks/bench_user_cache.py --scenario cached   # one scenario only
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# ================================
+# Functions
+# ================================
+def run_scenario(args):
+    """
+    Measure each endpoint in this process and print a JSON result line.
+    """
+    from common import load_app, login_client, count_queries
+
+    flask_app = load_app(args.database_url)
+    from app import db
+    from models import APIKey
+    from seeding import seed_dataset, SEED_PASSWORD
+
+    with flask_app.app_context():
+        email = seed_dataset(1, 5, 200)[0]
+        key_id = db.session.query(APIKey.id).order_by(APIKey.id).first()[0]
+        engine = db.engine
+    client = login_client(flask_app, email, SEED_PASSWORD)
+
+    calls = {
+        'copy_key': lambda: client.post(f'/copy_key/{key_id}'),
+        'get_key': lambda: client.post(f'/get_key/{key_id}'),
+        'get_keys_page': lambda: client.get('/get_keys_page?limit=50'),
+        'wallet': lambda: client.get('/wallet'),
+    }
+    results = {}
+    for name, call in calls.items():
+        call()
+        with count_queries(engine) as statements:
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                response = call()
+                if response.status_code != 200:
+                    raise RuntimeError(f'{name} returned HTTP {response.status_code}')
+            elapsed = time.perf_counter() - start
+        results[name] = {
+            'requests_per_second': round(args.requests / elapsed),
+            'statements_per_request': round(len(statements) / args.requests, 2),
+        }
+    print(json.dumps(results))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint')
+    parser.add_argument('--scenario', choices=('cached', 'uncached'), help='Run a single scenario in this process')
+    parser.add_argument('--database-url', help='Database to benchmark against (default: temporary SQLite)')
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_scenario(args)
+        return
+
+    results = {}
+    for scenario, ttl in (('uncached', '0'), ('cached', '60')):
+        command = [sys.executable, __file__, '--scenario', scenario, '--requests', str(args.requests)]
+        if args.database_url:
+            command += ['--database-url', args.database_url]
+        output = subprocess.run(command, env={**os.environ, 'USER_CACHE_TTL': ttl},
+                                check=True, capture_output=True, text=True).stdout
+        results[scenario] = json.loads(output.strip().splitlines()[-1])
+
+    for endpoint in results['cached']:
+        before, after = results['uncached'][endpoint], results['cached'][endpoint]
+        saved = before['statements_per_request'] - after['statements_per_request']
+        print(f"{endpoint:>14}: {before['statements_per_request']:5.2f} -> {after['statements_per_request']:5.2f} "
+              f"statements/request (saved {saved:.2f}); {before['requests_per_second']} -> "
+              f"{after['requests_per_second']} req/s")
+    print(json.dumps(results))
+
+if __name__ == '__main__':
+    main()
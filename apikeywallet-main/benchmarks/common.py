@@ -0,0 +1,102 @@
+"""
+common.py - Shared setup for benchmark scripts
+
+Boots the KeyGuardian app against a throwaway SQLite database (or the
+database given with --database-url) and provides helpers for logged-in
+test clients and query counting.
+
+Dependencies:
+- Flask
+- SQLAlchemy
+- cryptography
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import logging
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+# ================================
+# Third-party imports
+# ================================
+from cryptography.fernet import Fernet
+from sqlalchemy import event
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ================================
+# Functions
+# ================================
+def load_app(database_url=None):
+    """
+    Create the app configured for benchmarking and create its tables.
+
+    The database URL is passed to create_app. ENCRYPTION_KEY and SECRET_KEY
+    go through the environment, which is where utils.py and config.py read
+    them.
+
+    Args:
+        database_url (str, optional): Database to use; defaults to a temporary SQLite file
+
+    Returns:
+        Flask: Configured application
+    """
+    if database_url is None:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='keyguardian-bench-'), 'bench.db')
+    os.environ.setdefault('ENCRYPTION_KEY', Fernet.generate_key().decode())
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+    sys.path.insert(0, PROJECT_DIR)
+
+    from app import create_app, db
+    import models  # noqa: F401 - registers the tables on db.metadata
+    flask_app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'WTF_CSRF_ENABLED': False})
+    logging.disable(logging.WARNING)
+    with flask_app.app_context():
+        db.create_all()
+    return flask_app
+
+def login_client(flask_app, email, password):
+    """
+    Return a test client logged in as the given user.
+
+    Args:
+        flask_app (Flask): Application
+        email (str): User email
+        password (str): User password
+
+    Returns:
+        FlaskClient: Logged-in test client
+    """
+    client = flask_app.test_client()
+    response = client.post('/login', data={'email': email, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f'Login failed for {email}: HTTP {response.status_code}')
+    return client
+
+@contextmanager
+def count_queries(engine):
+    """
+    Count SQL statements executed on `engine` inside the block.
+
+    Args:
+        engine (Engine): SQLAlchemy engine
+
+    Yields:
+        list: Executed statements, filled as the block runs
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
@@ -0,0 +1,453 @@
+"""
+loadtest.py - End-to-end load test with seeded wallets and latency percentiles
+
+Seeds a database with a synthetic population (users x categories x keys,
+bulk-loaded with COPY on PostgreSQL). Concurrent clients then drive real HTTP
+traffic against the app, each logged in as one seeded user with its own
+cookie session. Each client repeatedly picks an operation from a weighted
+mix:
+
+- wallet, get_categories_and_keys, get_key, copy_key, update_key_category
+- add_key: fetches the form for its CSRF token, then posts it
+- login and register: run on a fresh session, including the form and
+  CSRF round trip
+
+For each endpoint the run reports request count, throughput, error rate and
+p50/p95/p99/mean latency. Form pages are reported separately, e.g.
+"login (form)". With --output, results are written as JSON together with the
+commit, population and settings. With --baseline, they are compared to an
+earlier run; --fail-on-regression exits non-zero if an endpoint got slower or
+less reliable beyond --threshold.
+
+By default, the app is served in-process on a threaded server against a
+temporary SQLite database. Use --database-url for PostgreSQL, and --base-url
+to target an already running server on that database.
+
+Usage:
+    python benchmarks/loadtest.py --users 200 --keys 500 --clients 16 --duration 30 --output run.json
+    python benchmarks/loadtest.py ... --baseline run.json --threshold 10 --fail-on-regression
+    python benchmarks/loadtest.py --compare old.json new.json
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import argparse
+import http.client
+import json
+import math
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+
+# ================================
+# Project imports
+# ================================
+from common import PROJECT_DIR, load_app
+
+DEFAULT_MIX = {
+    'wallet': 10,
+    'get_categories_and_keys': 10,
+    'get_key': 20,
+    'copy_key': 20,
+    'update_key_category': 5,
+    'add_key': 5,
+    'login': 1,
+    'register': 1,
+}
+
+CSRF_PATTERN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+# ================================
+# Classes
+# ================================
+class Client:
+    """
+    One HTTP/1.1 keep-alive connection with its own cookie jar.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookies = {}
+        self.connection = None
+
+    def request(self, method, path, body=None, content_type=None):
+        """
+        Send a request and return (status, body), reconnecting once if the server closed the connection.
+        """
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if content_type:
+            headers['Content-Type'] = content_type
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.connection.request(method, path, body, headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        for header in response.headers.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response.status, data
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+class Recorder:
+    """
+    Thread-safe collection of per-endpoint latencies and outcomes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = Counter()
+        self.statuses = {}
+        self.recording = False
+
+    def timed(self, client, endpoint, expected, method, path, body=None, content_type=None):
+        """
+        Make a request, record its latency and whether it returned the expected status.
+
+        Returns:
+            tuple: (status, body); status is None if the request failed at the socket level
+        """
+        start = time.perf_counter()
+        try:
+            status, data = client.request(method, path, body, content_type)
+        except OSError:
+            status, data = None, b''
+        elapsed = (time.perf_counter() - start) * 1000
+        if self.recording:
+            with self._lock:
+                self.latencies.setdefault(endpoint, []).append(elapsed)
+                self.statuses.setdefault(endpoint, Counter())[str(status)] += 1
+                if status != expected:
+                    self.errors[endpoint] += 1
+        return status, data
+
+    def summary(self, elapsed):
+        """
+        Summarise the recorded requests per endpoint and overall.
+
+        Args:
+            elapsed (float): Length of the measured window in seconds
+
+        Returns:
+            dict: endpoints and total statistics
+        """
+        endpoints = {name: _stats(latencies, self.errors[name], elapsed, self.statuses[name])
+                     for name, latencies in sorted(self.latencies.items())}
+        everything = [value for latencies in self.latencies.values() for value in latencies]
+        total = _stats(everything, sum(self.errors.values()), elapsed, sum(self.statuses.values(), Counter()))
+        return {'endpoints': endpoints, 'total': total}
+
+class VirtualUser:
+    """
+    A logged-in client working through the operation mix as one seeded user.
+    """
+
+    def __init__(self, host, port, email, password, recorder):
+        self.host = host
+        self.port = port
+        self.email = email
+        self.password = password
+        self.recorder = recorder
+        self.client = Client(host, port)
+        self.key_ids = []
+        self.category_ids = []
+
+    def start(self):
+        """
+        Log in and learn the user's key and category IDs (not recorded).
+        """
+        if not _login(self.client, self.email, self.password, self.recorder, record_as=None):
+            raise RuntimeError(f'Could not log in as {self.email}')
+        status, data = self.client.request('GET', '/get_categories_and_keys')
+        self._learn(data)
+
+    def _learn(self, data):
+        payload = json.loads(data)
+        self.category_ids = [category['id'] for category in payload['categories']]
+        self.key_ids = [key['id'] for keys in payload['grouped_keys'].values() for key in keys]
+
+    def wallet(self):
+        self.recorder.timed(self.client, 'wallet', 200, 'GET', '/wallet')
+
+    def get_categories_and_keys(self):
+        status, data = self.recorder.timed(self.client, 'get_categories_and_keys', 200, 'GET', '/get_categories_and_keys')
+        if status == 200:
+            self._learn(data)
+
+    def get_key(self):
+        self.recorder.timed(self.client, 'get_key', 200, 'POST', f'/get_key/{random.choice(self.key_ids)}')
+
+    def copy_key(self):
+        self.recorder.timed(self.client, 'copy_key', 200, 'POST', f'/copy_key/{random.choice(self.key_ids)}')
+
+    def update_key_category(self):
+        body = json.dumps({'category_id': random.choice(self.category_ids + [0])})
+        self.recorder.timed(self.client, 'update_key_category', 200, 'POST',
+                            f'/update_key_category/{random.choice(self.key_ids)}', body, 'application/json')
+
+    def add_key(self):
+        status, data = self.recorder.timed(self.client, 'add_key (form)', 200, 'GET', '/add_key')
+        token = _csrf_token(data)
+        fields = {'csrf_token': token, 'key_name': f'Load test {uuid.uuid4().hex[:12]}',
+                  'api_key': 'sk-load-' + uuid.uuid4().hex, 'category': '0'}
+        self.recorder.timed(self.client, 'add_key', 302, 'POST', '/add_key',
+                            urllib.parse.urlencode(fields), 'application/x-www-form-urlencoded')
+
+    def login(self):
+        client = Client(self.host, self.port)
+        try:
+            _login(client, self.email, self.password, self.recorder, record_as='login')
+        finally:
+            client.close()
+
+    def register(self):
+        client = Client(self.host, self.port)
+        try:
+            status, data = self.recorder.timed(client, 'register (form)', 200, 'GET', '/register')
+            password = 'load-test-password'
+            fields = {'csrf_token': _csrf_token(data), 'email': f'load-{uuid.uuid4().hex}@example.com',
+                      'password': password, 'confirm_password': password}
+            self.recorder.timed(client, 'register', 302, 'POST', '/register',
+                                urllib.parse.urlencode(fields), 'application/x-www-form-urlencoded')
+        finally:
+            client.close()
+
+# ================================
+# Functions
+# ================================
+def _csrf_token(html):
+    match = CSRF_PATTERN.search(html.decode('utf-8', 'replace'))
+    return match.group(1) if match else ''
+
+def _login(client, email, password, recorder, record_as):
+    """
+    Log a client in through the login form; returns True on success.
+    """
+    if record_as is None:
+        status, data = client.request('GET', '/login')
+        fields = {'csrf_token': _csrf_token(data), 'email': email, 'password': password}
+        status, _ = client.request('POST', '/login', urllib.parse.urlencode(fields), 'application/x-www-form-urlencoded')
+        return status == 302
+    status, data = recorder.timed(client, f'{record_as} (form)', 200, 'GET', '/login')
+    fields = {'csrf_token': _csrf_token(data), 'email': email, 'password': password}
+    status, _ = recorder.timed(client, record_as, 302, 'POST', '/login',
+                               urllib.parse.urlencode(fields), 'application/x-www-form-urlencoded')
+    return status == 302
+
+def _percentile(ordered, percent):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+def _stats(latencies, errors, elapsed, statuses):
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        'requests': count,
+        'throughput_rps': round(count / elapsed, 2),
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'p50_ms': round(_percentile(ordered, 50), 2) if count else None,
+        'p95_ms': round(_percentile(ordered, 95), 2) if count else None,
+        'p99_ms': round(_percentile(ordered, 99), 2) if count else None,
+        'mean_ms': round(sum(ordered) / count, 2) if count else None,
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+def parse_mix(value):
+    """
+    Parse "wallet=10,get_key=20" into operation weights.
+    """
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown operation {name.strip()!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline, current, threshold):
+    """
+    Print per-endpoint changes between two runs and return the regressions.
+
+    An endpoint regresses if its p95 latency grows or its throughput drops by
+    more than `threshold` percent, or its error rate increases by more than
+    one percentage point.
+
+    Args:
+        baseline (dict): Earlier results
+        current (dict): New results
+        threshold (float): Allowed change in percent
+
+    Returns:
+        list: Descriptions of regressions
+    """
+    regressions = []
+    print(f"{'endpoint':>28} {'p95 ms':>18} {'req/s':>18} {'errors':>15}")
+    for name, now in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None or not before['requests'] or not now['requests']:
+            continue
+        p95_change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+        rps_change = (now['throughput_rps'] - before['throughput_rps']) / before['throughput_rps'] * 100
+        print(f"{name:>28} {before['p95_ms']:>8} -> {now['p95_ms']:<7} {before['throughput_rps']:>8} -> {now['throughput_rps']:<7} "
+              f"{before['error_rate']:>6.2%} -> {now['error_rate']:<6.2%}")
+        if p95_change > threshold:
+            regressions.append(f'{name}: p95 latency up {p95_change:.1f}%')
+        if rps_change < -threshold:
+            regressions.append(f'{name}: throughput down {-rps_change:.1f}%')
+        if now['error_rate'] - before['error_rate'] > 0.01:
+            regressions.append(f"{name}: error rate {before['error_rate']:.2%} -> {now['error_rate']:.2%}")
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return regressions
+
+def run(args):
+    """
+    Seed the population, drive the load and return the results.
+    """
+    from werkzeug.serving import make_server
+
+    flask_app = load_app(args.database_url)
+    from seeding import seed_dataset, SEED_PASSWORD
+    seed_start = time.perf_counter()
+    with flask_app.app_context():
+        emails = seed_dataset(args.users, args.categories, args.keys)
+    seed_seconds = time.perf_counter() - seed_start
+    print(f'Seeded {args.users} users x {args.categories} categories x {args.keys} keys in {seed_seconds:.1f}s')
+
+    server = None
+    if args.base_url:
+        url = urllib.parse.urlsplit(args.base_url)
+        host, port = url.hostname, url.port or 80
+    else:
+        flask_app.config['WTF_CSRF_ENABLED'] = True
+        server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+        host, port = '127.0.0.1', server.server_port
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    recorder = Recorder()
+    users = [VirtualUser(host, port, emails[i % len(emails)], SEED_PASSWORD, recorder) for i in range(args.clients)]
+    for user in users:
+        user.start()
+
+    operations = list(args.mix)
+    weights = [args.mix[name] for name in operations]
+    stop = threading.Event()
+
+    def drive(user):
+        while not stop.is_set():
+            getattr(user, random.choices(operations, weights)[0])()
+
+    threads = [threading.Thread(target=drive, args=(user,), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.warmup)
+    recorder.recording = True
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    recorder.recording = False
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if server is not None:
+        server.shutdown()
+
+    results = recorder.summary(elapsed)
+    results['meta'] = {
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'database': flask_app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        'population': {'users': args.users, 'categories_per_user': args.categories, 'keys_per_user': args.keys},
+        'seed_seconds': round(seed_seconds, 1),
+        'clients': args.clients,
+        'duration_seconds': round(elapsed, 1),
+        'mix': args.mix,
+    }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50, help='Seeded users')
+    parser.add_argument('--categories', type=int, default=10, help='Categories per user')
+    parser.add_argument('--keys', type=int, default=200, help='Keys per user')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=2, help='Unmeasured seconds before measuring')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Operation weights, e.g. "wallet=10,get_key=20" (default: %(default)s)')
+    parser.add_argument('--database-url', help='Database to seed and serve (default: temporary SQLite)')
+    parser.add_argument('--base-url', help='Target a running server (on --database-url) instead of serving in-process')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare against the JSON results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=10, help='Allowed regression in percent')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 on a regression')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='Only compare two result files')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        sys.exit(1 if regressions and args.fail_on_regression else 0)
+
+    if args.base_url and not args.database_url:
+        parser.error('--base-url needs --database-url, the database the server uses')
+
+    results = run(args)
+    print(f"{'endpoint':>28} {'requests':>9} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, stats in {**results['endpoints'], 'TOTAL': results['total']}.items():
+        print(f"{name:>28} {stats['requests']:>9} {stats['throughput_rps']:>8} {stats['error_rate']:>7.2%} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ Dependencies:
 - SQLAlchemy
 - models.py
 - forms.py
+- versioning.py
 - app.py
 
 @author KeyGuardian Team
@@ -32,6 +33,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from models import Category, APIKey
 from forms import AddCategoryForm
 from app import db
+from versioning import bump_data_version
 
 # ================================
 # Blueprint setup
@@ -58,6 +60,7 @@ def add_category():
         try:
             new_category = Category(name=form.name.data, user_id=current_user.id)
             db.session.add(new_category)
+            bump_data_version(current_user.id)
             db.session.commit()
             flash('Category added successfully.', 'success')
             return redirect(url_for('main.wallet'))
@@ -92,6 +95,7 @@ def update_key_category(key_id):
                     return jsonify({'success': False, 'error': 'Category not found.'}), 404
                 api_key.category_id = category_id
                 category_name = category.name
+            bump_data_version(current_user.id)
             db.session.commit()
             return jsonify({'success': True, 'message': 'Category updated successfully.', 'category_name': category_name}), 200
         return jsonify({'success': False, 'error': 'API Key not found or unauthorized.'}), 404
@@ -129,6 +133,7 @@ def edit_category(category_id):
     if form.validate_on_submit():
         try:
             category.name = form.name.data
+            bump_data_version(current_user.id)
             db.session.commit()
             flash('Category updated successfully.', 'success')
             return redirect(url_for('categories.manage_categories'))
@@ -153,6 +158,7 @@ def delete_category(category_id):
     try:
         category = Category.query.filter_by(id=category_id, user_id=current_user.id).first_or_404()
         db.session.delete(category)
+        bump_data_version(current_user.id)
         db.session.commit()
         flash('Category deleted successfully.', 'success')
         return redirect(url_for('categories.manage_categories'))
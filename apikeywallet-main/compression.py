@@ -0,0 +1,306 @@
+"""
+compression.py - Response compression middleware
+
+A WSGI middleware that compresses HTML, JSON and other text responses with
+the best encoding the client accepts: brotli or zstd (when the `brotli` /
+`zstandard` packages are installed) or gzip. It:
+- leaves responses below COMPRESSION_MIN_SIZE bytes alone. Responses without
+  a Content-Length are buffered only until the threshold is reached;
+- compresses streamed (generator) responses chunk by chunk, so worker memory
+  stays flat for /export_keys and backup downloads;
+- skips responses that already carry a Content-Encoding (e.g. the
+  precompressed assets from assets.py), non-text types, partial content
+  and `Cache-Control: no-transform`;
+- turns strong ETags weak on compressed responses, like nginx does, so
+  conditional requests keep matching.
+
+Compression levels are configurable per encoding. The defaults favor
+speed: on-the-fly compression runs on every request, unlike the build-time
+compression of static assets.
+
+Dependencies:
+- Werkzeug
+- zlib
+- brotli (optional)
+- zstandard (optional)
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import zlib
+from itertools import chain
+
+# ================================
+# Third-party imports
+# ================================
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+# Mimetypes worth compressing on the fly
+COMPRESSIBLE_TYPES = frozenset({
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'application/javascript',
+    'application/json', 'application/xml', 'image/svg+xml',
+})
+
+# ================================
+# Encoders
+# ================================
+def available_encodings(preference):
+    """
+    Return the encodings from `preference` whose libraries are installed.
+
+    Args:
+        preference (list): Encoding names, most preferred first ('br', 'zstd', 'gzip')
+
+    Returns:
+        list: Usable encodings in preference order
+    """
+    usable = []
+    for encoding in preference:
+        if encoding == 'br':
+            try:
+                import brotli  # noqa: F401
+            except ImportError:
+                continue
+        elif encoding == 'zstd':
+            try:
+                import zstandard  # noqa: F401
+            except ImportError:
+                continue
+        elif encoding != 'gzip':
+            raise ValueError(f'Unknown compression encoding: {encoding}')
+        usable.append(encoding)
+    return usable
+
+def negotiate(accept_encoding, encodings):
+    """
+    Pick the encoding to use for a request's Accept-Encoding header.
+
+    The client's quality values win. Ties go to the first of `encodings`.
+
+    Args:
+        accept_encoding (str): Accept-Encoding request header, possibly empty
+        encodings (list): Usable encodings, most preferred first
+
+    Returns:
+        str or None: Chosen encoding, or None to send the response as is
+    """
+    if not accept_encoding:
+        return None
+    accept = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    for encoding in encodings:
+        quality = accept[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+class _BrotliCompressor:
+    """
+    brotli.Compressor with the zlib-style method names.
+    """
+
+    def __init__(self, quality):
+        import brotli
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+def new_compressor(encoding, level):
+    """
+    Return a streaming compressor with `compress(data)` and `flush()` methods.
+
+    Args:
+        encoding (str): 'br', 'zstd' or 'gzip'
+        level (int): Compression level (brotli quality for 'br')
+
+    Returns:
+        object: Compressor
+    """
+    if encoding == 'br':
+        return _BrotliCompressor(level)
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+def compress_body(data, encoding, level):
+    """
+    Compress a complete response body.
+
+    Args:
+        data (bytes): Body
+        encoding (str): 'br', 'zstd' or 'gzip'
+        level (int): Compression level
+
+    Returns:
+        bytes: Compressed body
+    """
+    compressor = new_compressor(encoding, level)
+    return compressor.compress(data) + compressor.flush()
+
+def compression_levels(config):
+    """
+    Return the configured level for each encoding.
+
+    Args:
+        config (dict): App config
+
+    Returns:
+        dict: Encoding to level
+    """
+    return {
+        'gzip': config['COMPRESSION_GZIP_LEVEL'],
+        'br': config['COMPRESSION_BROTLI_QUALITY'],
+        'zstd': config['COMPRESSION_ZSTD_LEVEL'],
+    }
+
+# ================================
+# Middleware
+# ================================
+class CompressionMiddleware:
+    """
+    WSGI middleware compressing text responses for clients that accept it.
+
+    Attributes:
+        app (callable): Wrapped WSGI application
+        encodings (list): Usable encodings, most preferred first
+        levels (dict): Compression level per encoding
+        min_size (int): Smallest body, in bytes, worth compressing
+        mimetypes (frozenset): Content types to compress
+    """
+
+    def __init__(self, app, encodings=('br', 'zstd', 'gzip'), levels=None, min_size=500,
+                 mimetypes=COMPRESSIBLE_TYPES):
+        self.app = app
+        self.encodings = available_encodings(encodings)
+        self.levels = {'gzip': 6, 'br': 4, 'zstd': 3, **(levels or {})}
+        self.min_size = min_size
+        self.mimetypes = mimetypes
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING'), self.encodings)
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        response = {}
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            if exc_info is not None and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response.update(status=status, headers=Headers(headers), exc_info=exc_info)
+            return written.append
+
+        app_iter = self.app(environ, capture)
+        # Flask calls start_response before returning, so most responses
+        # that should not be compressed are passed through untouched here,
+        # keeping wsgi.file_wrapper and Content-Length intact.
+        if 'status' in response and not written and not self._should_compress(response):
+            start_response(response['status'], response['headers'].to_wsgi_list(), response['exc_info'])
+            return app_iter
+        return self._compressed(app_iter, response, written, encoding, start_response)
+
+    def _should_compress(self, response, length=None):
+        status = int(response['status'].split(' ', 1)[0])
+        headers = response['headers']
+        if status < 200 or status in (204, 206, 304):
+            return False
+        if headers.get('Content-Encoding', 'identity').lower() != 'identity':
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        if headers.get('Content-Type', '').split(';', 1)[0].strip().lower() not in self.mimetypes:
+            return False
+        if length is None:
+            length = headers.get('Content-Length', type=int)
+        return length is None or length >= self.min_size
+
+    def _compressed(self, app_iter, response, written, encoding, start_response):
+        """
+        Yield the response body compressed, or as is if it turns out too small.
+        """
+        try:
+            chunks = iter(app_iter)
+            buffered = list(written)
+            size = sum(len(chunk) for chunk in buffered)
+            length = None
+            if 'status' in response:
+                length = response['headers'].get('Content-Length', type=int)
+            if length is None:
+                # Unknown length: read up to the threshold before deciding
+                for chunk in chunks:
+                    buffered.append(chunk)
+                    size += len(chunk)
+                    if size >= self.min_size:
+                        break
+                else:
+                    length = size
+            if 'status' not in response:
+                raise RuntimeError('The application did not call start_response')
+
+            headers = response['headers']
+            if not self._should_compress(response, length):
+                if length is not None and 'Content-Length' not in headers:
+                    headers['Content-Length'] = str(length)
+                response['started'] = True
+                start_response(response['status'], headers.to_wsgi_list(), response['exc_info'])
+                yield from chain(buffered, chunks)
+                return
+
+            headers['Content-Encoding'] = encoding
+            vary = [value.strip() for value in headers.get('Vary', '').split(',') if value.strip()]
+            if 'accept-encoding' not in (value.lower() for value in vary):
+                headers['Vary'] = ', '.join(vary + ['Accept-Encoding'])
+            etag = headers.get('ETag')
+            if etag and not etag.startswith('W/'):
+                headers['ETag'] = 'W/' + etag
+            compressor = new_compressor(encoding, self.levels[encoding])
+            if length is not None:
+                # The whole body is at hand (Flask only sets Content-Length on
+                # non-streamed responses): compress it in one go and keep a
+                # Content-Length, so keep-alive clients need no chunking
+                body = compressor.compress(b''.join(chain(buffered, chunks))) + compressor.flush()
+                headers['Content-Length'] = str(len(body))
+                response['started'] = True
+                start_response(response['status'], headers.to_wsgi_list(), response['exc_info'])
+                yield body
+                return
+
+            headers.remove('Content-Length')
+            response['started'] = True
+            start_response(response['status'], headers.to_wsgi_list(), response['exc_info'])
+            for chunk in chain(buffered, chunks):
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+def init_compression(app):
+    """
+    Wrap the app's WSGI callable with the compression middleware if enabled.
+
+    Args:
+        app (Flask): Application
+    """
+    if not app.config['COMPRESSION_ENABLED']:
+        return
+    encodings = [name.strip() for name in app.config['COMPRESSION_ENCODINGS'].split(',') if name.strip()]
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        encodings=encodings,
+        levels=compression_levels(app.config),
+        min_size=app.config['COMPRESSION_MIN_SIZE'],
+    )
@@ -0,0 +1,127 @@
+"""
+config.py - Application configuration
+
+Builds the Flask config from environment variables. `create_app` (see
+app.py) starts from `config_from_env()` and applies any overrides passed to
+it. Nothing here touches the database or imports application modules.
+
+Dependencies:
+- os
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import os
+
+# ================================
+# Functions
+# ================================
+def _env_bool(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+def config_from_env():
+    """
+    Read the application configuration from the environment.
+
+    Returns:
+        dict: Flask config values
+    """
+    return {
+        'SECRET_KEY': os.environ.get('SECRET_KEY', os.urandom(24)),
+        'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLALCHEMY_ECHO': _env_bool('SQLALCHEMY_ECHO', 'false'),
+
+        # Logging pipeline (see logging_setup.py)
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'INFO'),
+        'LOG_LEVELS': os.environ.get('LOG_LEVELS', ''),
+        'LOG_FORMAT': os.environ.get('LOG_FORMAT', 'json'),
+        'LOG_SAMPLE_RATES': os.environ.get('LOG_SAMPLE_RATES', ''),
+        'LOG_QUEUE_SIZE': int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+
+        # Keyset pagination for /get_keys_page
+        'KEYS_PAGE_SIZE': int(os.environ.get('KEYS_PAGE_SIZE', 100)),
+        'KEYS_PAGE_SIZE_MAX': int(os.environ.get('KEYS_PAGE_SIZE_MAX', 1000)),
+
+        # Type-ahead /search results
+        'SEARCH_RESULTS_LIMIT': int(os.environ.get('SEARCH_RESULTS_LIMIT', 20)),
+        'SEARCH_RESULTS_LIMIT_MAX': int(os.environ.get('SEARCH_RESULTS_LIMIT_MAX', 100)),
+        'SEARCH_QUERY_MAX_LENGTH': int(os.environ.get('SEARCH_QUERY_MAX_LENGTH', 100)),
+
+        # Tombstones of deleted keys and categories kept for /changes (see revisions.py)
+        'TOMBSTONE_RETENTION_DAYS': int(os.environ.get('TOMBSTONE_RETENTION_DAYS', 30)),
+
+        # Fingerprinted static assets built by `flask build-assets` (see assets.py)
+        'ASSET_FINGERPRINTING': _env_bool('ASSET_FINGERPRINTING', 'true'),
+        'ASSET_VENDOR_DIR': os.environ.get('ASSET_VENDOR_DIR', 'node_modules'),
+
+        # On-the-fly response compression (see compression.py)
+        'COMPRESSION_ENABLED': _env_bool('COMPRESSION_ENABLED', 'true'),
+        'COMPRESSION_ENCODINGS': os.environ.get('COMPRESSION_ENCODINGS', 'br,zstd,gzip'),
+        'COMPRESSION_MIN_SIZE': int(os.environ.get('COMPRESSION_MIN_SIZE', 500)),
+        'COMPRESSION_GZIP_LEVEL': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+        'COMPRESSION_BROTLI_QUALITY': int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4)),
+        'COMPRESSION_ZSTD_LEVEL': int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 3)),
+
+        # Batch encryption pool (see utils.py) and per-user data key cache (see encryption_service.py)
+        'CRYPTO_MAX_WORKERS': int(os.environ.get('CRYPTO_MAX_WORKERS', min(8, os.cpu_count() or 1))),
+        'CRYPTO_BATCH_THRESHOLD': int(os.environ.get('CRYPTO_BATCH_THRESHOLD', 64)),
+        'DATA_KEY_CACHE_SIZE': int(os.environ.get('DATA_KEY_CACHE_SIZE', 1024)),
+        'DATA_KEY_CACHE_TTL': float(os.environ.get('DATA_KEY_CACHE_TTL', 300)),
+
+        # Access token verification cache (see tokens.py)
+        'TOKEN_CACHE_SIZE': int(os.environ.get('TOKEN_CACHE_SIZE', 10000)),
+        'TOKEN_CACHE_TTL': float(os.environ.get('TOKEN_CACHE_TTL', 30)),
+
+        # User loader cache, optionally shared through Redis (see user_cache.py)
+        'USER_CACHE_SIZE': int(os.environ.get('USER_CACHE_SIZE', 10000)),
+        'USER_CACHE_TTL': float(os.environ.get('USER_CACHE_TTL', 60)),
+        'USER_CACHE_REDIS_URL': os.environ.get('USER_CACHE_REDIS_URL'),
+        'USER_CACHE_SHARED_TTL': int(os.environ.get('USER_CACHE_SHARED_TTL', 3600)),
+
+        # Per-user in-memory search indexes (see search_index.py)
+        'SEARCH_INDEX_CACHE_SIZE': int(os.environ.get('SEARCH_INDEX_CACHE_SIZE', 100)),
+        'SEARCH_INDEX_TTL': float(os.environ.get('SEARCH_INDEX_TTL', 900)),
+
+        # Maximum number of keys revealed by one /get_keys request
+        'REVEAL_BATCH_MAX': int(os.environ.get('REVEAL_BATCH_MAX', 500)),
+
+        # Maximum number of keys moved, deleted or renamed by one /bulk_keys request
+        'BULK_KEYS_MAX': int(os.environ.get('BULK_KEYS_MAX', 1000)),
+
+        # Rows fetched per server-side cursor batch by /export_keys
+        'EXPORT_BATCH_SIZE': int(os.environ.get('EXPORT_BATCH_SIZE', 1000)),
+
+        # Rows encrypted and inserted per transaction by /import_keys and `flask import-keys`
+        'IMPORT_CHUNK_SIZE': int(os.environ.get('IMPORT_CHUNK_SIZE', 1000)),
+
+        # Rows per encrypted chunk in backup archives (see backup.py)
+        'BACKUP_CHUNK_ROWS': int(os.environ.get('BACKUP_CHUNK_ROWS', 5000)),
+
+        # Password hashing on a bounded pool (see password_hashing.py)
+        'PASSWORD_HASH_METHOD': os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        'PASSWORD_HASH_WORKERS': int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+        'PASSWORD_HASH_MAX_PENDING': int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16)),
+        'PASSWORD_HASH_QUEUE_TIMEOUT': float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2)),
+
+        # Per-request SQL/timing instrumentation (see instrumentation.py)
+        'INSTRUMENTATION_ENABLED': _env_bool('INSTRUMENTATION_ENABLED', 'false'),
+        'INSTRUMENTATION_N_PLUS_ONE_THRESHOLD': int(os.environ.get('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 5)),
+        'INSTRUMENTATION_STATEMENT_MAX_LENGTH': int(os.environ.get('INSTRUMENTATION_STATEMENT_MAX_LENGTH', 300)),
+
+        # Shared connection pool (one engine per process, see db_pool.py)
+        'DB_POOL_SIZE': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'DB_MAX_OVERFLOW': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'DB_POOL_TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'DB_POOL_RECYCLE': int(os.environ.get('DB_POOL_RECYCLE', 3600)),
+        'DB_POOL_PRE_PING': _env_bool('DB_POOL_PRE_PING', 'true'),
+        'DB_POOL_WARMUP': int(os.environ.get('DB_POOL_WARMUP', 0)),
+
+        # Async read path (see async_app.py); the URL is derived from DATABASE_URL if unset
+        'ASYNC_DATABASE_URL': os.environ.get('ASYNC_DATABASE_URL'),
+        'ASYNC_DB_POOL_SIZE': int(os.environ.get('ASYNC_DB_POOL_SIZE', 20)),
+        'ASYNC_DB_MAX_OVERFLOW': int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', 20)),
+    }
@@ -0,0 +1,154 @@
+"""
+db_pool.py - Shared database engine and connection pool
+
+Builds the engine options Flask-SQLAlchemy uses for its single process-wide
+engine, warms the pool at boot and exposes live pool statistics so the pool
+can be sized against the number of workers.
+
+Dependencies:
+- SQLAlchemy
+- logging
+- threading
+- time
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import logging
+import threading
+import time
+
+# ================================
+# Third-party imports
+# ================================
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# Pool classes
+# ================================
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long callers wait to check out a connection.
+
+    Attributes:
+        wait_count (int): Number of checkouts measured
+        wait_total (float): Total seconds spent waiting for a connection
+        wait_max (float): Longest single wait in seconds
+        timeouts (int): Checkouts that gave up after `pool_timeout`
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def connect(self):
+        """
+        Check out a connection, recording the time spent waiting for it.
+
+        Returns:
+            PoolProxiedConnection: Pooled DBAPI connection
+        """
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.wait_count += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+# ================================
+# Functions
+# ================================
+def build_engine_options(config):
+    """
+    Build `SQLALCHEMY_ENGINE_OPTIONS` for the shared engine.
+
+    Pool sizing only applies to server databases; SQLite keeps the pool
+    Flask-SQLAlchemy picks for it.
+
+    Args:
+        config (dict): Flask app config
+
+    Returns:
+        dict: Keyword arguments for `create_engine`
+    """
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    url = config.get('SQLALCHEMY_DATABASE_URI')
+    if url and make_url(url).get_backend_name() != 'sqlite':
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+        )
+    return options
+
+def warm_up_pool(engine, count):
+    """
+    Open `count` connections up front so the first requests skip connection setup.
+
+    Args:
+        engine (Engine): Shared SQLAlchemy engine
+        count (int): Number of connections to open
+    """
+    if count <= 0:
+        return
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    logger.info(f"Warmed up database pool with {len(connections)} connections")
+
+def pool_stats(engine):
+    """
+    Snapshot the live state of the engine's connection pool.
+
+    Args:
+        engine (Engine): Shared SQLAlchemy engine
+
+    Returns:
+        dict: Pool class, sizing, checked-out/overflow counts and wait times
+    """
+    pool = engine.pool
+    stats = {'pool_class': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._stats_lock:
+            stats.update(
+                wait_count=pool.wait_count,
+                wait_avg_ms=round(pool.wait_total / pool.wait_count * 1000, 3) if pool.wait_count else 0.0,
+                wait_max_ms=round(pool.wait_max * 1000, 3),
+                timeouts=pool.timeouts,
+            )
+    return stats
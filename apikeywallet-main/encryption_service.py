@@ -0,0 +1,275 @@
+"""
+encryption_service.py - Per-user envelope encryption
+
+Each user has a random AES-256 data key, stored wrapped (encrypted) by the
+master ENCRYPTION_KEY in `User.wrapped_data_key`. API key values are sealed
+with AES-GCM under the owner's data key and stored raw in the binary
+`APIKey.ciphertext` column. Unwrapped data keys are kept in an in-process
+LRU/TTL cache so most operations never touch the master key or the user row.
+
+Rows written before envelope encryption only have a Fernet token in
+`APIKey.encrypted_key`. They keep decrypting and are re-sealed lazily the
+first time they are read, in a separate short transaction so a read never
+commits the request's session.
+
+Dependencies:
+- cryptography
+- SQLAlchemy
+- cache.py
+- instrumentation.py
+- models.py
+- utils.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import logging
+
+# ================================
+# Third-party imports
+# ================================
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from cache import TTLCache
+from instrumentation import timed
+from models import User, APIKey
+from utils import (decrypt_key, generate_data_key, wrap_data_key, unwrap_data_key, seal, unseal, map_batch,
+                   configure_crypto_pool)
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# Data key cache
+# ================================
+# Sized from DATA_KEY_CACHE_SIZE / DATA_KEY_CACHE_TTL by init_encryption
+_ciphers = TTLCache(1024, 300)
+
+# ================================
+# Functions
+# ================================
+def associated_data(user_id):
+    """
+    Return the AES-GCM associated data binding a value to its owner.
+
+    Args:
+        user_id (int): Owner's user ID
+
+    Returns:
+        bytes: Associated data
+    """
+    return b'keyguardian:user:%d' % user_id
+
+def _reseal(user_id, plaintexts):
+    """
+    Re-seal legacy Fernet rows under the owner's data key, best effort.
+
+    Runs in its own short transaction, like _create_data_key, so the
+    request's session is neither committed nor rolled back. A row is only
+    written while it still has no ciphertext. Failures are logged and the
+    row is simply upgraded on a later read.
+
+    Args:
+        user_id (int): Owner's user ID
+        plaintexts (dict): Key ID to decrypted value
+    """
+    table = APIKey.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam('b_id'), table.c.user_id == user_id, table.c.ciphertext.is_(None))
+        .values(ciphertext=bindparam('b_ciphertext'), encrypted_key=None)
+    )
+    try:
+        cipher = get_cipher(user_id)
+        context = associated_data(user_id)
+        with timed('crypto'):
+            params = [{'b_id': key_id, 'b_ciphertext': seal(cipher, plaintext, context)}
+                      for key_id, plaintext in plaintexts.items()]
+        with db.engine.begin() as connection:
+            connection.execute(statement, params)
+    except SQLAlchemyError as e:
+        logger.warning(f"Could not upgrade {len(plaintexts)} API keys to envelope encryption: {str(e)}")
+
+def _create_data_key(user_id):
+    """
+    Generate and store a wrapped data key for a user who has none yet.
+
+    The key is written in its own short transaction so it is durable before
+    anything is encrypted with it. If another worker stores a key first,
+    that key wins and is returned instead.
+
+    Args:
+        user_id (int): Owner's user ID
+
+    Returns:
+        str: The user's wrapped data key
+    """
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(User)
+            .where(User.id == user_id, User.wrapped_data_key.is_(None))
+            .values(wrapped_data_key=wrap_data_key(generate_data_key()))
+        )
+        return connection.execute(select(User.wrapped_data_key).where(User.id == user_id)).scalar()
+
+def get_cipher(user_id):
+    """
+    Return the AES-GCM cipher for a user's data key, creating the key if needed.
+
+    Args:
+        user_id (int): Owner's user ID
+
+    Returns:
+        AESGCM: Cipher for the user's data key
+
+    Raises:
+        LookupError: If the user does not exist
+    """
+    cipher = _ciphers.get(user_id)
+    if cipher is not None:
+        return cipher
+    wrapped_key = db.session.execute(select(User.wrapped_data_key).where(User.id == user_id)).scalar()
+    if wrapped_key is None:
+        wrapped_key = _create_data_key(user_id)
+    if wrapped_key is None:
+        raise LookupError(f'User {user_id} does not exist')
+    return cipher_from_wrapped(user_id, wrapped_key)
+
+def cached_cipher(user_id):
+    """
+    Return a user's cipher if its data key is cached, without touching the database.
+
+    Args:
+        user_id (int): Owner's user ID
+
+    Returns:
+        AESGCM or None: Cached cipher
+    """
+    return _ciphers.get(user_id)
+
+def cipher_from_wrapped(user_id, wrapped_key):
+    """
+    Unwrap a user's data key, cache its cipher and return it.
+
+    Args:
+        user_id (int): Owner's user ID
+        wrapped_key (str): The user's wrapped data key
+
+    Returns:
+        AESGCM: Cipher for the user's data key
+
+    Raises:
+        InvalidToken: If the wrapped key was not produced by a master key
+    """
+    cipher = AESGCM(unwrap_data_key(wrapped_key))
+    _ciphers.set(user_id, cipher)
+    return cipher
+
+def init_encryption(app):
+    """
+    Size the data key cache and the crypto pool from the app's configuration.
+
+    Args:
+        app (Flask): Application
+    """
+    _ciphers.configure(app.config['DATA_KEY_CACHE_SIZE'], app.config['DATA_KEY_CACHE_TTL'])
+    configure_crypto_pool(app.config['CRYPTO_MAX_WORKERS'], app.config['CRYPTO_BATCH_THRESHOLD'])
+
+def forget_data_keys():
+    """
+    Drop every cached data key, e.g. after the master key has been rotated.
+    """
+    _ciphers.clear()
+
+def encrypt_for_user(user_id, plaintext):
+    """
+    Seal an API key value under the owner's data key.
+
+    Args:
+        user_id (int): Owner's user ID
+        plaintext (str): Plaintext API key
+
+    Returns:
+        bytes: Value for `APIKey.ciphertext`
+    """
+    cipher = get_cipher(user_id)
+    with timed('crypto'):
+        return seal(cipher, plaintext, associated_data(user_id))
+
+def encrypt_many_for_user(user_id, plaintexts, return_exceptions=False):
+    """
+    Seal a batch of API key values for one owner on the crypto thread pool.
+
+    Args:
+        user_id (int): Owner's user ID
+        plaintexts (iterable): Plaintext API keys
+        return_exceptions (bool): Put exceptions in the result list instead of raising
+
+    Returns:
+        list: Values for `APIKey.ciphertext`, in input order
+    """
+    cipher = get_cipher(user_id)
+    context = associated_data(user_id)
+    with timed('crypto'):
+        return map_batch(lambda plaintext: seal(cipher, plaintext, context), plaintexts, return_exceptions)
+
+def reveal(api_key):
+    """
+    Decrypt an API key, re-sealing legacy Fernet rows on first read.
+
+    Args:
+        api_key (APIKey): Key to decrypt
+
+    Returns:
+        str: Decrypted plaintext API key
+
+    Raises:
+        InvalidToken: If a legacy Fernet token is invalid or corrupted
+        InvalidTag: If a sealed value fails authentication
+    """
+    if api_key.ciphertext is not None:
+        cipher = get_cipher(api_key.user_id)
+        with timed('crypto'):
+            return unseal(cipher, api_key.ciphertext, associated_data(api_key.user_id))
+
+    plaintext = decrypt_key(api_key.encrypted_key)
+    _reseal(api_key.user_id, {api_key.id: plaintext})
+    return plaintext
+
+def reveal_many(user_id, rows):
+    """
+    Decrypt a batch of one user's keys, re-sealing any legacy Fernet rows.
+
+    Args:
+        user_id (int): Owner's user ID
+        rows (list): Rows with `id`, `ciphertext` and `encrypted_key` attributes
+
+    Returns:
+        list: Plaintexts or exceptions, in the order of `rows`
+    """
+    cipher = get_cipher(user_id)
+    context = associated_data(user_id)
+
+    def open_row(row):
+        if row.ciphertext is not None:
+            return unseal(cipher, row.ciphertext, context)
+        return decrypt_key(row.encrypted_key)
+
+    with timed('crypto'):
+        results = map_batch(open_row, rows, return_exceptions=True)
+    upgrades = {
+        row.id: result for row, result in zip(rows, results)
+        if row.ciphertext is None and not isinstance(result, Exception)
+    }
+    if upgrades:
+        _reseal(user_id, upgrades)
+    return results
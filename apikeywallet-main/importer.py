@@ -0,0 +1,339 @@
+"""
+importer.py - Bulk import of API keys from JSON, CSV and .env files
+
+Parses import files incrementally and loads them in chunks: missing
+categories are created with one multi-row insert per chunk, values are
+encrypted as a parallel batch and keys are inserted with executemany inside
+one short transaction per chunk. The result is a per-row report.
+
+Supported formats:
+- json: a top-level array of objects, or one object per line (JSON Lines)
+- csv: header row with key_name/name, value/api_key/key and optional category
+- env: dotenv lines (KEY=value); the variable name becomes the key name
+
+Dependencies:
+- click
+- Flask
+- SQLAlchemy
+- csv
+- json
+- models.py
+- encryption_service.py
+- versioning.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import csv
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+# ================================
+# Third-party imports
+# ================================
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from models import User, APIKey, Category
+from encryption_service import encrypt_many_for_user
+from versioning import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('json', 'csv', 'env')
+NAME_FIELDS = ('key_name', 'name')
+VALUE_FIELDS = ('value', 'api_key', 'key')
+READ_SIZE = 64 * 1024
+
+# ================================
+# Parsers
+# ================================
+def iter_json_records(stream):
+    """
+    Yield objects from a JSON array or JSON Lines text stream without loading it whole.
+
+    Args:
+        stream (TextIO): Text stream
+
+    Yields:
+        dict: One record per object
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    exhausted = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        if position >= len(buffer):
+            if exhausted:
+                return
+            buffer, position = stream.read(READ_SIZE), 0
+            exhausted = not buffer
+            continue
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if exhausted:
+                raise
+            chunk = stream.read(READ_SIZE)
+            exhausted = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield record
+        position = end
+
+def iter_csv_records(stream):
+    """
+    Yield records from a CSV text stream with a header row.
+
+    Args:
+        stream (TextIO): Text stream
+
+    Yields:
+        dict: One record per data row
+    """
+    yield from csv.DictReader(stream)
+
+def iter_dotenv_records(stream):
+    """
+    Yield records from dotenv-formatted lines.
+
+    Blank lines and comments are skipped, an `export ` prefix is allowed and
+    matching single or double quotes around the value are removed.
+
+    Args:
+        stream (TextIO): Text stream
+
+    Yields:
+        dict: Record with key_name and value
+    """
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('export '):
+            line = line[len('export '):].lstrip()
+        name, separator, value = line.partition('=')
+        if not separator:
+            yield {'key_name': name.strip(), 'value': None}
+            continue
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+            value = value[1:-1]
+        yield {'key_name': name.strip(), 'value': value}
+
+PARSERS = {
+    'json': iter_json_records,
+    'csv': iter_csv_records,
+    'env': iter_dotenv_records,
+}
+
+def detect_format(filename):
+    """
+    Guess the import format from a file name.
+
+    Args:
+        filename (str): File name
+
+    Returns:
+        str or None: One of FORMATS, or None if unknown
+    """
+    name = os.path.basename(filename or '').lower()
+    if name == '.env' or name.endswith('.env') or name.startswith('.env.'):
+        return 'env'
+    extension = os.path.splitext(name)[1].lstrip('.')
+    if extension in ('json', 'jsonl', 'ndjson'):
+        return 'json'
+    if extension == 'csv':
+        return 'csv'
+    return None
+
+# ================================
+# Import pipeline
+# ================================
+def _first(record, fields):
+    for field in fields:
+        value = record.get(field)
+        if value not in (None, ''):
+            return value
+    return None
+
+def _normalize(record, default_category):
+    """
+    Validate one parsed record.
+
+    Args:
+        record (dict): Parsed record
+        default_category (str): Category for records without one
+
+    Returns:
+        tuple: (key_name, value, category name or None, error message or None)
+    """
+    if not isinstance(record, dict):
+        return None, None, None, 'Record is not an object.'
+    key_name = _first(record, NAME_FIELDS)
+    value = _first(record, VALUE_FIELDS)
+    category = record.get('category') or default_category
+    if not isinstance(key_name, str) or not key_name.strip():
+        return None, None, None, 'Missing key name.'
+    key_name = key_name.strip()
+    if len(key_name) > 120:
+        return key_name, None, None, 'Key name is longer than 120 characters.'
+    if not isinstance(value, str) or not value:
+        return key_name, None, None, 'Missing key value.'
+    if category is not None:
+        category = str(category).strip() or None
+        if category and len(category) > 50:
+            return key_name, None, None, 'Category name is longer than 50 characters.'
+    return key_name, value, category, None
+
+def _import_chunk(user_id, chunk, category_ids, report):
+    """
+    Create missing categories and insert one chunk of keys in a single transaction.
+
+    Args:
+        user_id (int): Owner's user ID
+        chunk (list): (row number, key_name, value, category) tuples
+        category_ids (dict): Category name -> ID cache, updated in place
+        report (dict): Import report, updated in place
+    """
+    new_ids = {}
+    try:
+        # Encrypt before writing anything: a first-time data key is stored on
+        # its own connection and must not wait on this chunk's transaction.
+        ciphertexts = encrypt_many_for_user(user_id, [value for _, _, value, _ in chunk], return_exceptions=True)
+
+        missing = sorted({category for _, _, _, category in chunk if category and category not in category_ids})
+        if missing:
+            created = db.session.execute(
+                insert(Category).returning(Category.id, Category.name),
+                [{'name': name, 'user_id': user_id} for name in missing]
+            ).all()
+            new_ids = {name: category_id for category_id, name in created}
+
+        now = datetime.utcnow()
+        rows, results = [], []
+        for (row_number, key_name, _, category), ciphertext in zip(chunk, ciphertexts):
+            if isinstance(ciphertext, Exception):
+                results.append({'row': row_number, 'key_name': key_name, 'status': 'error', 'error': 'Encryption failed.'})
+                continue
+            rows.append({
+                'user_id': user_id,
+                'key_name': key_name,
+                'ciphertext': ciphertext,
+                'date_added': now,
+                'category_id': category_ids.get(category, new_ids.get(category)) if category else None,
+            })
+            results.append({'row': row_number, 'key_name': key_name, 'status': 'created'})
+        if rows:
+            db.session.execute(insert(APIKey), rows)
+        if rows or missing:
+            bump_data_version(user_id)
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error importing rows {chunk[0][0]}-{chunk[-1][0]}: {str(e)}")
+        results = [{'row': row_number, 'key_name': key_name, 'status': 'error', 'error': 'Database error.'}
+                   for row_number, key_name, _, _ in chunk]
+        missing = []
+
+    if missing:
+        category_ids.update(new_ids)
+        report['categories_created'] += len(missing)
+    for result in results:
+        report['created' if result['status'] == 'created' else 'failed'] += 1
+    report['rows'].extend(results)
+
+def import_keys(user_id, records, chunk_size=1000, default_category=None):
+    """
+    Import parsed records for a user in chunked transactions.
+
+    Args:
+        user_id (int): Owner's user ID
+        records (iterable): Parsed records (see PARSERS)
+        chunk_size (int): Rows per transaction
+        default_category (str, optional): Category for records without one
+
+    Returns:
+        dict: Counts plus a per-row report ({'row', 'key_name', 'status', 'error'})
+    """
+    report = {'created': 0, 'failed': 0, 'categories_created': 0, 'rows': []}
+    category_ids = dict(db.session.execute(
+        select(Category.name, Category.id).where(Category.user_id == user_id).order_by(Category.id.desc())
+    ).all())
+
+    chunk = []
+    row_number = 0
+    try:
+        for row_number, record in enumerate(records, start=1):
+            key_name, value, category, error = _normalize(record, default_category)
+            if error:
+                report['failed'] += 1
+                report['rows'].append({'row': row_number, 'key_name': key_name, 'status': 'error', 'error': error})
+                continue
+            chunk.append((row_number, key_name, value, category))
+            if len(chunk) >= chunk_size:
+                _import_chunk(user_id, chunk, category_ids, report)
+                chunk = []
+    except (ValueError, csv.Error) as e:
+        report['failed'] += 1
+        report['rows'].append({'row': row_number + 1, 'key_name': None, 'status': 'error',
+                               'error': f'Could not parse file: {str(e)}'})
+    if chunk:
+        _import_chunk(user_id, chunk, category_ids, report)
+    report['rows'].sort(key=lambda row: row['row'])
+    return report
+
+# ================================
+# CLI command
+# ================================
+@click.command('import-keys')
+@click.argument('email')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), help='Input format (guessed from the file name if omitted).')
+@click.option('--category', default=None, help='Category for rows that do not name one.')
+@click.option('--chunk-size', type=int, default=None, help='Rows per transaction (default: IMPORT_CHUNK_SIZE).')
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False), help='Write the per-row report to this JSON file.')
+@with_appcontext
+def import_keys_command(email, path, file_format, category, chunk_size, report_path):
+    """Bulk import API keys for the user EMAIL from a JSON, CSV or .env file."""
+    file_format = file_format or detect_format(path)
+    if file_format is None:
+        raise click.ClickException('Could not guess the file format; pass --format.')
+    user_id = db.session.execute(select(User.id).where(func.lower(User.email) == email.lower())).scalar()
+    if user_id is None:
+        raise click.ClickException(f'No user with email {email}.')
+
+    started = time.monotonic()
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        report = import_keys(
+            user_id,
+            PARSERS[file_format](f),
+            chunk_size=chunk_size or current_app.config['IMPORT_CHUNK_SIZE'],
+            default_category=category
+        )
+    elapsed = time.monotonic() - started
+
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    for row in report['rows']:
+        if row['status'] == 'error':
+            click.echo(f"row {row['row']} ({row['key_name']}): {row['error']}", err=True)
+    click.echo(f"Imported {report['created']} keys ({report['failed']} failed, "
+               f"{report['categories_created']} categories created) in {elapsed:.1f}s")
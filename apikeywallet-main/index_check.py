@@ -0,0 +1,173 @@
+"""
+index_check.py - EXPLAIN-based index usage check
+
+Runs EXPLAIN for the wallet, copy_key and login queries and reports whether
+the database answers them with index scans rather than full table scans.
+Optionally seeds a large synthetic dataset first so the planner has a
+realistic table size to work with.
+
+Usage:
+    flask check-indexes --seed-users 50 --seed-keys 2000
+
+Dependencies:
+- click
+- Flask
+- SQLAlchemy
+- models.py
+- queries.py
+- seeding.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import json
+
+# ================================
+# Third-party imports
+# ================================
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, text
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from models import User, APIKey
+from queries import wallet_keys_query
+from seeding import seed_dataset
+
+CHECKED_TABLES = ('api_key', 'category', 'user')
+
+# ================================
+# Plan inspection
+# ================================
+def _compile(statement):
+    """
+    Render a statement as SQL with literal parameters for EXPLAIN.
+
+    Args:
+        statement: SQLAlchemy selectable or ORM query
+
+    Returns:
+        str: SQL text
+    """
+    statement = getattr(statement, 'statement', statement)
+    return str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+
+def _postgresql_full_scans(sql):
+    """
+    Find sequential scans on checked tables in a PostgreSQL plan.
+
+    Args:
+        sql (str): Query to explain
+
+    Returns:
+        tuple: (list of offending tables, plan as text)
+    """
+    plan = db.session.execute(text('EXPLAIN (FORMAT JSON) ' + sql)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    full_scans = []
+
+    def walk(node):
+        if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in CHECKED_TABLES:
+            full_scans.append(node['Relation Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return full_scans, json.dumps(plan, indent=2)
+
+def _sqlite_full_scans(sql):
+    """
+    Find full table scans on checked tables in a SQLite query plan.
+
+    Args:
+        sql (str): Query to explain
+
+    Returns:
+        tuple: (list of offending tables, plan as text)
+    """
+    rows = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()
+    details = [row[-1] for row in rows]
+    full_scans = [
+        detail.split()[1] for detail in details
+        if detail.startswith('SCAN ') and 'USING' not in detail and detail.split()[1] in CHECKED_TABLES
+    ]
+    return full_scans, '\n'.join(details)
+
+def explain_full_scans(statement):
+    """
+    EXPLAIN a statement and list the checked tables it reads with full scans.
+
+    Args:
+        statement: SQLAlchemy selectable or ORM query
+
+    Returns:
+        tuple: (list of offending tables, plan as text)
+    """
+    sql = _compile(statement)
+    if db.engine.dialect.name == 'postgresql':
+        return _postgresql_full_scans(sql)
+    return _sqlite_full_scans(sql)
+
+def hot_queries(user):
+    """
+    Build the hot-path queries to check for a given user.
+
+    Args:
+        user (User): User whose data the queries target
+
+    Returns:
+        dict: Query name -> statement
+    """
+    sample_key_id = db.session.execute(
+        select(APIKey.id).where(APIKey.user_id == user.id).limit(1)
+    ).scalar() or 0
+    return {
+        'wallet': wallet_keys_query(user.id),
+        'copy_key': APIKey.query.filter_by(id=sample_key_id, user_id=user.id),
+        'login': User.query.filter(func.lower(User.email) == user.email.lower()),
+    }
+
+# ================================
+# CLI command
+# ================================
+@click.command('check-indexes')
+@click.option('--seed-users', default=0, help='Seed this many synthetic users first.')
+@click.option('--seed-categories', default=20, help='Categories per seeded user.')
+@click.option('--seed-keys', default=2000, help='API keys per seeded user.')
+@click.option('--email', default=None, help='Check queries for this user instead of a seeded one.')
+@click.option('--verbose', is_flag=True, help='Print the full query plans.')
+@with_appcontext
+def check_indexes_command(seed_users, seed_categories, seed_keys, email, verbose):
+    """Confirm that the wallet, copy_key and login queries use index scans."""
+    if seed_users:
+        emails = seed_dataset(seed_users, seed_categories, seed_keys)
+        email = email or emails[len(emails) // 2]
+        click.echo(f'Seeded {seed_users} users x {seed_keys} keys.')
+    if db.engine.dialect.name in ('postgresql', 'sqlite'):
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+    user = User.query.filter(func.lower(User.email) == email.lower()).first() if email else User.query.first()
+    if user is None:
+        raise click.ClickException('No user to check; pass --email or --seed-users.')
+
+    failed = False
+    for name, statement in hot_queries(user).items():
+        full_scans, plan = explain_full_scans(statement)
+        if full_scans:
+            failed = True
+            click.echo(f'FAIL {name}: full scan on {", ".join(sorted(set(full_scans)))}')
+        else:
+            click.echo(f'OK   {name}: index scans only')
+        if verbose or full_scans:
+            click.echo(plan)
+    if failed:
+        raise click.ClickException('Some hot queries do not use indexes.')
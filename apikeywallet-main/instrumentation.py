@@ -0,0 +1,213 @@
+"""
+instrumentation.py - Per-request SQL and timing instrumentation
+
+Records, for each request, the number of SQL statements, total and slowest
+database time, crypto time and template render time. The numbers are sent
+back as a `Server-Timing` header and written as one structured log line.
+Statements repeated more often than a threshold are flagged as likely N+1
+query patterns.
+
+Instrumentation is opt-in via the INSTRUMENTATION_ENABLED config flag; when
+it is off, `timed()` is a cheap no-op and no engine listeners are attached.
+
+Dependencies:
+- Flask
+- SQLAlchemy
+- json
+- logging
+- time
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# ================================
+# Third-party imports
+# ================================
+from flask import current_app, g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# Request metrics
+# ================================
+class RequestMetrics:
+    """
+    Timing data collected over a single request.
+
+    Attributes:
+        started (float): perf_counter() value when the request began
+        statement_count (int): Number of SQL statements executed
+        db_time (float): Total seconds spent executing SQL
+        slowest_time (float): Seconds taken by the slowest statement
+        slowest_statement (str): SQL text of the slowest statement
+        statements (Counter): Executions per distinct SQL text
+        timings (dict): Seconds spent per named section (crypto, template)
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statement_count = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.statements = Counter()
+        self.timings = {'crypto': 0.0, 'template': 0.0}
+        self._template_starts = []
+        self._open_sections = set()
+
+    def record_statement(self, statement, duration):
+        """
+        Record one executed SQL statement.
+
+        Args:
+            statement (str): SQL text
+            duration (float): Execution time in seconds
+        """
+        self.statement_count += 1
+        self.db_time += duration
+        self.statements[statement] += 1
+        if duration > self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_statement = statement
+
+    def repeated_statements(self, threshold):
+        """
+        Find statements executed more than `threshold` times.
+
+        Args:
+            threshold (int): Maximum allowed repetitions of one statement
+
+        Returns:
+            list: (statement, count) pairs, most repeated first
+        """
+        return [(statement, count) for statement, count in self.statements.most_common() if count > threshold]
+
+def current_metrics():
+    """
+    Return the metrics object for the current request, if instrumentation is active.
+
+    Returns:
+        RequestMetrics or None
+    """
+    if not has_request_context():
+        return None
+    return g.get('request_metrics')
+
+@contextmanager
+def timed(section):
+    """
+    Add the time spent in the block to a named section of the request metrics.
+
+    Nested blocks for the same section are only counted once, by the outermost block.
+
+    Args:
+        section (str): Section name, e.g. 'crypto'
+    """
+    metrics = current_metrics()
+    if metrics is None or section in metrics._open_sections:
+        yield
+        return
+    metrics._open_sections.add(section)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._open_sections.discard(section)
+        metrics.timings[section] = metrics.timings.get(section, 0.0) + time.perf_counter() - start
+
+# ================================
+# Event handlers
+# ================================
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_metrics() is not None:
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = current_metrics()
+    starts = conn.info.get('query_start_time')
+    if metrics is not None and starts:
+        metrics.record_statement(statement, time.perf_counter() - starts.pop())
+
+def _before_render_template(sender, template, context, **extra):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics._template_starts.append(time.perf_counter())
+
+def _template_rendered(sender, template, context, **extra):
+    metrics = current_metrics()
+    if metrics is not None and metrics._template_starts:
+        metrics.timings['template'] += time.perf_counter() - metrics._template_starts.pop()
+
+def _start_request():
+    g.request_metrics = RequestMetrics()
+
+def _finish_request(response):
+    metrics = g.pop('request_metrics', None)
+    if metrics is None:
+        return response
+    config = current_app.config
+    total = time.perf_counter() - metrics.started
+    repeated = metrics.repeated_statements(config['INSTRUMENTATION_N_PLUS_ONE_THRESHOLD'])
+
+    server_timing = [
+        f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.statement_count} queries"',
+        f'db-slowest;dur={metrics.slowest_time * 1000:.2f}',
+        f'crypto;dur={metrics.timings["crypto"] * 1000:.2f}',
+        f'tpl;dur={metrics.timings["template"] * 1000:.2f}',
+        f'total;dur={total * 1000:.2f}',
+    ]
+    response.headers.add('Server-Timing', ', '.join(server_timing))
+
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'duration_ms': round(total * 1000, 2),
+        'db_statements': metrics.statement_count,
+        'db_ms': round(metrics.db_time * 1000, 2),
+        'db_slowest_ms': round(metrics.slowest_time * 1000, 2),
+        'db_slowest_statement': (metrics.slowest_statement or '')[:config['INSTRUMENTATION_STATEMENT_MAX_LENGTH']],
+        'crypto_ms': round(metrics.timings['crypto'] * 1000, 2),
+        'template_ms': round(metrics.timings['template'] * 1000, 2),
+        'n_plus_one': [
+            {'statement': statement[:config['INSTRUMENTATION_STATEMENT_MAX_LENGTH']], 'count': count}
+            for statement, count in repeated
+        ],
+    }
+    if repeated:
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
+    return response
+
+# ================================
+# Setup
+# ================================
+def init_instrumentation(app, engine):
+    """
+    Attach request hooks, template signals and engine events when enabled.
+
+    Args:
+        app (Flask): Flask application
+        engine (Engine): Shared SQLAlchemy engine
+    """
+    if not app.config['INSTRUMENTATION_ENABLED']:
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    logger.info("Request instrumentation enabled")
@@ -0,0 +1,254 @@
+"""
+key_rotation.py - Resumable, parallel master key rotation
+
+Re-encrypts everything protected by the master key under the current
+ENCRYPTION_KEY: the wrapped per-user data keys (user.wrapped_data_key) and
+any legacy Fernet tokens still in api_key.encrypted_key. Values sealed with
+a data key (api_key.ciphertext) do not depend on the master key and are
+left untouched.
+
+Rows are streamed in ID order in short batches. Each batch is re-encrypted
+on a worker pool and written back in its own transaction (one executemany
+UPDATE where the driver reports reliable row counts), so no long
+transaction or table lock is held. Progress is checkpointed after every
+batch and a crashed run resumes where it stopped.
+
+Rotation procedure:
+    1. Set ENCRYPTION_KEY to the new key and ENCRYPTION_KEY_PREVIOUS to the old one,
+       then restart the app. It keeps decrypting values under either key.
+    2. Run `flask rotate-master-key`.
+    3. Run `flask rewrap-backup <archive>...` on every backup archive you keep
+       (see backup.py). Their archive keys, and the data keys and legacy
+       values inside, are encrypted with the master key too. Archives that
+       are not re-wrapped need the old key to be restored.
+    4. Remove the old key from ENCRYPTION_KEY_PREVIOUS and restart again.
+
+Dependencies:
+- click
+- Flask
+- SQLAlchemy
+- cryptography
+- models.py
+- utils.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ================================
+# Third-party imports
+# ================================
+import click
+from cryptography.fernet import InvalidToken
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, func, select, update
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from models import User, APIKey
+from utils import master_keys, rotate_token
+
+logger = logging.getLogger(__name__)
+
+# Phases in the order they are rotated: (name, table, column holding a Fernet token)
+PHASES = [
+    ('user_data_keys', User.__table__, User.__table__.c.wrapped_data_key),
+    ('legacy_api_keys', APIKey.__table__, APIKey.__table__.c.encrypted_key),
+]
+
+# ================================
+# Checkpointing
+# ================================
+def key_fingerprint():
+    """
+    Return a short, non-reversible fingerprint of the current master key.
+
+    Returns:
+        str: Hex fingerprint
+    """
+    return hashlib.sha256(master_keys()[0].encode()).hexdigest()[:16]
+
+def load_checkpoint(path):
+    """
+    Load a rotation checkpoint, if one exists for the current master key.
+
+    Args:
+        path (str): Checkpoint file path
+
+    Returns:
+        dict: Checkpoint with per-phase last IDs and counters
+
+    Raises:
+        click.ClickException: If the checkpoint belongs to a different target key
+    """
+    if not os.path.exists(path):
+        return {'key': key_fingerprint(), 'last_id': {}, 'rotated': {}, 'failed': {}, 'skipped': {}}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('key') != key_fingerprint():
+        raise click.ClickException(f'{path} was written for a different ENCRYPTION_KEY; pass --restart to discard it.')
+    return checkpoint
+
+def save_checkpoint(path, checkpoint):
+    """
+    Write a checkpoint atomically so a crash never leaves a partial file.
+
+    Args:
+        path (str): Checkpoint file path
+        checkpoint (dict): Checkpoint data
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+# ================================
+# Rotation
+# ================================
+def _rotate_chunk(tokens):
+    """
+    Rotate a slice of tokens, using None for tokens that cannot be decrypted.
+    """
+    rotated = []
+    for token in tokens:
+        try:
+            rotated.append(rotate_token(token))
+        except InvalidToken:
+            rotated.append(None)
+    return rotated
+
+def _write_back(connection, statement, params):
+    """
+    Execute the write-back UPDATE for a batch and return how many rows it changed.
+
+    executemany row counts are only trusted where the driver reports them
+    per statement (supports_sane_multi_rowcount). Elsewhere, e.g. psycopg2's
+    batched executemany, which may report -1 or only the last page, each row
+    is updated with its own execute inside the same transaction.
+    """
+    if connection.dialect.supports_sane_multi_rowcount:
+        return connection.execute(statement, params).rowcount
+    return sum(connection.execute(statement, row).rowcount for row in params)
+
+def rotate_phase(name, table, column, checkpoint, checkpoint_path, executor, workers, batch_size, pause):
+    """
+    Rotate every non-null token in one column, batch by batch.
+
+    The write-back only updates rows whose token is unchanged since it was
+    read, so concurrent writes by the running app (e.g. lazy re-sealing)
+    are never overwritten.
+
+    Args:
+        name (str): Phase name used in the checkpoint
+        table (Table): Table to rotate
+        column (Column): Column holding Fernet tokens
+        checkpoint (dict): Checkpoint, updated in place
+        checkpoint_path (str): Where to save the checkpoint after each batch
+        executor (ThreadPoolExecutor): Pool used for re-encryption
+        workers (int): Number of threads in `executor`
+        batch_size (int): Rows per batch and transaction
+        pause (float): Seconds to sleep between batches
+    """
+    last_id = checkpoint['last_id'].get(name, 0)
+    for counter in ('rotated', 'failed', 'skipped'):
+        checkpoint[counter].setdefault(name, 0)
+
+    remaining = db.session.execute(
+        select(func.count()).select_from(table).where(table.c.id > last_id, column.is_not(None))
+    ).scalar()
+    db.session.commit()
+    click.echo(f'{name}: {remaining} rows to rotate (resuming after id {last_id})')
+
+    write_back = (
+        update(table)
+        .where(table.c.id == bindparam('b_id'), column == bindparam('b_old'))
+        .values({column.name: bindparam('b_new')})
+    )
+    started = time.monotonic()
+    done = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, column)
+            .where(table.c.id > last_id, column.is_not(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        db.session.commit()
+        if not rows:
+            break
+
+        tokens = [row[1] for row in rows]
+        chunk_size = -(-len(tokens) // workers)
+        rotated = []
+        for chunk in executor.map(_rotate_chunk, [tokens[i:i + chunk_size] for i in range(0, len(tokens), chunk_size)]):
+            rotated.extend(chunk)
+        params = [
+            {'b_id': row[0], 'b_old': token, 'b_new': new_token}
+            for row, token, new_token in zip(rows, tokens, rotated)
+            if new_token is not None
+        ]
+        failed = len(rows) - len(params)
+        if failed:
+            logger.error(f"{name}: {failed} tokens in ids {rows[0][0]}-{rows[-1][0]} could not be decrypted with any configured key")
+
+        written = 0
+        if params:
+            with db.engine.begin() as connection:
+                written = _write_back(connection, write_back, params)
+
+        last_id = rows[-1][0]
+        checkpoint['last_id'][name] = last_id
+        checkpoint['rotated'][name] += written
+        checkpoint['failed'][name] += failed
+        checkpoint['skipped'][name] += len(params) - written
+        save_checkpoint(checkpoint_path, checkpoint)
+
+        done += len(rows)
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0.0
+        eta = (remaining - done) / rate if rate else 0.0
+        click.echo(f'{name}: {done}/{remaining} rows, {rate:.0f} rows/s, ETA {eta:.0f}s')
+        if pause:
+            time.sleep(pause)
+
+# ================================
+# CLI command
+# ================================
+@click.command('rotate-master-key')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per batch and transaction.')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True, help='Re-encryption worker threads.')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between batches (throttling).')
+@click.option('--checkpoint-file', default='.key-rotation-checkpoint.json', show_default=True,
+              help='Progress file used to resume an interrupted rotation.')
+@click.option('--restart', is_flag=True, help='Ignore any existing checkpoint and start from the beginning.')
+@with_appcontext
+def rotate_master_key_command(batch_size, workers, pause, checkpoint_file, restart):
+    """Re-encrypt master-key-protected values under the current ENCRYPTION_KEY."""
+    if restart and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    checkpoint = load_checkpoint(checkpoint_file)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rotate') as executor:
+        for name, table, column in PHASES:
+            rotate_phase(name, table, column, checkpoint, checkpoint_file, executor, workers, batch_size, pause)
+
+    click.echo(
+        'Rotation complete: '
+        + ', '.join(f"{name} rotated={checkpoint['rotated'][name]} failed={checkpoint['failed'][name]} "
+                    f"skipped={checkpoint['skipped'][name]}" for name, _, _ in PHASES)
+    )
+    if any(checkpoint['failed'].values()):
+        raise click.ClickException('Some values could not be decrypted; keep the previous key until they are resolved.')
+    click.echo('Run `flask rewrap-backup` on kept backup archives before removing the previous key.')
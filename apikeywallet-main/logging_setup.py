@@ -0,0 +1,302 @@
+"""
+logging_setup.py - Asynchronous, structured logging pipeline
+
+Every log record goes through one QueueHandler on the root logger. The
+request thread only does cheap work: level checks (done by the logger before
+a record exists), sampling, adding the request ID, redacting secrets and
+building the final message. Records then go onto an in-memory queue. A
+QueueListener thread formats them (JSON by default) and writes them out, so
+log I/O never blocks a request. When the queue is full, records are dropped
+and counted rather than blocking.
+
+Configuration (see config.py):
+- LOG_LEVEL: root level, e.g. "INFO"
+- LOG_LEVELS: per-logger levels, e.g. "sqlalchemy.engine=INFO,werkzeug=WARNING"
+- LOG_FORMAT: "json" or "text"
+- LOG_SAMPLE_RATES: fraction of INFO/DEBUG records kept per logger, e.g.
+  "werkzeug=0.1,wallet_routes=0.25"; warnings and errors are never sampled
+- LOG_QUEUE_SIZE: maximum records waiting for the writer thread
+
+Each request gets a correlation ID, taken from a well-formed X-Request-ID
+header or generated. It is attached to every record logged while the
+request runs and echoed in the response's X-Request-ID header.
+
+Dependencies:
+- Flask
+- logging.handlers
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# ================================
+# Third-party imports
+# ================================
+from flask import request
+
+# ================================
+# Constants
+# ================================
+# Record attributes (usually passed with `extra=`) whose values are never logged
+REDACTED_FIELDS = frozenset({
+    'api_key', 'password', 'password_hash', 'encrypted_key', 'sealed_key', 'wrapped_data_key',
+    'data_key', 'token', 'secret', 'authorization', 'cookie',
+})
+
+# Secrets recognised inside message text: (substrings, one of which must be present; pattern; replacement)
+REDACTED_PATTERNS = [
+    (('kg_',), re.compile(r'\b(kg_[0-9a-f]{12}_)[A-Za-z0-9_-]+'), r'\1[REDACTED]'),  # access tokens
+    (('gAAAAA',), re.compile(r'\bgAAAAA[A-Za-z0-9_=-]{20,}'), '[REDACTED]'),  # Fernet tokens
+    (('earer', 'EARER'), re.compile(r'(?i)\b(bearer\s+)\S+'), r'\1[REDACTED]'),
+]
+REDACTED = '[REDACTED]'
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Attributes every LogRecord has; anything else was passed with `extra=`
+STANDARD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+_request_id = ContextVar('request_id', default=None)
+_listener = None
+_handler = None
+
+# ================================
+# Filters and handlers
+# ================================
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of INFO and DEBUG records from selected loggers.
+
+    Attributes:
+        rates (dict): Logger name prefix -> fraction of records to keep
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        name = record.name
+        while name:
+            rate = self.rates.get(name)
+            if rate is not None:
+                return random.random() < rate
+            name = name.rpartition('.')[0]
+        return True
+
+class RequestIdFilter(logging.Filter):
+    """
+    Attach the current request's correlation ID (or None) to each record.
+    """
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+class RedactingQueueHandler(QueueHandler):
+    """
+    QueueHandler that redacts secrets and never blocks the logging thread.
+
+    The message is built here, so the listener never sees the original
+    arguments. Secrets in extra fields and in the message text are replaced
+    before the record is enqueued.
+
+    Attributes:
+        dropped (int): Records discarded because the queue was full
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        message = record.getMessage()
+        for markers, pattern, replacement in REDACTED_PATTERNS:
+            if any(marker in message for marker in markers):
+                message = pattern.sub(replacement, message)
+        # Records are not shared between handlers here (the root logger has
+        # only this one), so the record is finalised in place.
+        record.msg = message
+        record.message = message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        for field in REDACTED_FIELDS.intersection(record.__dict__):
+            setattr(record, field, REDACTED)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line.
+
+    Fields: time, level, logger, message, request_id, any extra fields and,
+    for exceptions, exc_info.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+# ================================
+# Functions
+# ================================
+def _parse_mapping(value, convert):
+    """
+    Parse "name=value,name=value" into a dict.
+    """
+    mapping = {}
+    for item in value.split(','):
+        name, sep, setting = item.partition('=')
+        if sep and name.strip():
+            mapping[name.strip()] = convert(setting.strip())
+    return mapping
+
+def current_request_id():
+    """
+    Return the correlation ID of the request being handled, if any.
+
+    Returns:
+        str or None: Request ID
+    """
+    return _request_id.get()
+
+def bind_request_id(incoming=None):
+    """
+    Set the correlation ID for the work running in the current context.
+
+    Args:
+        incoming (str, optional): ID supplied by the client; used if well-formed
+
+    Returns:
+        Token: Pass to unbind_request_id when the request is done
+    """
+    request_id = incoming if incoming and REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+    return _request_id.set(request_id)
+
+def unbind_request_id(token):
+    """
+    Restore the correlation ID that was current before bind_request_id.
+
+    Args:
+        token (Token): Value returned by bind_request_id
+    """
+    try:
+        _request_id.reset(token)
+    except ValueError:
+        # Unbound from another context (e.g. after a streamed response)
+        _request_id.set(None)
+
+def _start_request():
+    request.environ['keyguardian.request_id_token'] = bind_request_id(request.headers.get(REQUEST_ID_HEADER))
+
+def _tag_response(response):
+    request_id = _request_id.get()
+    if request_id is not None:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+def _end_request(exception=None):
+    token = request.environ.pop('keyguardian.request_id_token', None)
+    if token is not None:
+        unbind_request_id(token)
+
+def logging_stats():
+    """
+    Return the pipeline's queue depth and dropped-record count.
+
+    Returns:
+        dict: queued and dropped counts (zeros if logging is not initialised)
+    """
+    if _handler is None:
+        return {'queued': 0, 'dropped': 0}
+    return {'queued': _handler.queue.qsize(), 'dropped': _handler.dropped}
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def configure_logging(config):
+    """
+    Install the queue-based pipeline on the root logger.
+
+    Replaces any handlers already on the root logger (including a previous
+    call's pipeline, whose queue is drained first) and applies the levels.
+
+    Args:
+        config (dict): Flask app config (LOG_* settings)
+    """
+    global _handler, _listener
+    _stop_listener()
+
+    output = logging.StreamHandler(sys.stderr)
+    if config['LOG_FORMAT'] == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'))
+
+    log_queue = queue.Queue(config['LOG_QUEUE_SIZE'])
+    _handler = RedactingQueueHandler(log_queue)
+    _handler.addFilter(SamplingFilter(_parse_mapping(config['LOG_SAMPLE_RATES'], float)))
+    _handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(config['LOG_LEVEL'].upper())
+    for name, level in _parse_mapping(config['LOG_LEVELS'], str.upper).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+def init_logging(app):
+    """
+    Configure the logging pipeline and request correlation IDs for an app.
+
+    Args:
+        app (Flask): Application
+    """
+    configure_logging(app.config)
+    app.before_request(_start_request)
+    app.after_request(_tag_response)
+    app.teardown_request(_end_request)
+
+atexit.register(_stop_listener)
@@ -0,0 +1,41 @@
+"""Add personal access tokens
+
+Revision ID: 20261018_add_access_tokens
+Revises: 20261018_add_user_data_version
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_access_tokens'
+down_revision = '20261018_add_user_data_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('access_token',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('prefix', sa.String(length=16), nullable=False),
+        sa.Column('salt', sa.String(length=32), nullable=False),
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('scopes', sa.String(length=200), nullable=False),
+        sa.Column('category_ids', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('revoked_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('prefix')
+    )
+    op.create_index(op.f('ix_access_token_user_id'), 'access_token', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_access_token_user_id'), table_name='access_token')
+    op.drop_table('access_token')
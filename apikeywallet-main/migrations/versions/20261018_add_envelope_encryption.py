@@ -0,0 +1,38 @@
+"""Add per-user data keys and binary ciphertext column
+
+Revision ID: 20261018_add_envelope_encryption
+Revises: 20261018_add_hot_lookup_indexes
+Create Date: 2026-10-18 10:00:00.000000
+
+Existing rows keep their Fernet token in api_key.encrypted_key and are
+re-sealed into api_key.ciphertext lazily on first read.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_envelope_encryption'
+down_revision = '20261018_add_hot_lookup_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('wrapped_data_key', sa.Text(), nullable=True))
+    with op.batch_alter_table('api_key', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ciphertext', sa.LargeBinary(), nullable=True))
+        batch_op.alter_column('encrypted_key',
+               existing_type=sa.Text(),
+               nullable=True)
+
+
+def downgrade():
+    # Sealed rows cannot be represented without the ciphertext column; they
+    # must be decrypted back to Fernet tokens before downgrading.
+    with op.batch_alter_table('api_key', schema=None) as batch_op:
+        batch_op.alter_column('encrypted_key',
+               existing_type=sa.Text(),
+               nullable=False)
+        batch_op.drop_column('ciphertext')
+    op.drop_column('user', 'wrapped_data_key')
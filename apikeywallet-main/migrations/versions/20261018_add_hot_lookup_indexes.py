@@ -0,0 +1,54 @@
+"""Add composite and functional indexes for hot lookups
+
+Revision ID: 20261018_add_hot_lookup_indexes
+Revises: 20250416_add_is_admin_to_users
+Create Date: 2026-10-18 09:00:00.000000
+
+Indexes are built with CREATE INDEX CONCURRENTLY on PostgreSQL, which cannot
+run inside a transaction, so the statements run in an autocommit block.
+
+ix_user_lower_email is unique: login looks users up by lower(email), so two
+accounts differing only in case would make the lookup ambiguous. The
+upgrade refuses to run while such accounts exist; merge or rename them
+first (the error lists them).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_hot_lookup_indexes'
+down_revision = '20250416_add_is_admin_to_users'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_api_key_user_category_lower_name', 'api_key', ['user_id', 'category_id', sa.text('lower(key_name)')], False),
+    ('ix_category_user_name', 'category', ['user_id', 'name'], False),
+    ('ix_user_lower_email', 'user', [sa.text('lower(email)')], True),
+]
+
+
+def check_duplicate_emails():
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT lower(email), count(*) FROM "user" GROUP BY lower(email) HAVING count(*) > 1 ORDER BY 1'
+    )).all()
+    if duplicates:
+        listing = ', '.join(f'{email} ({count} accounts)' for email, count in duplicates)
+        raise RuntimeError(
+            'Cannot create the unique index ix_user_lower_email: these emails belong to several accounts '
+            f'differing only in case: {listing}. Merge or rename those accounts, then run the upgrade again.'
+        )
+
+
+def upgrade():
+    check_duplicate_emails()
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
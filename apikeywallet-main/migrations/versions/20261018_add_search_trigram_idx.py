@@ -0,0 +1,50 @@
+"""Add trigram indexes for the search fallback on PostgreSQL
+
+Revision ID: 20261018_add_search_trigram_idx
+Revises: 20261018_add_access_tokens
+Create Date: 2026-10-18 14:00:00.000000
+
+/search falls back to `lower(name) LIKE '%term%'` queries while a user's
+in-memory index is being built (see search_index.py). On PostgreSQL, GIN
+indexes with pg_trgm operator classes let those queries avoid a scan of
+the user's rows. The migration is a no-op on other databases, and on
+PostgreSQL servers where the pg_trgm extension is not available.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_search_trigram_idx'
+down_revision = '20261018_add_access_tokens'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_api_key_lower_name_trgm', 'api_key', 'key_name'),
+    ('ix_category_lower_name_trgm', 'category', 'name'),
+]
+
+
+def _trigrams_available(bind):
+    if bind.dialect.name != 'postgresql':
+        return False
+    return bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).first() is not None
+
+
+def upgrade():
+    if not _trigrams_available(op.get_bind()):
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for name, table, column in INDEXES:
+            op.create_index(name, table, [sa.text(f'lower({column}) gin_trgm_ops')],
+                            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,51 @@
+"""Add row revisions and tombstones for delta sync
+
+Revision ID: 20261018_add_sync_revisions
+Revises: 20261018_add_search_trigram_idx
+Create Date: 2026-10-18 15:00:00.000000
+
+Keys and categories get a `revision` (the owner's data version of their last
+change), deleted rows leave a tombstone, and users remember up to which
+revision tombstones have been pruned. Existing rows start at revision 0, so
+clients pick them up with their first full sync.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_sync_revisions'
+down_revision = '20261018_add_search_trigram_idx'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('tombstones_pruned_revision', sa.BigInteger(), server_default='0', nullable=False))
+    for table in ('api_key', 'category'):
+        op.add_column(table, sa.Column('revision', sa.BigInteger(), nullable=True))
+        op.execute(f'UPDATE {table} SET revision = 0')
+        op.create_index(f'ix_{table}_user_revision', table, ['user_id', 'revision'], unique=False)
+
+    op.create_table('tombstone',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('object_type', sa.String(length=10), nullable=False),
+        sa.Column('object_id', sa.Integer(), nullable=False),
+        sa.Column('revision', sa.BigInteger(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tombstone_user_revision', 'tombstone', ['user_id', 'revision'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_tombstone_user_revision', table_name='tombstone')
+    op.drop_table('tombstone')
+    for table in ('category', 'api_key'):
+        op.drop_index(f'ix_{table}_user_revision', table_name=table)
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('revision')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('tombstones_pruned_revision')
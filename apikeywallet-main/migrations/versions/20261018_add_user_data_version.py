@@ -0,0 +1,27 @@
+"""Add per-user data version counter
+
+Revision ID: 20261018_add_user_data_version
+Revises: 20261018_add_envelope_encryption
+Create Date: 2026-10-18 12:00:00.000000
+
+The counter is bumped on every change to a user's keys or categories and
+backs the JSON API's ETags.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261018_add_user_data_version'
+down_revision = '20261018_add_envelope_encryption'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('data_version', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
@@ -1,14 +1,13 @@
 """
 models.py - SQLAlchemy ORM models
 
-Defines User, APIKey, and Category database models.
+Defines User, APIKey, Category, Tombstone, and AccessToken database models.
 
 Dependencies:
 - Flask-SQLAlchemy
 - Flask-Login
 - Werkzeug security
 - datetime
-- logging
 
 @author KeyGuardian Team
 """
@@ -17,11 +16,11 @@ Dependencies:
 # Standard library imports
 # ================================
 from datetime import datetime
-import logging
 
 # ================================
 # Third-party imports
 # ================================
+from flask import current_app
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
@@ -45,6 +44,9 @@ class User(UserMixin, db.Model):
         api_keys (list): User's API keys
         categories (list): User's categories
         is_admin (bool): Admin role flag
+        wrapped_data_key (str): Per-user AES data key, encrypted by the master key
+        data_version (int): Incremented on every change to the user's keys or categories
+        tombstones_pruned_revision (int): Highest revision whose tombstones have been pruned
     """
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -53,15 +55,25 @@ class User(UserMixin, db.Model):
     api_keys = db.relationship('APIKey', backref='user', lazy='dynamic')
     categories = db.relationship('Category', backref='user', lazy='dynamic')
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
+    wrapped_data_key = db.Column(db.Text, nullable=True)
+    data_version = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
+    tombstones_pruned_revision = db.Column(db.BigInteger, default=0, server_default='0', nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_user_lower_email', db.func.lower(email), unique=True),
+    )
 
     def set_password(self, password):
         """
-        Hash and set the user's password.
+        Hash and set the user's password on the calling thread.
+
+        Request handlers use password_hashing.hash_password instead, which
+        runs on the bounded hashing pool.
 
         Args:
             password (str): Plaintext password
         """
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt'))
 
     def check_password(self, password):
         """
@@ -83,20 +95,25 @@ class APIKey(db.Model):
         id (int): Primary key
         user_id (int): Foreign key to User
         key_name (str): Name of the API key
-        encrypted_key (str): Encrypted API key
+        encrypted_key (str): Legacy Fernet-encrypted API key (None once re-sealed)
+        ciphertext (bytes): API key sealed with the owner's data key (AES-GCM)
         date_added (datetime): When the key was added
         category_id (int): Foreign key to Category
+        revision (int): Owner's data version when the key last changed (None until the commit stamps it)
     """
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     key_name = db.Column(db.String(120), nullable=False)
-    encrypted_key = db.Column(db.Text, nullable=False)
+    encrypted_key = db.Column(db.Text, nullable=True)
+    ciphertext = db.Column(db.LargeBinary, nullable=True)
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
+    revision = db.Column(db.BigInteger, nullable=True)
 
-    def __init__(self, *args, **kwargs):
-        super(APIKey, self).__init__(*args, **kwargs)
-        logging.info(f"Creating new APIKey: user_id={self.user_id}, key_name={self.key_name}, category_id={self.category_id}")
+    __table_args__ = (
+        db.Index('ix_api_key_user_category_lower_name', user_id, category_id, db.func.lower(key_name)),
+        db.Index('ix_api_key_user_revision', user_id, revision),
+    )
 
 class Category(db.Model):
     """
@@ -107,12 +124,71 @@ class Category(db.Model):
         name (str): Category name
         user_id (int): Foreign key to User
         api_keys (list): API keys in this category
+        revision (int): Owner's data version when the category last changed (None until the commit stamps it)
     """
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     api_keys = db.relationship('APIKey', backref='category', lazy='dynamic')
+    revision = db.Column(db.BigInteger, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_category_user_name', user_id, name),
+        db.Index('ix_category_user_revision', user_id, revision),
+    )
 
-    def __init__(self, *args, **kwargs):
-        super(Category, self).__init__(*args, **kwargs)
-        logging.info(f"Creating new Category: name={self.name}, user_id={self.user_id}")
+class Tombstone(db.Model):
+    """
+    Record of a deleted key or category, for delta sync clients.
+
+    Attributes:
+        id (int): Primary key
+        user_id (int): Foreign key to User
+        object_type (str): 'key' or 'category'
+        object_id (int): ID of the deleted row
+        revision (int): Owner's data version of the deletion (None until the commit stamps it)
+        deleted_at (datetime): Deletion time, used for pruning
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    object_type = db.Column(db.String(10), nullable=False)
+    object_id = db.Column(db.Integer, nullable=False)
+    revision = db.Column(db.BigInteger, nullable=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_tombstone_user_revision', user_id, revision),
+    )
+
+class AccessToken(db.Model):
+    """
+    Personal access token for machine clients.
+
+    Only a salted SHA-256 digest of the token secret is stored. The public
+    prefix identifies the token without revealing it.
+
+    Attributes:
+        id (int): Primary key
+        user_id (int): Foreign key to User
+        name (str): Label chosen by the user
+        prefix (str): Public, unique lookup part of the token
+        salt (str): Hex salt mixed into the digest
+        digest (str): Hex SHA-256 digest of salt and secret
+        scopes (str): Space-separated permissions (e.g. "read:keys decrypt:keys")
+        category_ids (str): Comma-separated category IDs the token may see (0 for
+            uncategorized keys), or None for all categories
+        created_at (datetime): Creation time
+        expires_at (datetime): Expiry time, or None
+        revoked_at (datetime): Revocation time, or None
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    prefix = db.Column(db.String(16), nullable=False, unique=True)
+    salt = db.Column(db.String(32), nullable=False)
+    digest = db.Column(db.String(64), nullable=False)
+    scopes = db.Column(db.String(200), nullable=False)
+    category_ids = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True)
+    revoked_at = db.Column(db.DateTime, nullable=True)
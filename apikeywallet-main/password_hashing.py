@@ -0,0 +1,218 @@
+"""
+password_hashing.py - Offloaded, admission-controlled password hashing
+
+Password hashes (scrypt/pbkdf2) are deliberately slow. Running them inline
+lets a login burst occupy every request worker. Here they run on a small
+dedicated thread pool instead. Admission is bounded: at most
+PASSWORD_HASH_WORKERS hashes run and PASSWORD_HASH_MAX_PENDING wait at any
+time. A request that cannot get a slot within PASSWORD_HASH_QUEUE_TIMEOUT
+seconds is rejected with 503 and Retry-After instead of piling up.
+
+The hash method comes from PASSWORD_HASH_METHOD (any werkzeug method
+string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:1000000"). After a
+successful login, stored hashes made with other parameters are rehashed.
+
+Set PASSWORD_HASH_WORKERS=0 to hash inline on the request thread.
+
+Dependencies:
+- Flask
+- Werkzeug security
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ================================
+# Third-party imports
+# ================================
+from flask import current_app, jsonify
+from werkzeug.security import generate_password_hash, check_password_hash
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# Classes
+# ================================
+class HasherBusy(Exception):
+    """
+    Raised when no hashing slot becomes free within the queue timeout.
+    """
+
+class PasswordHasher:
+    """
+    Bounded executor for password hashing with admission control.
+
+    Attributes:
+        workers (int): Hashes computed concurrently (0 = inline)
+        max_pending (int): Hashes allowed to wait for a worker
+        queue_timeout (float): Seconds a request waits for admission
+        completed (int): Hashes computed
+        rejected (int): Requests turned away because the hasher was saturated
+    """
+
+    def __init__(self, workers, max_pending, queue_timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.completed = 0
+        self.rejected = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers + max_pending) if workers else None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash') if workers else None
+
+    def run(self, func, *args):
+        """
+        Run `func(*args)` on the hashing pool and wait for its result.
+
+        Args:
+            func (callable): Hashing function
+            *args: Arguments for `func`
+
+        Returns:
+            Result of `func`
+
+        Raises:
+            HasherBusy: If no slot is free within `queue_timeout`
+        """
+        if self._executor is None:
+            result = func(*args)
+            with self._lock:
+                self.completed += 1
+            return result
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def stats(self):
+        """
+        Return current load and counters.
+
+        Returns:
+            dict: Configuration, in-flight count and completed/rejected totals
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'queue_timeout': self.queue_timeout,
+                'in_flight': self._in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+# ================================
+# Functions
+# ================================
+def get_hasher():
+    """
+    Return the app's password hasher.
+
+    Returns:
+        PasswordHasher: Hasher registered by init_password_hashing
+    """
+    return current_app.extensions['password_hasher']
+
+def hash_method():
+    """
+    Return the configured werkzeug hash method string.
+
+    Returns:
+        str: Hash method
+    """
+    return current_app.config['PASSWORD_HASH_METHOD']
+
+def hash_password(password):
+    """
+    Hash a password with the configured method on the hashing pool.
+
+    Args:
+        password (str): Plaintext password
+
+    Returns:
+        str: Werkzeug password hash
+
+    Raises:
+        HasherBusy: If the hasher is saturated
+    """
+    return get_hasher().run(generate_password_hash, password, hash_method())
+
+def verify_password(password_hash, password):
+    """
+    Check a password against a stored hash on the hashing pool.
+
+    Args:
+        password_hash (str): Stored werkzeug hash
+        password (str): Plaintext password
+
+    Returns:
+        bool: True if the password matches
+
+    Raises:
+        HasherBusy: If the hasher is saturated
+    """
+    return get_hasher().run(check_password_hash, password_hash, password)
+
+def needs_rehash(password_hash):
+    """
+    Return True if a stored hash was made with different parameters than configured.
+
+    The configured method is compared in its canonical form (werkzeug fills in
+    default parameters, e.g. "scrypt" becomes "scrypt:32768:8:1").
+
+    Args:
+        password_hash (str): Stored werkzeug hash
+
+    Returns:
+        bool: True if the hash should be recomputed
+    """
+    method = hash_method()
+    canonical_methods = current_app.extensions.setdefault('password_hash_canonical', {})
+    if method not in canonical_methods:
+        canonical_methods[method] = generate_password_hash('', method).split('$', 1)[0]
+    return password_hash.split('$', 1)[0] != canonical_methods[method]
+
+def hasher_busy_response(error):
+    """
+    Error handler turning HasherBusy into a 503 response with Retry-After.
+
+    Args:
+        error (HasherBusy): The raised error
+
+    Returns:
+        tuple: JSON response, status code and headers
+    """
+    current_app.logger.warning('Password hasher saturated; rejecting request')
+    return (jsonify({'error': 'The server is busy processing sign-ins. Please retry shortly.'}), 503,
+            {'Retry-After': '1'})
+
+def init_password_hashing(app):
+    """
+    Create the app's password hasher from its configuration.
+
+    Args:
+        app (Flask): Application
+    """
+    app.extensions['password_hasher'] = PasswordHasher(
+        app.config['PASSWORD_HASH_WORKERS'],
+        app.config['PASSWORD_HASH_MAX_PENDING'],
+        app.config['PASSWORD_HASH_QUEUE_TIMEOUT'],
+    )
+    app.register_error_handler(HasherBusy, hasher_busy_response)
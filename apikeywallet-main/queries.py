@@ -0,0 +1,168 @@
+"""
+queries.py - Reusable query builders
+
+Contains the query builders shared by routes that list a user's API keys,
+so that ordering and eager loading are defined in one place.
+
+Dependencies:
+- Flask
+- itsdangerous
+- SQLAlchemy
+- models.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+from itertools import groupby
+
+# ================================
+# Third-party imports
+# ================================
+from flask import current_app
+from itsdangerous import URLSafeSerializer
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import contains_eager
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from models import APIKey, Category
+
+UNCATEGORIZED = 'Uncategorized'
+
+# ================================
+# Functions
+# ================================
+def cursor_serializer():
+    """
+    Return the serializer used to sign opaque pagination cursors.
+
+    Returns:
+        URLSafeSerializer: Serializer keyed on the app's SECRET_KEY
+    """
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='keys-page-cursor')
+
+def wallet_keys_query(user_id, category_id=None):
+    """
+    Build the query for a user's API keys with their categories eagerly loaded.
+
+    Keys are fetched in one joined query, ordered by category name
+    (uncategorized last) and then case-insensitively by key name.
+
+    Args:
+        user_id (int): Owner's user ID
+        category_id (int, optional): Filter by category ID; 0 selects uncategorized keys
+
+    Returns:
+        Query: APIKey query
+    """
+    query = (
+        APIKey.query
+        .outerjoin(APIKey.category)
+        .options(contains_eager(APIKey.category))
+        .filter(APIKey.user_id == user_id)
+    )
+    if category_id == 0:
+        query = query.filter(APIKey.category_id.is_(None))
+    elif category_id:
+        query = query.filter(APIKey.category_id == category_id)
+    return query.order_by(
+        Category.name.asc().nulls_last(),
+        func.lower(APIKey.key_name),
+        APIKey.id,
+    )
+
+def group_keys_by_category(api_keys):
+    """
+    Group already-ordered API keys by category name.
+
+    Args:
+        api_keys (iterable): Keys ordered as by `wallet_keys_query`
+
+    Returns:
+        dict: Category name -> list of keys, in query order
+    """
+    grouped_keys = {}
+    for category_name, keys in groupby(api_keys, key=lambda key: key.category.name if key.category else UNCATEGORIZED):
+        grouped_keys.setdefault(category_name, []).extend(keys)
+    return grouped_keys
+
+def _page_segment(user_id, limit, categorized, category_id=None, after=None, category_ids=None):
+    """
+    Fetch one index-ordered segment of a user's keys for keyset pagination.
+
+    Args:
+        user_id (int): Owner's user ID
+        limit (int): Maximum rows to fetch
+        categorized (bool): True for keys with a category, False for uncategorized keys
+        category_id (int, optional): Restrict the categorized segment to one category
+        after (tuple, optional): (category_id, lower key name, id) to continue after
+        category_ids (iterable, optional): Restrict the categorized segment to these categories
+
+    Returns:
+        list: Rows with id, key_name, category_id, category_name, date_added, sort_name
+    """
+    lower_name = func.lower(APIKey.key_name)
+    statement = (
+        select(APIKey.id, APIKey.key_name, APIKey.category_id, Category.name.label('category_name'),
+               APIKey.date_added, lower_name.label('sort_name'))
+        .outerjoin(Category, Category.id == APIKey.category_id)
+        .where(APIKey.user_id == user_id)
+    )
+    if categorized:
+        statement = statement.where(APIKey.category_id.is_not(None))
+        if category_id:
+            statement = statement.where(APIKey.category_id == category_id)
+        if category_ids is not None:
+            statement = statement.where(APIKey.category_id.in_(category_ids))
+        if after is not None:
+            statement = statement.where(tuple_(APIKey.category_id, lower_name, APIKey.id) > tuple_(*after))
+        statement = statement.order_by(APIKey.category_id, lower_name, APIKey.id)
+    else:
+        statement = statement.where(APIKey.category_id.is_(None))
+        if after is not None:
+            statement = statement.where(tuple_(lower_name, APIKey.id) > tuple_(after[1], after[2]))
+        statement = statement.order_by(lower_name, APIKey.id)
+    return db.session.execute(statement.limit(limit)).all()
+
+def keys_page(user_id, limit, after=None, category_id=None, category_ids=None):
+    """
+    Fetch one page of a user's keys using keyset (cursor) pagination.
+
+    Keys are ordered by (category_id, lower(key_name), id) with uncategorized
+    keys last. Each page is an index range scan that starts right after the
+    previous page, so the cost does not grow with the page depth.
+
+    Args:
+        user_id (int): Owner's user ID
+        limit (int): Page size
+        after (tuple, optional): Sort key of the last row of the previous page
+        category_id (int, optional): Filter by category ID; 0 selects uncategorized keys
+        category_ids (iterable, optional): Only these category IDs (0 = uncategorized keys)
+
+    Returns:
+        tuple: (rows, sort key of the last row or None when there are no more pages)
+    """
+    categorized_ids = None
+    include_uncategorized = True
+    if category_ids is not None:
+        categorized_ids = [c for c in category_ids if c]
+        include_uncategorized = 0 in category_ids
+
+    rows = []
+    in_categorized = after is None or after[0] is not None
+    if in_categorized and category_id != 0 and categorized_ids != []:
+        rows = _page_segment(user_id, limit + 1, True, category_id, after, categorized_ids)
+    if len(rows) <= limit and not category_id and include_uncategorized:
+        uncategorized_after = after if after is not None and after[0] is None else None
+        rows += _page_segment(user_id, limit + 1 - len(rows), False, after=uncategorized_after)
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, (last.category_id, last.sort_name, last.id)
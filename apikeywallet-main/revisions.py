@@ -0,0 +1,295 @@
+"""
+revisions.py - Row revisions and tombstones for delta sync
+
+Every key and category row carries a `revision`: the owner's data version
+(see versioning.py) of the transaction that last changed it. Deleted keys
+and categories leave a Tombstone with the revision of the deletion. A
+client that remembers the data version of its last sync can then fetch
+only what changed since (`/changes?since=<rev>`).
+
+Revisions are assigned at commit time, after the transaction has bumped
+the data version and holds the lock on the user row, so they increase in
+commit order. Changed rows are written with a NULL revision:
+- ORM changes to key names, key categories and category names are unstamped
+  by a before-flush hook;
+- new rows and tombstones start out NULL;
+- code changing these columns with bulk statements sets `revision=None`
+  itself.
+Just before the commit, one UPDATE per affected table then sets the
+NULL revisions of each bumped user to the new data version.
+
+Deleting a category moves its keys to uncategorized, which also changes the
+keys' revisions. Tombstones older than TOMBSTONE_RETENTION_DAYS are removed
+with `flask prune-tombstones`. A client whose last sync is older than the
+pruned tombstones gets a full snapshot instead of a delta.
+
+Dependencies:
+- click
+- Flask
+- SQLAlchemy
+- models.py
+- versioning.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+from datetime import datetime, timedelta
+
+# ================================
+# Third-party imports
+# ================================
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, event, exists, func, inspect, or_, select, update
+from sqlalchemy.orm import Session
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from versioning import version_bumps
+
+TABLES_KEY = 'revision_tables'
+TRACKED_TABLES = ('api_key', 'category', 'tombstone')
+
+# Columns whose changes sync clients need to see
+SYNCED_FIELDS = {
+    'api_key': ('key_name', 'category_id'),
+    'category': ('name',),
+}
+
+# ================================
+# Functions
+# ================================
+def record_deletions(user_id, object_type, object_ids):
+    """
+    Add tombstones for rows deleted with bulk DELETE statements.
+
+    ORM deletes are recorded automatically; this is for code that deletes
+    with `delete(...)` statements. The tombstones are stamped at commit.
+
+    Args:
+        user_id (int): Owner's user ID
+        object_type (str): 'key' or 'category'
+        object_ids (iterable): IDs of the deleted rows
+    """
+    from models import Tombstone
+    db.session.add_all(Tombstone(user_id=user_id, object_type=object_type, object_id=object_id)
+                       for object_id in object_ids)
+
+def _scope_filter(column, category_ids):
+    categorized_ids = [c for c in category_ids if c]
+    if 0 in category_ids:
+        return or_(column.in_(categorized_ids), column.is_(None))
+    return column.in_(categorized_ids)
+
+def changes_since(user_id, since, category_ids=None):
+    """
+    Return the user's keys and categories changed after a revision.
+
+    The data version is read before the rows, so a concurrent commit can only
+    add rows newer than the returned revision; the next sync returns them
+    again, which clients apply idempotently.
+
+    A full snapshot is returned instead of a delta when `since` is missing
+    or 0, newer than the current revision (e.g. after a restore), older than
+    pruned tombstones, or when the caller only sees some categories (a
+    scoped access token cannot be told about keys leaving its scope).
+
+    Args:
+        user_id (int): Owner's user ID
+        since (int or None): Revision of the client's last sync
+        category_ids (frozenset, optional): Visible category IDs (0 = uncategorized), or None for all
+
+    Returns:
+        dict: revision, full flag, changed keys and categories, and deleted IDs
+    """
+    from models import User, APIKey, Category, Tombstone
+    user = db.session.execute(
+        select(User.data_version, User.tombstones_pruned_revision).where(User.id == user_id)
+    ).first()
+    revision = user.data_version
+    full = (not since or since > revision or since < user.tombstones_pruned_revision
+            or category_ids is not None)
+
+    keys = (
+        select(APIKey.id, APIKey.key_name, APIKey.category_id, APIKey.date_added, APIKey.revision,
+               Category.name.label('category_name'))
+        .outerjoin(Category, Category.id == APIKey.category_id)
+        .where(APIKey.user_id == user_id)
+        .order_by(APIKey.id)
+    )
+    categories = (
+        select(Category.id, Category.name, Category.revision)
+        .where(Category.user_id == user_id)
+        .order_by(Category.id)
+    )
+    if not full:
+        keys = keys.where(APIKey.revision > since)
+        categories = categories.where(Category.revision > since)
+    if category_ids is not None:
+        keys = keys.where(_scope_filter(APIKey.category_id, category_ids))
+        categories = categories.where(Category.id.in_([c for c in category_ids if c]))
+
+    deleted = {'key': [], 'category': []}
+    if not full:
+        for object_type, object_id in db.session.execute(
+                select(Tombstone.object_type, Tombstone.object_id)
+                .where(Tombstone.user_id == user_id, Tombstone.revision > since)
+                .order_by(Tombstone.revision, Tombstone.id)):
+            deleted[object_type].append(object_id)
+
+    return {
+        'revision': revision,
+        'full': full,
+        'keys': [{
+            'id': row.id,
+            'key_name': row.key_name,
+            'category_id': row.category_id,
+            'category_name': row.category_name or 'Uncategorized',
+            'date_added': row.date_added.isoformat() if row.date_added else None,
+            'revision': row.revision,
+        } for row in db.session.execute(keys)],
+        'categories': [{'id': row.id, 'name': row.name, 'revision': row.revision}
+                       for row in db.session.execute(categories)],
+        'deleted_keys': deleted['key'],
+        'deleted_categories': deleted['category'],
+    }
+
+def prune_tombstones(older_than):
+    """
+    Delete tombstones older than a cutoff and remember the pruned revisions.
+
+    Args:
+        older_than (datetime): Tombstones deleted before this time are removed
+
+    Returns:
+        int: Number of tombstones removed
+    """
+    from models import User, Tombstone
+    stale = (Tombstone.deleted_at < older_than, Tombstone.revision.isnot(None))
+    pruned_revision = (
+        select(func.max(Tombstone.revision))
+        .where(Tombstone.user_id == User.id, *stale)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(User)
+        .where(exists().where(Tombstone.user_id == User.id, *stale))
+        .values(tombstones_pruned_revision=pruned_revision)
+        .execution_options(synchronize_session=False)
+    )
+    removed = db.session.execute(delete(Tombstone).where(*stale)).rowcount
+    db.session.commit()
+    return removed
+
+# ================================
+# Stamping hooks
+# ================================
+def _track(session, table_name):
+    session.info.setdefault(TABLES_KEY, set()).add(table_name)
+
+def _unstamp_changes(session, flush_context, instances):
+    """
+    Before each flush, clear the revision of changed rows and record deletions.
+    """
+    from models import APIKey, Category, Tombstone
+    for obj in session.new:
+        if isinstance(obj, (APIKey, Category, Tombstone)):
+            _track(session, obj.__table__.name)
+    for obj in session.dirty:
+        table = getattr(obj, '__table__', None)
+        fields = SYNCED_FIELDS.get(getattr(table, 'name', None))
+        if fields is None:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[field].history.has_changes() for field in fields):
+            obj.revision = None
+            _track(session, table.name)
+    for obj in list(session.deleted):
+        if isinstance(obj, APIKey):
+            session.add(Tombstone(user_id=obj.user_id, object_type='key', object_id=obj.id))
+            _track(session, 'tombstone')
+        elif isinstance(obj, Category):
+            session.add(Tombstone(user_id=obj.user_id, object_type='category', object_id=obj.id))
+            session.connection().execute(
+                update(APIKey.__table__)
+                .where(APIKey.__table__.c.category_id == obj.id)
+                .values(category_id=None, revision=None)
+            )
+            _track(session, 'tombstone')
+            _track(session, 'api_key')
+
+def _note_bulk_writes(orm_execute_state):
+    """
+    Track tables written by bulk INSERT/UPDATE statements, whose new rows need stamping.
+    """
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if getattr(table, 'name', None) in TRACKED_TABLES:
+        _track(orm_execute_state.session, table.name)
+
+def _stamp_revisions(session):
+    """
+    Before commit, set NULL revisions of every bumped user to the new data version.
+    """
+    from models import User, APIKey, Category, Tombstone
+    bumps = version_bumps(session)
+    if not bumps:
+        session.info.pop(TABLES_KEY, None)
+        return
+    session.flush()
+    tracked = session.info.pop(TABLES_KEY, set())
+    if not tracked:
+        return
+    connection = session.connection()
+    tables = [model.__table__ for model in (APIKey, Category, Tombstone) if model.__table__.name in tracked]
+    for user_id, versions in bumps.items():
+        if versions is None:
+            version = connection.execute(select(User.data_version).where(User.id == user_id)).scalar()
+        else:
+            version = versions[1]
+        for table in tables:
+            connection.execute(
+                update(table)
+                .where(table.c.user_id == user_id, table.c.revision.is_(None))
+                .values(revision=version)
+            )
+
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop(TABLES_KEY, None)
+
+def init_revisions():
+    """
+    Register the session hooks that stamp revisions and record tombstones.
+
+    Safe to call once per app; the hooks are only registered once.
+    """
+    if event.contains(Session, 'before_flush', _unstamp_changes):
+        return
+    event.listen(Session, 'before_flush', _unstamp_changes)
+    event.listen(Session, 'do_orm_execute', _note_bulk_writes)
+    event.listen(Session, 'before_commit', _stamp_revisions)
+    event.listen(Session, 'after_soft_rollback', _discard_after_rollback)
+
+# ================================
+# CLI command
+# ================================
+@click.command('prune-tombstones')
+@click.option('--days', type=int, default=None,
+              help='Remove tombstones older than this many days (default: TOMBSTONE_RETENTION_DAYS).')
+@with_appcontext
+def prune_tombstones_command(days):
+    """
+    Remove old tombstones of deleted keys and categories.
+    """
+    if days is None:
+        days = current_app.config['TOMBSTONE_RETENTION_DAYS']
+    removed = prune_tombstones(datetime.utcnow() - timedelta(days=days))
+    click.echo(f'Removed {removed} tombstones older than {days} days.')
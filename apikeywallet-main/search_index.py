@@ -0,0 +1,527 @@
+"""
+search_index.py - Type-ahead search over a user's keys and categories
+
+Backs `/search` with a per-user in-memory index of key and category names,
+held in a per-process LRU/TTL cache. Each index has three parts:
+- full names in a sorted array, for "name starts with" lookups;
+- every word of each name in a sorted array, for word-prefix lookups;
+- trigram postings, for matches anywhere in a name.
+
+A match needs every query term somewhere in the name. Results are ranked
+exact name, then name prefix, then word prefix, then substring, and
+alphabetically within each rank.
+
+Each index is tagged with the user's `data_version` (see versioning.py), and
+an index is only used while its version matches the database. Changes
+committed through the ORM (adding, renaming, moving or deleting keys and
+categories) update the cached index in place. A commit that changes keys or
+categories with bulk INSERT/UPDATE/DELETE statements drops the user's index
+instead, unless the statements are marked as tracked and their changes
+described with `record_changes`. Other processes see the new version and
+rebuild. While no current
+index exists, searches run as a LIKE query (a trigram GIN index on
+PostgreSQL, see migrations) and the index is rebuilt in the background.
+
+Dependencies:
+- Flask
+- SQLAlchemy
+- cache.py
+- models.py
+- versioning.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import heapq
+import logging
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# ================================
+# Third-party imports
+# ================================
+from flask import current_app
+from sqlalchemy import and_, case, event, func, or_, select
+from sqlalchemy.orm import Session
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from cache import TTLCache
+from versioning import get_data_version, take_version_bumps
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# Cache setup
+# ================================
+CHANGES_KEY = 'search_index_changes'
+UNTRACKED_KEY = 'search_index_untracked'
+# Execution option marking bulk statements whose changes are passed to record_changes()
+TRACKED_OPTION = 'search_index_tracked'
+INDEXED_TABLES = ('api_key', 'category')
+
+MATCH_EXACT, MATCH_PREFIX, MATCH_WORD, MATCH_SUBSTRING = range(4)
+MATCH_NAMES = ('exact', 'prefix', 'word', 'substring')
+
+# Above this share of all names, candidates are picked by walking the names
+# in order instead of sorting the candidates
+DENSE_CANDIDATES = 0.125
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# Sized from SEARCH_INDEX_CACHE_SIZE / SEARCH_INDEX_TTL by init_search_index
+_indexes = TTLCache(100, 900)
+_builder = None
+_building = set()
+_builder_lock = threading.Lock()
+
+# ================================
+# Helpers
+# ================================
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+def _terms(normalized):
+    return WORD_PATTERN.findall(normalized) or [normalized]
+
+def _trigrams(words):
+    return {word[i:i + 3] for word in words for i in range(len(word) - 2)}
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# ================================
+# Classes
+# ================================
+class SearchIndex:
+    """
+    In-memory name index for one user's keys and categories.
+
+    Documents are integers: a key's ID, or the negated ID of a category.
+
+    Attributes:
+        version (int): The user's data version the index reflects
+    """
+
+    def __init__(self, version, categories, keys):
+        self.version = version
+        self._lock = threading.Lock()
+        self._names = {}
+        self._display = {}
+        self._key_category = {}
+        self._category_names = {}
+        self._by_name = []
+        self._by_word = []
+        self._trigrams = defaultdict(set)
+        for category_id, name in categories:
+            self._category_names[category_id] = name
+            self._add(-category_id, name, presorted=False)
+        for key_id, name, category_id in keys:
+            self._key_category[key_id] = category_id
+            self._add(key_id, name, presorted=False)
+        self._by_name.sort()
+        self._by_word.sort()
+
+    def __len__(self):
+        return len(self._names)
+
+    def _add(self, doc, name, presorted=True):
+        normalized = _normalize(name)
+        self._names[doc] = normalized
+        self._display[doc] = name
+        words = set(WORD_PATTERN.findall(normalized))
+        if presorted:
+            insort(self._by_name, (normalized, doc))
+            for word in words:
+                insort(self._by_word, (word, doc))
+        else:
+            self._by_name.append((normalized, doc))
+            self._by_word.extend((word, doc) for word in words)
+        trigrams = self._trigrams
+        for trigram in _trigrams(words):
+            trigrams[trigram].add(doc)
+
+    def _remove(self, doc):
+        normalized = self._names.pop(doc, None)
+        if normalized is None:
+            return
+        del self._display[doc]
+        del self._by_name[bisect_left(self._by_name, (normalized, doc))]
+        words = set(WORD_PATTERN.findall(normalized))
+        for word in words:
+            del self._by_word[bisect_left(self._by_word, (word, doc))]
+        for trigram in _trigrams(words):
+            postings = self._trigrams[trigram]
+            postings.discard(doc)
+            if not postings:
+                del self._trigrams[trigram]
+
+    def apply(self, changes, version):
+        """
+        Apply committed changes and move the index to a new data version.
+
+        Args:
+            changes (list): (kind, id, name, category_id) tuples recorded by the flush hook
+            version (int): Data version after the changes
+        """
+        with self._lock:
+            for kind, object_id, name, category_id in changes:
+                if kind == 'key':
+                    self._remove(object_id)
+                    self._key_category[object_id] = category_id
+                    self._add(object_id, name)
+                elif kind == 'key_deleted':
+                    self._remove(object_id)
+                    self._key_category.pop(object_id, None)
+                elif kind == 'category':
+                    self._remove(-object_id)
+                    self._category_names[object_id] = name
+                    self._add(-object_id, name)
+                elif kind == 'category_deleted':
+                    # Deleting a category leaves its keys uncategorized
+                    self._remove(-object_id)
+                    self._category_names.pop(object_id, None)
+                    for key_id, key_category in self._key_category.items():
+                        if key_category == object_id:
+                            self._key_category[key_id] = None
+            self.version = version
+
+    def _word_prefix_docs(self, term):
+        docs = set()
+        position = bisect_left(self._by_word, (term,))
+        by_word = self._by_word
+        while position < len(by_word) and by_word[position][0].startswith(term):
+            docs.add(by_word[position][1])
+            position += 1
+        return docs
+
+    def _in_name_order(self, candidates, needed):
+        """
+        Return up to `needed` candidates, ordered by name.
+        """
+        if len(candidates) > len(self._by_name) * DENSE_CANDIDATES:
+            picked = []
+            for _, doc in self._by_name:
+                if doc in candidates:
+                    picked.append(doc)
+                    if len(picked) == needed:
+                        break
+            return picked
+        return heapq.nsmallest(needed, candidates, key=lambda doc: (self._names[doc], doc))
+
+    def search(self, query, limit):
+        """
+        Find the best-ranked names matching a query.
+
+        Args:
+            query (str): Search text
+            limit (int): Maximum number of results
+
+        Returns:
+            list: (doc, match rank) tuples, best first
+        """
+        normalized = _normalize(query)
+        terms = _terms(normalized)
+        results = []
+        seen = set()
+        with self._lock:
+            # Names starting with the query, exact match first
+            by_name = self._by_name
+            position = bisect_left(by_name, (normalized,))
+            while (position < len(by_name) and len(results) < limit
+                   and by_name[position][0].startswith(normalized)):
+                name, doc = by_name[position]
+                results.append((doc, MATCH_EXACT if name == normalized else MATCH_PREFIX))
+                seen.add(doc)
+                position += 1
+
+            # Every term starts a word of the name
+            if len(results) < limit:
+                candidates = None
+                for term in sorted(set(terms), key=len, reverse=True):
+                    docs = self._word_prefix_docs(term)
+                    candidates = docs if candidates is None else candidates & docs
+                    if not candidates:
+                        break
+                candidates -= seen
+                for doc in self._in_name_order(candidates, limit - len(results)):
+                    results.append((doc, MATCH_WORD))
+                    seen.add(doc)
+
+            # Every term appears anywhere in the name
+            if len(results) < limit:
+                trigrams = _trigrams(terms)
+                if trigrams:
+                    postings = sorted((self._trigrams.get(trigram, set()) for trigram in trigrams), key=len)
+                    candidates = set(postings[0]).intersection(*postings[1:]) - seen
+                    candidates = {doc for doc in candidates if all(term in self._names[doc] for term in terms)}
+                    docs = self._in_name_order(candidates, limit - len(results))
+                else:
+                    docs = []
+                    for name, doc in by_name:
+                        if doc not in seen and all(term in name for term in terms):
+                            docs.append(doc)
+                            if len(results) + len(docs) == limit:
+                                break
+                results.extend((doc, MATCH_SUBSTRING) for doc in docs)
+            return [self._result(doc, match) for doc, match in results]
+
+    def _result(self, doc, match):
+        if doc < 0:
+            return {'type': 'category', 'id': -doc, 'name': self._display[doc], 'match': MATCH_NAMES[match]}
+        category_id = self._key_category.get(doc)
+        return {
+            'type': 'key',
+            'id': doc,
+            'name': self._display[doc],
+            'category_id': category_id,
+            'category_name': self._category_names.get(category_id, 'Uncategorized'),
+            'match': MATCH_NAMES[match],
+        }
+
+# ================================
+# Functions
+# ================================
+def build_index(user_id):
+    """
+    Load a user's key and category names and cache a fresh index.
+
+    The data version is read before the rows. A change committed in between
+    is then either in the rows already or applied on top later; both are
+    safe because applying a change twice has no further effect.
+
+    Args:
+        user_id (int): Owner's user ID
+
+    Returns:
+        SearchIndex: The new index
+    """
+    from models import APIKey, Category
+    version = get_data_version(user_id)
+    categories = db.session.execute(select(Category.id, Category.name).where(Category.user_id == user_id)).all()
+    keys = db.session.execute(
+        select(APIKey.id, APIKey.key_name, APIKey.category_id).where(APIKey.user_id == user_id)
+    ).all()
+    index = SearchIndex(version, categories, keys)
+    _indexes.set(user_id, index)
+    return index
+
+def _build_in_background(app, user_id):
+    try:
+        with app.app_context():
+            build_index(user_id)
+    except Exception as e:
+        logger.warning(f"Could not build search index for user {user_id}: {str(e)}")
+    finally:
+        with _builder_lock:
+            _building.discard(user_id)
+
+def schedule_build(user_id):
+    """
+    Build a user's index on the background builder thread, unless already queued.
+
+    Args:
+        user_id (int): Owner's user ID
+    """
+    global _builder
+    with _builder_lock:
+        if user_id in _building:
+            return
+        _building.add(user_id)
+        if _builder is None:
+            _builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search-index')
+    _builder.submit(_build_in_background, current_app._get_current_object(), user_id)
+
+def current_index(user_id):
+    """
+    Return the user's cached index if it matches their data version.
+
+    Args:
+        user_id (int): Owner's user ID
+
+    Returns:
+        SearchIndex or None: Current index
+    """
+    index = _indexes.get(user_id)
+    if index is None or index.version != get_data_version(user_id):
+        return None
+    return index
+
+def search_database(user_id, query, limit):
+    """
+    Search key and category names with LIKE queries, ranked like the index.
+
+    Args:
+        user_id (int): Owner's user ID
+        query (str): Search text
+        limit (int): Maximum number of results
+
+    Returns:
+        list: Result dicts, best first
+    """
+    from models import APIKey, Category
+    normalized = _normalize(query)
+    terms = _terms(normalized)
+    escaped = _escape_like(normalized)
+
+    def ranked(column):
+        lowered = func.lower(column)
+        word_prefix = and_(*(or_(lowered.like(f'{_escape_like(term)}%', escape='\\'),
+                                 lowered.like(f'% {_escape_like(term)}%', escape='\\')) for term in terms))
+        rank = case(
+            (lowered == normalized, MATCH_EXACT),
+            (lowered.like(f'{escaped}%', escape='\\'), MATCH_PREFIX),
+            (word_prefix, MATCH_WORD),
+            else_=MATCH_SUBSTRING,
+        )
+        matches = [lowered.like(f'%{_escape_like(term)}%', escape='\\') for term in terms]
+        return rank, lowered, matches
+
+    rank, lowered, matches = ranked(APIKey.key_name)
+    keys = db.session.execute(
+        select(APIKey.id, APIKey.key_name, APIKey.category_id, Category.name.label('category_name'),
+               rank.label('rank'), lowered.label('sort_name'))
+        .outerjoin(Category, APIKey.category_id == Category.id)
+        .where(APIKey.user_id == user_id, *matches)
+        .order_by(rank, lowered, APIKey.id)
+        .limit(limit)
+    ).all()
+    rank, lowered, matches = ranked(Category.name)
+    categories = db.session.execute(
+        select(Category.id, Category.name, rank.label('rank'), lowered.label('sort_name'))
+        .where(Category.user_id == user_id, *matches)
+        .order_by(rank, lowered, Category.id)
+        .limit(limit)
+    ).all()
+
+    results = [((row.rank, row.sort_name, row.id), {
+        'type': 'key', 'id': row.id, 'name': row.key_name, 'category_id': row.category_id,
+        'category_name': row.category_name or 'Uncategorized', 'match': MATCH_NAMES[row.rank],
+    }) for row in keys]
+    results += [((row.rank, row.sort_name, -row.id), {
+        'type': 'category', 'id': row.id, 'name': row.name, 'match': MATCH_NAMES[row.rank],
+    }) for row in categories]
+    results.sort(key=lambda item: item[0])
+    return [result for _, result in results[:limit]]
+
+def search(user_id, query, limit):
+    """
+    Search a user's keys and categories by name.
+
+    Uses the in-memory index when it is current. Otherwise queries the
+    database and schedules a rebuild.
+
+    Args:
+        user_id (int): Owner's user ID
+        query (str): Search text
+        limit (int): Maximum number of results
+
+    Returns:
+        tuple: (list of result dicts, 'index' or 'database')
+    """
+    index = current_index(user_id)
+    if index is not None:
+        return index.search(query, limit), 'index'
+    results = search_database(user_id, query, limit)
+    schedule_build(user_id)
+    return results, 'database'
+
+def forget_index(user_id):
+    """
+    Drop a user's cached index.
+
+    Args:
+        user_id (int): Owner's user ID
+    """
+    _indexes.pop(user_id)
+
+def record_changes(user_id, changes):
+    """
+    Describe changes made with bulk statements, so the commit updates the
+    user's index in place instead of dropping it.
+
+    Only for statements run with `execution_options(search_index_tracked=True)`
+    (TRACKED_OPTION); other bulk statements still drop the index.
+
+    Args:
+        user_id (int): Owner's user ID
+        changes (iterable): (kind, id, name, category_id) tuples, as recorded by the flush hook
+    """
+    db.session.info.setdefault(CHANGES_KEY, {}).setdefault(user_id, []).extend(changes)
+
+# ================================
+# Update hooks
+# ================================
+def _collect_changes(session, flush_context):
+    """
+    After each flush, record the key and category rows it wrote.
+    """
+    from models import APIKey, Category
+    changes = session.info.setdefault(CHANGES_KEY, {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, APIKey):
+            changes.setdefault(obj.user_id, []).append(('key', obj.id, obj.key_name, obj.category_id))
+        elif isinstance(obj, Category):
+            changes.setdefault(obj.user_id, []).append(('category', obj.id, obj.name, None))
+    for obj in session.deleted:
+        if isinstance(obj, APIKey):
+            changes.setdefault(obj.user_id, []).append(('key_deleted', obj.id, None, None))
+        elif isinstance(obj, Category):
+            changes.setdefault(obj.user_id, []).append(('category_deleted', obj.id, None, None))
+
+def _note_bulk_statements(orm_execute_state):
+    """
+    Mark the transaction when keys or categories change through bulk statements.
+    """
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.execution_options.get(TRACKED_OPTION):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if getattr(table, 'name', None) in INDEXED_TABLES:
+        orm_execute_state.session.info[UNTRACKED_KEY] = True
+
+def _apply_after_commit(session):
+    bumps = take_version_bumps(session)
+    changes = session.info.pop(CHANGES_KEY, {})
+    untracked = session.info.pop(UNTRACKED_KEY, False)
+    for user_id, versions in bumps.items():
+        index = _indexes.get(user_id)
+        if index is None:
+            continue
+        if untracked or versions is None or index.version != versions[0]:
+            _indexes.pop(user_id)
+        else:
+            index.apply(changes.get(user_id, ()), versions[1])
+
+def _discard_after_rollback(session, previous_transaction):
+    take_version_bumps(session)
+    session.info.pop(CHANGES_KEY, None)
+    session.info.pop(UNTRACKED_KEY, None)
+
+def init_search_index(app):
+    """
+    Size the index cache and register the session hooks that keep cached
+    indexes up to date.
+
+    Safe to call once per app; the hooks are only registered once.
+
+    Args:
+        app (Flask): Application
+    """
+    _indexes.configure(app.config['SEARCH_INDEX_CACHE_SIZE'], app.config['SEARCH_INDEX_TTL'])
+    if event.contains(Session, 'after_flush', _collect_changes):
+        return
+    event.listen(Session, 'after_flush', _collect_changes)
+    event.listen(Session, 'do_orm_execute', _note_bulk_statements)
+    event.listen(Session, 'after_commit', _apply_after_commit)
+    event.listen(Session, 'after_soft_rollback', _discard_after_rollback)
@@ -0,0 +1,174 @@
+"""
+seeding.py - Synthetic dataset generation
+
+Bulk-inserts synthetic users, categories and API keys for query-plan checks,
+benchmarks and load tests. Rows are loaded in chunks, with COPY on
+PostgreSQL (psycopg2) and executemany elsewhere. The password hash is
+computed once for everyone, and the encrypted value once per user, so
+seeding cost is dominated by the database.
+
+Dependencies:
+- SQLAlchemy
+- models.py
+- encryption_service.py
+- utils.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import csv
+import io
+import logging
+import uuid
+from datetime import datetime
+
+# ================================
+# Third-party imports
+# ================================
+from sqlalchemy import insert, select
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from models import User, APIKey, Category
+from encryption_service import encrypt_for_user
+from utils import generate_data_key, wrap_data_key
+
+logger = logging.getLogger(__name__)
+
+SEED_PASSWORD = 'seed-password'
+CHUNK_SIZE = 5000
+
+# ================================
+# Functions
+# ================================
+def _copy_value(value):
+    """
+    Render one value for COPY ... WITH (FORMAT csv, NULL '\\N').
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bytes):
+        return '\\x' + value.hex()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _copy_chunk(model, chunk):
+    """
+    Load rows into the model's table with PostgreSQL's COPY FROM STDIN.
+
+    Args:
+        model (db.Model): Target model
+        chunk (list): Dicts of column values, all with the same keys
+    """
+    columns = list(chunk[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in chunk:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"""COPY "{model.__table__.name}" ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')""", buffer)
+    finally:
+        cursor.close()
+
+def _insert_chunked(model, rows):
+    """
+    Bulk-load rows, committing every CHUNK_SIZE rows.
+
+    Uses COPY on PostgreSQL with psycopg2 and executemany INSERTs elsewhere.
+
+    Args:
+        model (db.Model): Target model
+        rows (iterable): Dicts of column values
+    """
+    dialect = db.session.get_bind().dialect
+    use_copy = dialect.name == 'postgresql' and dialect.driver == 'psycopg2'
+
+    def flush(chunk):
+        if use_copy:
+            _copy_chunk(model, chunk)
+        else:
+            db.session.execute(insert(model), chunk)
+        db.session.commit()
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+def seed_dataset(users, categories_per_user, keys_per_user, password=SEED_PASSWORD, email_prefix='seed'):
+    """
+    Create a synthetic population of users, categories and keys.
+
+    Every seeded user gets the same password. A fifth of each user's keys are
+    left uncategorized; the rest are spread over the user's categories.
+
+    Args:
+        users (int): Number of users to create
+        categories_per_user (int): Categories per user
+        keys_per_user (int): API keys per user
+        password (str): Password for every seeded user
+        email_prefix (str): Prefix for generated email addresses
+
+    Returns:
+        list: Emails of the created users
+    """
+    run_id = uuid.uuid4().hex[:8]
+    probe = User(email='')
+    probe.set_password(password)
+    password_hash = probe.password_hash
+    now = datetime.utcnow()
+
+    emails = [f'{email_prefix}-{run_id}-{i}@example.com' for i in range(users)]
+    _insert_chunked(User, (
+        {'email': email, 'password_hash': password_hash, 'date_joined': now, 'is_admin': False,
+         'wrapped_data_key': wrap_data_key(generate_data_key())}
+        for email in emails
+    ))
+    user_ids = db.session.execute(
+        select(User.id).where(User.email.like(f'{email_prefix}-{run_id}-%')).order_by(User.id)
+    ).scalars().all()
+
+    _insert_chunked(Category, (
+        {'name': f'Category {c}', 'user_id': user_id}
+        for user_id in user_ids
+        for c in range(categories_per_user)
+    ))
+    category_ids = {}
+    for user_id, category_id in db.session.execute(
+            select(Category.user_id, Category.id).where(Category.user_id.in_(user_ids)).order_by(Category.id)):
+        category_ids.setdefault(user_id, []).append(category_id)
+
+    def key_rows():
+        for user_id in user_ids:
+            own_categories = category_ids.get(user_id, [])
+            ciphertext = encrypt_for_user(user_id, 'sk-seed-' + run_id)
+            for k in range(keys_per_user):
+                category_id = None
+                if own_categories and k % 5:
+                    category_id = own_categories[k % len(own_categories)]
+                yield {
+                    'user_id': user_id,
+                    'key_name': f'Service {k:06d}',
+                    'ciphertext': ciphertext,
+                    'date_added': now,
+                    'category_id': category_id,
+                }
+
+    _insert_chunked(APIKey, key_rows())
+    logger.info(f"Seeded {users} users with {categories_per_user} categories and {keys_per_user} keys each")
+    return emails
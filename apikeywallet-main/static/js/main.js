@@ -59,6 +59,64 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // Delta sync: after a change, fetch only what changed since the page's
+    // revision and patch the affected cards instead of reloading the page.
+    // Anything the page cannot patch in place falls back to a reload.
+    const walletContainer = document.querySelector('.wallet-container');
+
+    function categoryGroup(categoryName) {
+        const groupId = categoryName === 'Uncategorized' ? 'uncategorized' : categoryName;
+        return Array.from(document.querySelectorAll('.category-group'))
+            .find(group => group.getAttribute('data-category-id') === groupId);
+    }
+
+    function applyKeyChange(key) {
+        const card = document.getElementById(`key-${key.id}`);
+        if (!card) {
+            return false;
+        }
+        card.querySelector('h4').textContent = key.key_name;
+        const categoryId = key.category_id || 'uncategorized';
+        if (card.getAttribute('data-category-id') !== String(categoryId)) {
+            const group = categoryGroup(key.category_name);
+            if (!group) {
+                return false;
+            }
+            group.querySelector('.carousel-inner').appendChild(card);
+            card.setAttribute('data-category-id', categoryId);
+        }
+        card.querySelector('.category-select').value = key.category_id || 0;
+        return true;
+    }
+
+    function syncChanges() {
+        const since = walletContainer ? walletContainer.getAttribute('data-revision') : null;
+        if (!since) {
+            location.reload();
+            return;
+        }
+        fetch(`/changes?since=${encodeURIComponent(since)}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.error || data.full || data.categories.length || data.deleted_categories.length) {
+                    location.reload();
+                    return;
+                }
+                data.deleted_keys.forEach(keyId => {
+                    const card = document.getElementById(`key-${keyId}`);
+                    if (card) {
+                        card.remove();
+                    }
+                });
+                if (!data.keys.every(applyKeyChange)) {
+                    location.reload();
+                    return;
+                }
+                walletContainer.setAttribute('data-revision', data.revision);
+            })
+            .catch(() => location.reload());
+    }
+
     // Edit button
     const editButtons = document.querySelectorAll('.edit-btn');
     const editModal = document.getElementById('editModal');
@@ -92,7 +150,8 @@ document.addEventListener('DOMContentLoaded', function() {
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
-                    location.reload();
+                    editModal.style.display = 'none';
+                    syncChanges();
                 }
             })
             .catch(error => console.error('Error:', error));
@@ -133,7 +192,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 .then(data => {
                     if (data.success) {
                         deleteModal.style.display = 'none';
-                        location.reload();
+                        currentKeyId = null;
+                        syncChanges();
                     }
                 })
                 .catch(error => console.error('Error:', error));
@@ -165,13 +225,186 @@ document.addEventListener('DOMContentLoaded', function() {
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
-                    location.reload();
+                    syncChanges();
                 }
             })
             .catch(error => console.error('Error:', error));
         });
     });
 
+    // Multi-select and bulk actions
+    const bulkToolbar = document.getElementById('bulk-toolbar');
+    const bulkCount = document.getElementById('bulk-count');
+
+    function selectedKeyIds() {
+        return Array.from(document.querySelectorAll('.key-select:checked')).map(box => parseInt(box.value));
+    }
+
+    function updateBulkToolbar() {
+        const count = selectedKeyIds().length;
+        bulkCount.textContent = `${count} selected`;
+        bulkToolbar.style.display = count ? 'flex' : 'none';
+    }
+
+    function clearSelection() {
+        document.querySelectorAll('.key-select:checked').forEach(box => {
+            box.checked = false;
+            box.closest('.api-key').classList.remove('selected');
+        });
+        updateBulkToolbar();
+    }
+
+    function bulkAction(body) {
+        fetch('/bulk_keys', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.results) {
+                alert(data.error || 'An error occurred while updating the API keys.');
+                return;
+            }
+            const results = Object.values(data.results);
+            const failed = results.filter(result => !result.success).length;
+            if (failed) {
+                alert(`${failed} of ${results.length} keys could not be changed.`);
+            }
+            clearSelection();
+            if (data.success) {
+                syncChanges();
+            }
+        })
+        .catch(error => console.error('Error:', error));
+    }
+
+    if (bulkToolbar) {
+        document.querySelectorAll('.key-select').forEach(box => {
+            box.addEventListener('change', function() {
+                this.closest('.api-key').classList.toggle('selected', this.checked);
+                updateBulkToolbar();
+            });
+        });
+
+        document.getElementById('bulk-move').addEventListener('click', function() {
+            const categoryId = parseInt(document.getElementById('bulk-category').value);
+            bulkAction({ action: 'move', key_ids: selectedKeyIds(), category_id: categoryId });
+        });
+
+        document.getElementById('bulk-delete').addEventListener('click', function() {
+            const keyIds = selectedKeyIds();
+            if (confirm(`Are you sure you want to delete ${keyIds.length} API keys?`)) {
+                bulkAction({ action: 'delete', key_ids: keyIds });
+            }
+        });
+
+        // Rename by replacing text in every selected key name
+        document.getElementById('bulk-rename').addEventListener('click', function() {
+            const find = prompt('Text to replace in the selected key names:');
+            if (!find) {
+                return;
+            }
+            const replacement = prompt(`Replace "${find}" with:`, '');
+            if (replacement === null) {
+                return;
+            }
+            const names = {};
+            selectedKeyIds().forEach(keyId => {
+                const name = document.querySelector(`#key-${keyId} h4`).textContent;
+                const newName = name.split(find).join(replacement);
+                if (newName !== name) {
+                    names[keyId] = newName;
+                }
+            });
+            if (!Object.keys(names).length) {
+                alert('None of the selected key names contain that text.');
+                return;
+            }
+            bulkAction({ action: 'rename', names: names });
+        });
+
+        document.getElementById('bulk-clear').addEventListener('click', clearSelection);
+    }
+
+    // Type-ahead search
+    const searchInput = document.getElementById('key-search-input');
+    const searchResults = document.getElementById('key-search-results');
+    let searchTimer = null;
+    let searchController = null;
+
+    function hideSearchResults() {
+        searchResults.style.display = 'none';
+        searchResults.innerHTML = '';
+    }
+
+    function renderSearchResults(results) {
+        searchResults.innerHTML = '';
+        if (results.length === 0) {
+            const empty = document.createElement('li');
+            empty.className = 'search-empty';
+            empty.textContent = 'No matching keys or categories';
+            searchResults.appendChild(empty);
+        }
+        results.forEach(result => {
+            const item = document.createElement('li');
+            const icon = document.createElement('i');
+            icon.className = result.type === 'category' ? 'fas fa-folder' : 'fas fa-key';
+            const name = document.createElement('span');
+            name.textContent = result.name;
+            item.append(icon, ' ', name);
+            if (result.type === 'key') {
+                const category = document.createElement('small');
+                category.textContent = result.category_name;
+                item.appendChild(category);
+            }
+            item.addEventListener('click', function() {
+                if (result.type === 'category') {
+                    window.location.href = `/wallet/${result.id}`;
+                } else if (document.getElementById(`key-${result.id}`)) {
+                    window.location.hash = `key-${result.id}`;
+                    hideSearchResults();
+                } else {
+                    window.location.href = `/wallet/${result.category_id || 0}#key-${result.id}`;
+                }
+            });
+            searchResults.appendChild(item);
+        });
+        searchResults.style.display = 'block';
+    }
+
+    if (searchInput) {
+        searchInput.addEventListener('input', function() {
+            clearTimeout(searchTimer);
+            const query = this.value.trim();
+            if (!query) {
+                hideSearchResults();
+                return;
+            }
+            searchTimer = setTimeout(() => {
+                if (searchController) {
+                    searchController.abort();
+                }
+                searchController = new AbortController();
+                fetch(`/search?q=${encodeURIComponent(query)}`, { signal: searchController.signal })
+                .then(response => response.json())
+                .then(data => renderSearchResults(data.results || []))
+                .catch(error => {
+                    if (error.name !== 'AbortError') {
+                        console.error('Error:', error);
+                    }
+                });
+            }, 150);
+        });
+
+        searchInput.addEventListener('keydown', function(event) {
+            if (event.key === 'Escape') {
+                this.value = '';
+                hideSearchResults();
+            }
+        });
+    }
+
     // Modal background click to close
     window.addEventListener('click', function(event) {
         if (event.target === editModal) {
@@ -181,5 +414,8 @@ document.addEventListener('DOMContentLoaded', function() {
             deleteModal.style.display = 'none';
             currentKeyId = null;
         }
+        if (searchResults && !event.target.closest('.key-search')) {
+            hideSearchResults();
+        }
     });
 });
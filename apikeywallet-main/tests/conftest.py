@@ -0,0 +1,48 @@
+"""
+conftest.py - Shared pytest fixtures
+
+Boots the app once per test session against a throwaway SQLite database,
+using the same setup as the benchmark scripts (benchmarks/common.py).
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import os
+import sys
+
+# ================================
+# Third-party imports
+# ================================
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from common import load_app, login_client  # noqa: E402
+
+# ================================
+# Fixtures
+# ================================
+@pytest.fixture(scope='session')
+def app():
+    """
+    Application with its tables created in a temporary SQLite database.
+    """
+    return load_app()
+
+@pytest.fixture
+def seeded_client(app):
+    """
+    Factory returning a client logged in as a freshly seeded user.
+
+    Usage: seeded_client(keys, categories=5)
+    """
+    from seeding import seed_dataset, SEED_PASSWORD
+
+    def make(keys, categories=5):
+        with app.app_context():
+            email = seed_dataset(1, categories, keys, email_prefix=f'test{keys}')[0]
+        return login_client(app, email, SEED_PASSWORD)
+    return make
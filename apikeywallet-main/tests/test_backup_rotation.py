@@ -0,0 +1,65 @@
+"""
+test_backup_rotation.py - Backups survive a master key rotation
+
+An archive re-wrapped with `flask rewrap-backup` must restore to working
+keys once the previous master key is retired: the archive key, the users'
+wrapped data keys and legacy Fernet values all move to the new key.
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Third-party imports
+# ================================
+from cryptography.fernet import Fernet
+
+# ================================
+# Project imports
+# ================================
+from common import load_app
+
+def test_rewrapped_backup_restores_after_old_key_is_retired(tmp_path, monkeypatch):
+    import utils
+    from app import db
+    from backup import iter_backup, rewrap_archive, restore_archive, verify_archive
+    from encryption_service import encrypt_for_user, forget_data_keys, reveal
+    from models import User, APIKey
+
+    def use_master_keys(current, previous=''):
+        monkeypatch.setenv('ENCRYPTION_KEY', current)
+        monkeypatch.setenv('ENCRYPTION_KEY_PREVIOUS', previous)
+        monkeypatch.setattr(utils, '_fernet', None)
+        # Data keys are cached by user ID, which the databases below share
+        forget_data_keys()
+
+    old_key, new_key = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    path = str(tmp_path / 'backup.tar')
+    use_master_keys(old_key)
+    source = load_app()
+    with source.app_context():
+        user = User(email='rotation@example.com', password_hash='unused')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add_all([
+            APIKey(user_id=user.id, key_name='sealed', ciphertext=encrypt_for_user(user.id, 'sealed-secret')),
+            APIKey(user_id=user.id, key_name='legacy', encrypted_key=utils.encrypt_key('legacy-secret')),
+        ])
+        db.session.commit()
+        with open(path, 'wb') as f:
+            for data in iter_backup(chunk_rows=1):
+                f.write(data)
+
+    use_master_keys(new_key, old_key)
+    assert rewrap_archive(path) == 2  # the user's data key and the legacy value
+
+    use_master_keys(new_key)
+    target = load_app()
+    try:
+        with target.app_context():
+            assert verify_archive(path, workers=1)['errors'] == []
+            assert restore_archive(path, workers=1)['errors'] == []
+            forget_data_keys()
+            revealed = {key.key_name: reveal(key) for key in APIKey.query.all()}
+        assert revealed == {'sealed': 'sealed-secret', 'legacy': 'legacy-secret'}
+    finally:
+        forget_data_keys()
@@ -0,0 +1,81 @@
+"""
+test_bulk_keys.py - Bulk move, rename and delete of API keys
+
+Each action reports a result per requested key ID and changes only the
+keys the user owns.
+
+@author KeyGuardian Team
+"""
+
+MISSING_ID = 10 ** 9
+
+def snapshot(client):
+    """
+    Return the user's keys by ID and category IDs from a full /changes sync.
+    """
+    body = client.get('/changes').get_json()
+    return {key['id']: key for key in body['keys']}, [category['id'] for category in body['categories']]
+
+def bulk(client, payload):
+    response = client.post('/bulk_keys', json=payload)
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_bulk_move(seeded_client):
+    client = seeded_client(4)
+    keys, categories = snapshot(client)
+    key_ids = sorted(keys)[:2]
+
+    body = bulk(client, {'action': 'move', 'key_ids': key_ids + [MISSING_ID], 'category_id': categories[-1]})
+    assert body['success'] is True
+    assert body['results'] == {
+        str(key_ids[0]): {'success': True},
+        str(key_ids[1]): {'success': True},
+        str(MISSING_ID): {'success': False, 'error': 'API Key not found or unauthorized.'},
+    }
+    moved, _ = snapshot(client)
+    assert [moved[key_id]['category_id'] for key_id in key_ids] == [categories[-1]] * 2
+
+    body = bulk(client, {'action': 'move', 'key_ids': key_ids, 'category_id': 0})
+    assert all(result['success'] for result in body['results'].values())
+    moved, _ = snapshot(client)
+    assert [moved[key_id]['category_id'] for key_id in key_ids] == [None, None]
+
+def test_bulk_rename(seeded_client):
+    client = seeded_client(4)
+    keys, _ = snapshot(client)
+    first, second, third = sorted(keys)[:3]
+
+    body = bulk(client, {'action': 'rename', 'names': {str(first): '  Renamed  ', str(second): ' ', str(third): 'Other'}})
+    assert body['success'] is True
+    assert body['results'] == {
+        str(first): {'success': True},
+        str(second): {'success': False, 'error': 'Key name must be 1 to 120 characters.'},
+        str(third): {'success': True},
+    }
+    renamed, _ = snapshot(client)
+    assert renamed[first]['key_name'] == 'Renamed'
+    assert renamed[second]['key_name'] == keys[second]['key_name']
+    assert renamed[third]['key_name'] == 'Other'
+
+def test_bulk_delete(seeded_client):
+    client = seeded_client(4)
+    keys, _ = snapshot(client)
+    key_ids = sorted(keys)[:2]
+
+    body = bulk(client, {'action': 'delete', 'key_ids': key_ids})
+    assert body['success'] is True
+    assert body['results'] == {str(key_id): {'success': True} for key_id in key_ids}
+    remaining, _ = snapshot(client)
+    assert set(remaining) == set(keys) - set(key_ids)
+
+def test_bulk_keys_leaves_other_users_keys_alone(seeded_client):
+    owner = seeded_client(2)
+    other = seeded_client(2)
+    other_ids = sorted(snapshot(other)[0])
+
+    body = bulk(owner, {'action': 'delete', 'key_ids': other_ids})
+    assert body['success'] is False
+    assert all(result == {'success': False, 'error': 'API Key not found or unauthorized.'}
+               for result in body['results'].values())
+    assert sorted(snapshot(other)[0]) == other_ids
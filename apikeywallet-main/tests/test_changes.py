@@ -0,0 +1,19 @@
+"""
+test_changes.py - The /changes delta sync endpoint
+
+@author KeyGuardian Team
+"""
+
+def test_changes_rejects_malformed_since(seeded_client):
+    client = seeded_client(3)
+    for since in ('²', 'x', '-1', '1.5', ''):
+        response = client.get('/changes', query_string={'since': since})
+        assert response.status_code == 400, since
+
+def test_changes_accepts_revision(seeded_client):
+    client = seeded_client(3)
+    snapshot = client.get('/changes')
+    assert snapshot.status_code == 200
+    revision = snapshot.get_json()['revision']
+    response = client.get('/changes', query_string={'since': revision})
+    assert response.status_code == 200
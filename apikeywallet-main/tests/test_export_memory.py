@@ -0,0 +1,25 @@
+"""
+test_export_memory.py - Memory regression test for the streaming key export
+
+/export_keys must stream: the peak heap allocation while consuming it may
+not grow with the number of keys. Uses the same tracemalloc measurement as
+benchmarks/bench_export_memory.py, at sizes small enough for every run.
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Project imports
+# ================================
+from bench_export_memory import measure_export
+
+MAX_GROWTH = 3.0
+BATCH_SIZE = 100
+
+def test_export_peak_memory_does_not_grow_with_keys(app, seeded_client, monkeypatch):
+    # Both wallets span several batches, so only the per-batch buffer is shared
+    monkeypatch.setitem(app.config, 'EXPORT_BATCH_SIZE', BATCH_SIZE)
+    small_peak, small_bytes = measure_export(seeded_client(5 * BATCH_SIZE))
+    large_peak, large_bytes = measure_export(seeded_client(50 * BATCH_SIZE))
+    assert large_bytes > 10 * small_bytes
+    assert large_peak / small_peak <= MAX_GROWTH, f'peak {small_peak} -> {large_peak} bytes'
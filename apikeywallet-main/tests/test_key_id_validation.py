@@ -0,0 +1,47 @@
+"""
+test_key_id_validation.py - Validation of key IDs in JSON requests
+
+JSON booleans must not be accepted as key or category IDs: Python treats
+them as the integers 1 and 0.
+
+@author KeyGuardian Team
+"""
+
+def test_get_keys_rejects_boolean_ids(seeded_client):
+    client = seeded_client(3)
+    for key_ids in ([True], [False], [1, True]):
+        response = client.post('/get_keys', json={'key_ids': key_ids})
+        assert response.status_code == 400, key_ids
+
+def test_get_keys_rejects_non_object_body(seeded_client):
+    client = seeded_client(3)
+    for body in ([1], 1, 'key_ids'):
+        assert client.post('/get_keys', json=body).status_code == 400, body
+
+def test_bulk_keys_rejects_non_object_body(seeded_client):
+    client = seeded_client(3)
+    for body in ([1], 1, 'delete'):
+        response = client.post('/bulk_keys', json=body)
+        assert response.status_code == 400, body
+        assert response.get_json()['success'] is False
+
+def test_bulk_keys_rejects_boolean_ids(seeded_client):
+    client = seeded_client(3)
+    for key_ids in ([True], [False], [1, True]):
+        response = client.post('/bulk_keys', json={'action': 'delete', 'key_ids': key_ids})
+        assert response.status_code == 400, key_ids
+
+def test_bulk_move_rejects_non_integer_category(seeded_client):
+    client = seeded_client(3)
+    for category_id in (False, True, '', '3', 1.5):
+        response = client.post('/bulk_keys', json={'action': 'move', 'key_ids': [1], 'category_id': category_id})
+        assert response.status_code == 400, category_id
+
+def test_api_create_key_rejects_non_integer_category(seeded_client):
+    client = seeded_client(3)
+    for category_id in (True, False, '1', 1.5):
+        response = client.post('/api/v1/keys', json={'key_name': 'k', 'value': 'v', 'category_id': category_id})
+        assert response.status_code == 400, category_id
+    response = client.post('/api/v1/keys', json={'key_name': 'k', 'value': 'v', 'category_id': 0})
+    assert response.status_code == 201
+    assert response.get_json()['category_id'] is None
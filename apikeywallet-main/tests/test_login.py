@@ -0,0 +1,42 @@
+"""
+test_login.py - Login with a password hash that needs upgrading
+
+Rehashing a verified password is best effort: if the hasher is saturated
+or the commit fails, the user is still logged in.
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Third-party imports
+# ================================
+import pytest
+from sqlalchemy.exc import OperationalError
+
+@pytest.mark.parametrize('failure', ['hasher_busy', 'database_error'])
+def test_login_succeeds_when_rehash_fails(app, monkeypatch, failure):
+    import auth_routes
+    from password_hashing import HasherBusy
+    from app import db
+    from models import User
+    from seeding import seed_dataset, SEED_PASSWORD
+
+    with app.app_context():
+        email = seed_dataset(1, 0, 0, email_prefix='rehash')[0]
+        original_hash = db.session.execute(db.select(User.password_hash).where(User.email == email)).scalar()
+    monkeypatch.setattr(auth_routes, 'needs_rehash', lambda password_hash: True)
+    if failure == 'hasher_busy':
+        def hash_password(password):
+            raise HasherBusy()
+        monkeypatch.setattr(auth_routes, 'hash_password', hash_password)
+    else:
+        def commit():
+            raise OperationalError('UPDATE user', {}, Exception('database is locked'))
+        monkeypatch.setattr(db.session, 'commit', commit)
+
+    client = app.test_client()
+    response = client.post('/login', data={'email': email, 'password': SEED_PASSWORD})
+    assert response.status_code == 302
+    assert client.get('/wallet').status_code == 200
+    with app.app_context():
+        assert db.session.execute(db.select(User.password_hash).where(User.email == email)).scalar() == original_hash
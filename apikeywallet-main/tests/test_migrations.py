@@ -0,0 +1,27 @@
+"""
+test_migrations.py - Migration revision identifiers
+
+Alembic stores the current revision in alembic_version.version_num, a
+VARCHAR(32); a longer ID cannot be stamped on PostgreSQL.
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import os
+
+# ================================
+# Third-party imports
+# ================================
+from alembic.script import ScriptDirectory
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+VERSION_NUM_LENGTH = 32
+
+def test_revision_ids_fit_alembic_version():
+    scripts = ScriptDirectory(MIGRATIONS_DIR)
+    too_long = [script.revision for script in scripts.walk_revisions()
+                if len(script.revision) > VERSION_NUM_LENGTH]
+    assert too_long == []
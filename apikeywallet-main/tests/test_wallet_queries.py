@@ -0,0 +1,28 @@
+"""
+test_wallet_queries.py - Query-count regression test for the wallet page
+
+The wallet page must issue a fixed number of SQL statements, however many
+keys the user has (no lazy category load per key).
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Project imports
+# ================================
+from common import count_queries
+
+def _wallet_statements(app, client):
+    client.get('/wallet')  # warm the user cache so both sizes start equal
+    from app import db
+    with app.app_context():
+        engine = db.engine
+    with count_queries(engine) as statements:
+        response = client.get('/wallet')
+    assert response.status_code == 200
+    return statements
+
+def test_wallet_query_count_does_not_grow_with_keys(app, seeded_client):
+    small = _wallet_statements(app, seeded_client(20))
+    large = _wallet_statements(app, seeded_client(200))
+    assert len(large) == len(small), '\n'.join(large)
@@ -0,0 +1,313 @@
+"""
+tokens.py - Personal access tokens for machine clients
+
+Tokens look like `kg_<prefix>_<secret>`. The prefix is stored in clear and
+identifies the token; only a salted SHA-256 digest of the secret is kept.
+A request sends the token as `Authorization: Bearer <token>` and is
+authenticated by Flask-Login's request loader.
+
+Verified token records are kept in an in-process LRU/TTL cache keyed by
+prefix, together with a snapshot of the owning user. A cached request
+costs one SHA-256 and no database queries. A revocation clears the entry
+in the revoking process at once. Other processes stop accepting the token
+within TOKEN_CACHE_TTL seconds.
+
+Token-authenticated requests are read-only: they may use the GET endpoints
+of the JSON API and the decrypt endpoint, restricted to the token's scopes
+and categories.
+
+Dependencies:
+- click
+- Flask
+- Flask-Login
+- SQLAlchemy
+- cache.py
+- models.py
+- user_cache.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import hashlib
+import hmac
+import logging
+import secrets
+from datetime import datetime, timedelta
+
+# ================================
+# Third-party imports
+# ================================
+import click
+from flask import current_app, jsonify, request
+from flask.cli import with_appcontext
+from flask_login import current_user
+from sqlalchemy import func, select
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from cache import TTLCache
+from models import User, AccessToken
+from user_cache import UserSnapshot
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PREFIX = 'kg'
+SCOPES = ('read:keys', 'decrypt:keys')
+
+# Endpoints a token may call, and the scope each one needs
+TOKEN_ENDPOINTS = {
+    'api.list_keys': 'read:keys',
+    'api.get_key': 'read:keys',
+    'api.list_categories': 'read:keys',
+    'api.get_category': 'read:keys',
+    'api.changes': 'read:keys',
+    'api.decrypt_key': 'decrypt:keys',
+}
+
+# ================================
+# Verification cache
+# ================================
+# Sized from TOKEN_CACHE_SIZE / TOKEN_CACHE_TTL by init_tokens
+_tokens = TTLCache(10000, 30)
+
+# ================================
+# Classes
+# ================================
+class TokenUser(UserSnapshot):
+    """
+    Snapshot of a user authenticated by an access token.
+
+    Exposes the user attributes routes rely on, plus the token's scopes and
+    category restriction, without holding an ORM instance across requests.
+
+    Attributes:
+        id (int): User ID
+        email (str): User email
+        is_admin (bool): Admin role flag (never granted to tokens)
+        token_id (int): ID of the authenticating token
+        scopes (frozenset): Granted scopes
+        category_ids (frozenset or None): Visible category IDs (0 = uncategorized), or None for all
+    """
+
+    def __init__(self, user_id, email, token_id, scopes, category_ids):
+        super().__init__(user_id, email, False)
+        self.token_id = token_id
+        self.scopes = scopes
+        self.category_ids = category_ids
+
+# ================================
+# Functions
+# ================================
+def _digest(salt, secret):
+    return hashlib.sha256(bytes.fromhex(salt) + secret.encode()).hexdigest()
+
+def _parse_category_ids(value):
+    if value is None:
+        return None
+    return frozenset(int(part) for part in value.split(',') if part)
+
+def create_token(user_id, name, scopes=SCOPES, category_ids=None, expires_in_days=None):
+    """
+    Create a token and return its plaintext, which is never stored.
+
+    The new AccessToken is added to the session; the caller commits.
+
+    Args:
+        user_id (int): Owner's user ID
+        name (str): Label for the token
+        scopes (iterable): Scopes from SCOPES
+        category_ids (iterable, optional): Visible category IDs (0 = uncategorized); None for all
+        expires_in_days (int, optional): Lifetime in days; None for no expiry
+
+    Returns:
+        tuple: (AccessToken, plaintext token)
+
+    Raises:
+        ValueError: If a scope is unknown
+    """
+    unknown = set(scopes) - set(SCOPES)
+    if unknown:
+        raise ValueError(f"Unknown scopes: {', '.join(sorted(unknown))}")
+    prefix = secrets.token_hex(6)
+    secret = secrets.token_urlsafe(32)
+    salt = secrets.token_hex(16)
+    token = AccessToken(
+        user_id=user_id,
+        name=name,
+        prefix=prefix,
+        salt=salt,
+        digest=_digest(salt, secret),
+        scopes=' '.join(scope for scope in SCOPES if scope in set(scopes)),
+        category_ids=None if category_ids is None else ','.join(str(int(c)) for c in sorted(set(category_ids))),
+        expires_at=datetime.utcnow() + timedelta(days=expires_in_days) if expires_in_days else None,
+    )
+    db.session.add(token)
+    return token, f'{TOKEN_PREFIX}_{prefix}_{secret}'
+
+def revoke_token(token):
+    """
+    Mark a token revoked and drop it from this process's cache.
+
+    The caller commits. Other processes stop accepting the token once their
+    cache entry expires (TOKEN_CACHE_TTL).
+
+    Args:
+        token (AccessToken): Token to revoke
+    """
+    token.revoked_at = datetime.utcnow()
+    _tokens.pop(token.prefix)
+
+def _load_record(prefix):
+    """
+    Fetch the verification record for an active token prefix.
+
+    Returns:
+        tuple or None: (token_id, salt, digest, scopes, category_ids, expires_at, user_id, email)
+    """
+    row = db.session.execute(
+        select(AccessToken.id, AccessToken.salt, AccessToken.digest, AccessToken.scopes,
+               AccessToken.category_ids, AccessToken.expires_at, User.id, User.email)
+        .join(User, User.id == AccessToken.user_id)
+        .where(AccessToken.prefix == prefix, AccessToken.revoked_at.is_(None))
+    ).first()
+    if row is None:
+        return None
+    return (row[0], row[1], row[2], frozenset(row[3].split()), _parse_category_ids(row[4]), row[5], row[6], row[7])
+
+def authenticate_token(token):
+    """
+    Verify a plaintext token and return a TokenUser for it.
+
+    Args:
+        token (str): Token from the Authorization header
+
+    Returns:
+        TokenUser or None: Authenticated principal, or None if invalid, expired or revoked
+    """
+    parts = token.split('_', 2)
+    if len(parts) != 3 or parts[0] != TOKEN_PREFIX:
+        return None
+    prefix, secret = parts[1], parts[2]
+
+    record = _tokens.get(prefix)
+    if record is None:
+        record = _load_record(prefix)
+        if record is None:
+            return None
+        _tokens.set(prefix, record)
+
+    token_id, salt, digest, scopes, category_ids, expires_at, user_id, email = record
+    if not hmac.compare_digest(_digest(salt, secret), digest):
+        return None
+    if expires_at is not None and expires_at <= datetime.utcnow():
+        return None
+    return TokenUser(user_id, email, token_id, scopes, category_ids)
+
+def load_user_from_request(req):
+    """
+    Flask-Login request loader: authenticate `Authorization: Bearer` tokens.
+
+    Args:
+        req (Request): Incoming request
+
+    Returns:
+        TokenUser or None
+    """
+    header = req.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    return authenticate_token(token.strip())
+
+def is_token_user(user=None):
+    """
+    Return True if the user (default: current_user) authenticated with a token.
+    """
+    return isinstance(current_user._get_current_object() if user is None else user, TokenUser)
+
+def allowed_category_ids():
+    """
+    Return the category IDs visible to the current principal.
+
+    Returns:
+        frozenset or None: Visible category IDs (0 = uncategorized), or None for all
+    """
+    user = current_user._get_current_object()
+    return user.category_ids if isinstance(user, TokenUser) else None
+
+def category_allowed(category_id):
+    """
+    Return True if the current principal may see keys in `category_id` (None = uncategorized).
+    """
+    allowed = allowed_category_ids()
+    return allowed is None or (category_id or 0) in allowed
+
+def enforce_token_scope():
+    """
+    Before-request hook limiting token-authenticated requests.
+
+    Sessions are unaffected. A token may only call the endpoints in
+    TOKEN_ENDPOINTS, and only if it holds the matching scope.
+
+    Returns:
+        Response or None: 403 JSON response if the request is not permitted
+    """
+    if 'Authorization' not in request.headers or not is_token_user():
+        return None
+    scope = TOKEN_ENDPOINTS.get(request.endpoint)
+    if scope is None or (request.method not in ('GET', 'HEAD') and request.endpoint != 'api.decrypt_key'):
+        return jsonify({'error': 'Access tokens are read-only and limited to the JSON API.'}), 403
+    if scope not in current_user.scopes:
+        return jsonify({'error': f'This token lacks the {scope} scope.'}), 403
+    return None
+
+def init_tokens(app, login_manager):
+    """
+    Enable bearer-token authentication on the app.
+
+    Args:
+        app (Flask): Application
+        login_manager (LoginManager): The app's login manager
+    """
+    _tokens.configure(app.config['TOKEN_CACHE_SIZE'], app.config['TOKEN_CACHE_TTL'])
+    login_manager.request_loader(load_user_from_request)
+    app.before_request(enforce_token_scope)
+
+# ================================
+# CLI commands
+# ================================
+@click.command('create-token')
+@click.argument('email')
+@click.option('--name', required=True, help='Label for the token.')
+@click.option('--scope', 'scopes', multiple=True, type=click.Choice(SCOPES), help='Scope to grant (repeatable; default: all).')
+@click.option('--category', 'category_ids', multiple=True, type=int,
+              help='Category ID the token may see (repeatable; 0 = uncategorized; default: all).')
+@click.option('--expires-days', type=int, default=None, help='Lifetime in days (default: no expiry).')
+@with_appcontext
+def create_token_command(email, name, scopes, category_ids, expires_days):
+    """Create a personal access token for the user EMAIL and print it once."""
+    user_id = db.session.execute(select(User.id).where(func.lower(User.email) == email.lower())).scalar()
+    if user_id is None:
+        raise click.ClickException(f'No user with email {email}.')
+    token, plaintext = create_token(user_id, name, scopes or SCOPES, category_ids or None, expires_days)
+    db.session.commit()
+    click.echo(f'Token {token.id} ({token.scopes}) created. Store it now; it cannot be shown again:')
+    click.echo(plaintext)
+
+@click.command('revoke-token')
+@click.argument('token_id', type=int)
+@with_appcontext
+def revoke_token_command(token_id):
+    """Revoke the access token with ID TOKEN_ID."""
+    token = db.session.get(AccessToken, token_id)
+    if token is None:
+        raise click.ClickException(f'No token with ID {token_id}.')
+    revoke_token(token)
+    db.session.commit()
+    click.echo(f"Token {token_id} revoked; running servers stop accepting it within {current_app.config['TOKEN_CACHE_TTL']:.0f}s.")
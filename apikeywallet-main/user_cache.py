@@ -0,0 +1,229 @@
+"""
+user_cache.py - Cached user loading for Flask-Login
+
+Flask-Login's user loader used to query the user table on every
+authenticated request. Instead, it now returns a lightweight UserSnapshot
+(id, email, is_admin) served from an in-process LRU/TTL cache. When
+USER_CACHE_REDIS_URL is set, snapshots are also shared between processes
+through Redis, which requires the optional `redis` package.
+
+Snapshots are invalidated after any commit that changes a user's email or
+admin flag through the ORM, or deletes the user. Other processes drop
+their local copy within USER_CACHE_TTL seconds. Code that changes these
+columns with bulk UPDATE statements must call invalidate_user itself.
+
+Dependencies:
+- Flask-Login
+- SQLAlchemy
+- cache.py
+- models.py
+- app.py
+- redis (optional)
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Standard library imports
+# ================================
+import json
+import logging
+
+# ================================
+# Third-party imports
+# ================================
+from flask_login import UserMixin
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# Cache setup
+# ================================
+SNAPSHOT_FIELDS = ('email', 'is_admin')
+PENDING_KEY = 'user_cache_invalidations'
+
+# Sized from USER_CACHE_SIZE / USER_CACHE_TTL, and the shared backend set up
+# from USER_CACHE_REDIS_URL / USER_CACHE_SHARED_TTL, by init_user_cache
+_users = TTLCache(10000, 60)
+_shared_settings = {'url': None, 'ttl': 3600}
+_shared = None
+
+# ================================
+# Classes
+# ================================
+class UserSnapshot(UserMixin):
+    """
+    Detached, read-only view of a user for `current_user`.
+
+    Attributes:
+        id (int): User ID
+        email (str): User email
+        is_admin (bool): Admin role flag
+    """
+
+    def __init__(self, user_id, email, is_admin):
+        self.id = user_id
+        self.email = email
+        self.is_admin = is_admin
+
+# ================================
+# Shared backend
+# ================================
+def _shared_backend():
+    """
+    Return the Redis client for the shared cache, or None if not configured.
+
+    Raises:
+        RuntimeError: If USER_CACHE_REDIS_URL is set but redis is not installed
+    """
+    global _shared
+    if _shared_settings['url'] is None:
+        return None
+    if _shared is None:
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('USER_CACHE_REDIS_URL is set but the redis package is not installed')
+        _shared = redis.Redis.from_url(_shared_settings['url'], socket_timeout=0.5)
+    return _shared
+
+def _shared_key(user_id):
+    return f'keyguardian:user:{user_id}'
+
+# ================================
+# Functions
+# ================================
+def load_user_snapshot(user_id):
+    """
+    Return a snapshot of a user, from cache when possible.
+
+    Lookup order is the local cache, then the shared backend (if configured),
+    then one query on the user table. A Redis outage falls back to the
+    database instead of failing the request.
+
+    Args:
+        user_id (int): User ID
+
+    Returns:
+        UserSnapshot or None: Snapshot, or None if the user does not exist
+    """
+    snapshot = cached_snapshot(user_id)
+    if snapshot is not None:
+        return snapshot
+
+    shared = _shared_backend()
+    if shared is not None:
+        try:
+            cached = shared.get(_shared_key(user_id))
+        except Exception as e:
+            logger.warning(f"Shared user cache unavailable: {str(e)}")
+            cached = None
+        if cached is not None:
+            data = json.loads(cached)
+            snapshot = UserSnapshot(user_id, data['email'], data['is_admin'])
+            _users.set(user_id, snapshot)
+            return snapshot
+
+    from models import User
+    row = db.session.execute(select(User.email, User.is_admin).where(User.id == user_id)).first()
+    if row is None:
+        return None
+    snapshot = UserSnapshot(user_id, row.email, row.is_admin)
+    _users.set(user_id, snapshot)
+    if shared is not None:
+        try:
+            shared.set(_shared_key(user_id), json.dumps({'email': row.email, 'is_admin': row.is_admin}),
+                       ex=_shared_settings['ttl'])
+        except Exception as e:
+            logger.warning(f"Shared user cache unavailable: {str(e)}")
+    return snapshot
+
+def cached_snapshot(user_id):
+    """
+    Return a user's snapshot from the local cache only.
+
+    Args:
+        user_id (int): User ID
+
+    Returns:
+        UserSnapshot or None: Cached snapshot
+    """
+    return _users.get(user_id)
+
+def remember_snapshot(snapshot):
+    """
+    Put a snapshot loaded elsewhere (e.g. by the async read path) in the local cache.
+
+    Args:
+        snapshot (UserSnapshot): Snapshot to cache
+    """
+    _users.set(snapshot.id, snapshot)
+
+def invalidate_user(user_id):
+    """
+    Drop a user's snapshot from the local and shared caches.
+
+    Args:
+        user_id (int): User ID
+    """
+    _users.pop(user_id)
+    shared = _shared_backend()
+    if shared is not None:
+        try:
+            shared.delete(_shared_key(user_id))
+        except Exception as e:
+            logger.warning(f"Could not invalidate shared user cache for user {user_id}: {str(e)}")
+
+# ================================
+# Invalidation hooks
+# ================================
+def _collect_changed_users(session, flush_context, instances):
+    """
+    Before each flush, remember users whose snapshot fields changed or who are deleted.
+    """
+    from models import User
+    pending = session.info.setdefault(PENDING_KEY, set())
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in SNAPSHOT_FIELDS):
+                pending.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            pending.add(obj.id)
+
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop(PENDING_KEY, ()):
+        invalidate_user(user_id)
+
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+
+def init_user_cache(app):
+    """
+    Configure the snapshot caches and register the session hooks that keep
+    them up to date.
+
+    Safe to call once per app; the hooks are only registered once.
+
+    Args:
+        app (Flask): Application
+    """
+    global _shared
+    _users.configure(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+    if app.config['USER_CACHE_REDIS_URL'] != _shared_settings['url']:
+        _shared = None
+    _shared_settings.update(url=app.config['USER_CACHE_REDIS_URL'], ttl=app.config['USER_CACHE_SHARED_TTL'])
+    if event.contains(Session, 'before_flush', _collect_changed_users):
+        return
+    event.listen(Session, 'before_flush', _collect_changed_users)
+    event.listen(Session, 'after_commit', _invalidate_after_commit)
+    event.listen(Session, 'after_soft_rollback', _discard_after_rollback)
@@ -1,12 +1,15 @@
 """
 utils.py - Encryption utilities
 
-Provides functions to encrypt and decrypt API keys using Fernet symmetric encryption.
+Provides functions to encrypt and decrypt API keys using Fernet symmetric encryption,
+one value at a time or in batches spread over a bounded thread pool, and the
+AES-GCM primitives used for per-user envelope encryption (see encryption_service.py).
 
 Dependencies:
 - cryptography
 - os
 - logging
+- concurrent.futures
 
 @author KeyGuardian Team
 """
@@ -16,29 +19,178 @@ Dependencies:
 # ================================
 import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # ================================
 # Third-party imports
 # ================================
-from cryptography.fernet import Fernet, InvalidToken
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
 # ================================
-# Logging configuration
+# Project imports
 # ================================
-logging.basicConfig(level=logging.DEBUG)
+from instrumentation import timed
+
+logger = logging.getLogger(__name__)
 
 # ================================
 # Encryption setup
 # ================================
-ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY')
-if not ENCRYPTION_KEY:
-    raise ValueError("ENCRYPTION_KEY environment variable is not set")
+# The master keys are read on first use rather than at import, so modules
+# that never encrypt (CLI commands, tooling) work without ENCRYPTION_KEY.
+_fernet = None
+_fernet_lock = threading.Lock()
+
+# Sealed (AES-GCM) values are stored as: version byte | 12-byte nonce | ciphertext+tag
+SEALED_VERSION = b'\x01'
+NONCE_SIZE = 12
+
+# ================================
+# Batch setup
+# ================================
+# Defaults outside an app; create_app applies CRYPTO_MAX_WORKERS and
+# CRYPTO_BATCH_THRESHOLD from its config through configure_crypto_pool.
+CRYPTO_MAX_WORKERS = min(8, os.cpu_count() or 1)
+CRYPTO_BATCH_THRESHOLD = 64
 
-fernet = Fernet(ENCRYPTION_KEY)
+_executor = None
+_executor_lock = threading.Lock()
 
 # ================================
 # Functions
 # ================================
+def master_keys():
+    """
+    Return the configured master keys, current key first.
+
+    Retired keys from ENCRYPTION_KEY_PREVIOUS stay readable during a rotation
+    (see key_rotation.py); new values are always encrypted with ENCRYPTION_KEY.
+
+    Returns:
+        list: ENCRYPTION_KEY followed by the keys in ENCRYPTION_KEY_PREVIOUS
+
+    Raises:
+        ValueError: If ENCRYPTION_KEY is not set
+    """
+    current = os.environ.get('ENCRYPTION_KEY')
+    if not current:
+        raise ValueError("ENCRYPTION_KEY environment variable is not set")
+    previous = [key.strip() for key in os.environ.get('ENCRYPTION_KEY_PREVIOUS', '').split(',') if key.strip()]
+    return [current] + previous
+
+def get_fernet():
+    """
+    Return the master-key MultiFernet, creating it on first use.
+
+    Returns:
+        MultiFernet: Encrypts with ENCRYPTION_KEY, decrypts with any master key
+
+    Raises:
+        ValueError: If ENCRYPTION_KEY is not set
+    """
+    global _fernet
+    if _fernet is None:
+        with _fernet_lock:
+            if _fernet is None:
+                _fernet = MultiFernet([Fernet(key) for key in master_keys()])
+    return _fernet
+
+def _encrypt_value(api_key):
+    """
+    Encrypt one value without recording crypto timing.
+    """
+    return get_fernet().encrypt(api_key.encode()).decode()
+
+def _decrypt_value(encrypted_key):
+    """
+    Decrypt one value without recording crypto timing.
+    """
+    try:
+        if isinstance(encrypted_key, str):
+            encrypted_key = encrypted_key.encode()
+        elif isinstance(encrypted_key, memoryview):
+            encrypted_key = encrypted_key.tobytes()
+        return get_fernet().decrypt(encrypted_key).decode()
+    except InvalidToken:
+        logger.error('Invalid token error: value could not be decrypted with any master key')
+        raise
+    except Exception as e:
+        logger.error('Decryption error: %s', e)
+        raise
+
+def get_crypto_executor():
+    """
+    Return the shared crypto thread pool, creating it on first use.
+
+    Returns:
+        ThreadPoolExecutor: Pool bounded to CRYPTO_MAX_WORKERS threads
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=CRYPTO_MAX_WORKERS, thread_name_prefix='crypto')
+    return _executor
+
+def configure_crypto_pool(max_workers, batch_threshold):
+    """
+    Set the crypto pool size and the batch size from which it is used.
+
+    A pool already started with a different size is shut down and recreated
+    on next use.
+
+    Args:
+        max_workers (int): Threads in the crypto pool
+        batch_threshold (int): Smallest batch run on the pool
+    """
+    global CRYPTO_MAX_WORKERS, CRYPTO_BATCH_THRESHOLD, _executor
+    with _executor_lock:
+        if _executor is not None and max_workers != CRYPTO_MAX_WORKERS:
+            _executor.shutdown(wait=False)
+            _executor = None
+        CRYPTO_MAX_WORKERS = max_workers
+        CRYPTO_BATCH_THRESHOLD = batch_threshold
+
+def map_batch(func, values, return_exceptions):
+    """
+    Apply `func` to every value, on the crypto pool for large batches.
+
+    Batches are split into one contiguous slice per worker so that the
+    per-task overhead is paid once per slice rather than once per value.
+
+    Args:
+        func (callable): Function applied to each value
+        values (iterable): Input values
+        return_exceptions (bool): Return exceptions in place of results instead of raising
+
+    Returns:
+        list: Results in input order
+    """
+    values = list(values)
+
+    def run(chunk):
+        results = []
+        for value in chunk:
+            try:
+                results.append(func(value))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    if len(values) < CRYPTO_BATCH_THRESHOLD or CRYPTO_MAX_WORKERS <= 1:
+        return run(values)
+
+    chunk_size = -(-len(values) // CRYPTO_MAX_WORKERS)
+    chunks = [values[i:i + chunk_size] for i in range(0, len(values), chunk_size)]
+    results = []
+    for chunk_results in get_crypto_executor().map(run, chunks):
+        results.extend(chunk_results)
+    return results
+
 def encrypt_key(api_key):
     """
     Encrypt an API key string.
@@ -49,7 +201,8 @@ def encrypt_key(api_key):
     Returns:
         str: Encrypted API key (base64 encoded)
     """
-    return fernet.encrypt(api_key.encode()).decode()
+    with timed('crypto'):
+        return _encrypt_value(api_key)
 
 def decrypt_key(encrypted_key):
     """
@@ -65,19 +218,128 @@ def decrypt_key(encrypted_key):
         InvalidToken: If the token is invalid or corrupted
         Exception: For other decryption errors
     """
-    try:
-        if isinstance(encrypted_key, str):
-            encrypted_key = encrypted_key.encode()
-        elif isinstance(encrypted_key, memoryview):
-            encrypted_key = encrypted_key.tobytes()
-        logging.debug(f'Encrypted key type: {type(encrypted_key)}')
-        logging.debug(f'Encrypted key: {encrypted_key}')
-        decrypted_key = fernet.decrypt(encrypted_key)
-        logging.debug(f'Decrypted key type: {type(decrypted_key)}')
-        return decrypted_key.decode()
-    except InvalidToken as e:
-        logging.error(f'Invalid token error: {str(e)}')
-        raise
-    except Exception as e:
-        logging.error(f'Decryption error: {str(e)}')
-        raise
+    with timed('crypto'):
+        return _decrypt_value(encrypted_key)
+
+def encrypt_many(api_keys, return_exceptions=False):
+    """
+    Encrypt a batch of API key strings.
+
+    Batches of CRYPTO_BATCH_THRESHOLD values or more run on a thread pool
+    bounded to CRYPTO_MAX_WORKERS threads.
+
+    Args:
+        api_keys (iterable): Plaintext API keys
+        return_exceptions (bool): Put exceptions in the result list instead of raising
+
+    Returns:
+        list: Encrypted API keys (base64 encoded), in input order
+    """
+    with timed('crypto'):
+        return map_batch(_encrypt_value, api_keys, return_exceptions)
+
+def decrypt_many(encrypted_keys, return_exceptions=False):
+    """
+    Decrypt a batch of encrypted API keys.
+
+    Args:
+        encrypted_keys (iterable): Encrypted API keys (str, bytes or memoryview)
+        return_exceptions (bool): Put exceptions (e.g. InvalidToken) in the result
+            list instead of raising on the first failure
+
+    Returns:
+        list: Decrypted plaintext API keys or exceptions, in input order
+
+    Raises:
+        InvalidToken: If a token is invalid and return_exceptions is False
+    """
+    with timed('crypto'):
+        return map_batch(_decrypt_value, encrypted_keys, return_exceptions)
+
+def generate_data_key():
+    """
+    Generate a random 256-bit AES-GCM data key.
+
+    Returns:
+        bytes: Raw data key
+    """
+    return AESGCM.generate_key(bit_length=256)
+
+def wrap_data_key(data_key):
+    """
+    Encrypt a data key under the master key for storage.
+
+    Args:
+        data_key (bytes): Raw data key
+
+    Returns:
+        str: Wrapped data key (Fernet token)
+    """
+    return get_fernet().encrypt(data_key).decode()
+
+def unwrap_data_key(wrapped_key):
+    """
+    Decrypt a stored data key with the master key.
+
+    Args:
+        wrapped_key (str): Wrapped data key
+
+    Returns:
+        bytes: Raw data key
+
+    Raises:
+        InvalidToken: If the wrapped key was not produced by the master key
+    """
+    return get_fernet().decrypt(wrapped_key.encode())
+
+def seal(cipher, plaintext, associated_data):
+    """
+    Encrypt a value with AES-GCM into the compact binary storage format.
+
+    Args:
+        cipher (AESGCM): Cipher for the owner's data key
+        plaintext (str): Plaintext API key
+        associated_data (bytes): Authenticated context the value is bound to
+
+    Returns:
+        bytes: Version byte, nonce and ciphertext with tag
+    """
+    nonce = os.urandom(NONCE_SIZE)
+    return SEALED_VERSION + nonce + cipher.encrypt(nonce, plaintext.encode(), associated_data)
+
+def unseal(cipher, sealed, associated_data):
+    """
+    Decrypt a value produced by `seal`.
+
+    Args:
+        cipher (AESGCM): Cipher for the owner's data key
+        sealed (bytes or memoryview): Stored binary value
+        associated_data (bytes): Context the value was bound to when sealed
+
+    Returns:
+        str: Decrypted plaintext API key
+
+    Raises:
+        ValueError: If the storage format version is unknown
+        InvalidTag: If the value was tampered with or belongs to another context
+    """
+    sealed = bytes(sealed)
+    if sealed[:1] != SEALED_VERSION:
+        raise ValueError(f'Unknown sealed value version: {sealed[:1]!r}')
+    nonce = sealed[1:1 + NONCE_SIZE]
+    return cipher.decrypt(nonce, sealed[1 + NONCE_SIZE:], associated_data).decode()
+
+def rotate_token(token):
+    """
+    Re-encrypt a Fernet token under the current master key.
+
+    Args:
+        token (str): Token encrypted with the current or a previous master key
+
+    Returns:
+        str: Token encrypted with ENCRYPTION_KEY
+
+    Raises:
+        InvalidToken: If no configured master key can decrypt the token
+    """
+    return get_fernet().rotate(token.encode()).decode()
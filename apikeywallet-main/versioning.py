@@ -0,0 +1,101 @@
+"""
+versioning.py - Per-user data versions
+
+Every user row carries a `data_version` counter that is incremented in the
+same transaction as any change to that user's keys or categories. Readers
+can compare a single integer to tell whether anything changed, e.g. to
+build ETags for the JSON API without loading any key or category rows.
+
+Each bump is also recorded on the session until the transaction ends, so
+commit hooks can tell which versions it moved between: revisions.py stamps
+changed rows with the new version, and search_index.py updates its index.
+
+Dependencies:
+- SQLAlchemy
+- models.py
+- app.py
+
+@author KeyGuardian Team
+"""
+
+# ================================
+# Third-party imports
+# ================================
+from sqlalchemy import select, update
+
+# ================================
+# Project imports
+# ================================
+from app import db
+from models import User
+
+BUMPS_KEY = 'data_version_bumps'
+
+# ================================
+# Functions
+# ================================
+def bump_data_version(user_id):
+    """
+    Increment a user's data version inside the current transaction.
+
+    Call this before committing any change to the user's keys or categories.
+    The increment is a single atomic UPDATE, so concurrent writers never
+    lose a bump.
+
+    Args:
+        user_id (int): Owner's user ID
+
+    Returns:
+        int or None: The new data version, or None if the database cannot return it
+    """
+    statement = update(User).where(User.id == user_id).values(data_version=User.data_version + 1)
+    version = None
+    if db.engine.dialect.update_returning:
+        version = db.session.execute(statement.returning(User.data_version)).scalar()
+    else:
+        db.session.execute(statement)
+    bumps = db.session.info.setdefault(BUMPS_KEY, {})
+    if version is None or (user_id in bumps and bumps[user_id] is None):
+        bumps[user_id] = None
+    else:
+        before = bumps[user_id][0] if user_id in bumps else version - 1
+        bumps[user_id] = (before, version)
+    return version
+
+def version_bumps(session):
+    """
+    Return the data versions bumped so far in the session's transaction.
+
+    Args:
+        session (Session): Session
+
+    Returns:
+        dict: User ID to (version before, version after), or to None if the
+        database could not return the new version
+    """
+    return session.info.get(BUMPS_KEY, {})
+
+def take_version_bumps(session):
+    """
+    Return and forget the data versions bumped in the session's transaction.
+
+    Args:
+        session (Session): Session whose transaction ended
+
+    Returns:
+        dict: User ID to (version before, version after), or to None if the
+        database could not return the new version
+    """
+    return session.info.pop(BUMPS_KEY, {})
+
+def get_data_version(user_id):
+    """
+    Return a user's current data version with a single scalar query.
+
+    Args:
+        user_id (int): Owner's user ID
+
+    Returns:
+        int or None: Data version, or None if the user does not exist
+    """
+    return db.session.execute(select(User.data_version).where(User.id == user_id)).scalar()
@@ -2,7 +2,8 @@
 wallet_routes.py - Wallet and API key management routes
 
 Contains routes for viewing wallet, adding, copying, deleting, editing API keys,
-and fetching categories and keys.
+bulk moving, deleting and renaming keys, fetching categories and keys,
+searching, delta sync, bulk import and export, and backups.
 
 Dependencies:
 - Flask
@@ -10,7 +11,13 @@ Dependencies:
 - SQLAlchemy
 - models.py
 - forms.py
-- utils.py
+- encryption_service.py
+- queries.py
+- search_index.py
+- importer.py
+- backup.py
+- versioning.py
+- revisions.py
 - app.py
 
 @author KeyGuardian Team
@@ -19,13 +26,20 @@ Dependencies:
 # ================================
 # Standard library imports
 # ================================
+import io
+import json
 import traceback
+from datetime import datetime
 
 # ================================
 # Third-party imports
 # ================================
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, current_app
+from flask import Blueprint, Response, render_template, redirect, url_for, request, flash, jsonify, current_app, stream_with_context
 from flask_login import login_required, current_user
+from itsdangerous import BadSignature
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
+from sqlalchemy import case, delete, func, select, update
 from sqlalchemy.exc import SQLAlchemyError
 
 # ================================
@@ -34,13 +48,80 @@ from sqlalchemy.exc import SQLAlchemyError
 from models import APIKey, Category
 from forms import AddAPIKeyForm
 from app import db
-from utils import encrypt_key, decrypt_key
+from encryption_service import encrypt_for_user, reveal, reveal_many
+from queries import wallet_keys_query, group_keys_by_category, keys_page, cursor_serializer
+from search_index import TRACKED_OPTION, record_changes, search
+from importer import FORMATS, PARSERS, detect_format, import_keys
+from backup import iter_backup
+from versioning import bump_data_version, get_data_version
+from revisions import changes_since, record_deletions
 
 # ================================
 # Blueprint setup
 # ================================
 main = Blueprint('main', __name__)
 
+BULK_ACTIONS = ('move', 'delete', 'rename')
+
+# ================================
+# Helpers
+# ================================
+def _is_id_list(values):
+    """
+    Return True if `values` is a non-empty list of integer IDs.
+
+    JSON true/false arrive as Python bools, which are ints (and match IDs 1
+    and 0 in SQL), so they are rejected explicitly.
+    """
+    return isinstance(values, list) and bool(values) and all(type(value) is int for value in values)
+
+def _stream_export(user_id, batch_size):
+    """
+    Generate a user's category and key metadata as JSON text, batch by batch.
+
+    Rows are read through a server-side cursor (`yield_per`) and each batch is
+    serialized and yielded before the next one is fetched, so memory use is
+    bounded by the batch size rather than by the number of keys.
+
+    Args:
+        user_id (int): Owner's user ID
+        batch_size (int): Rows fetched and written per chunk
+
+    Yields:
+        str: Chunks of the JSON document
+    """
+    categories = (
+        select(Category.id, Category.name)
+        .where(Category.user_id == user_id)
+        .order_by(Category.name, Category.id)
+        .execution_options(yield_per=batch_size)
+    )
+    keys = (
+        select(APIKey.id, APIKey.key_name, APIKey.category_id, Category.name.label('category_name'), APIKey.date_added)
+        .outerjoin(Category, Category.id == APIKey.category_id)
+        .where(APIKey.user_id == user_id)
+        .order_by(APIKey.category_id, func.lower(APIKey.key_name), APIKey.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    yield '{"categories": ['
+    separator = ''
+    for partition in db.session.execute(categories).partitions():
+        yield separator + ', '.join(json.dumps({'id': row.id, 'name': row.name}) for row in partition)
+        separator = ', '
+    yield '], "keys": ['
+    separator = ''
+    for partition in db.session.execute(keys).partitions():
+        yield separator + ', '.join(json.dumps({
+            'id': row.id,
+            'key_name': row.key_name,
+            'category_id': row.category_id,
+            'category_name': row.category_name or 'Uncategorized',
+            'date_added': row.date_added.isoformat()
+        }) for row in partition)
+        separator = ', '
+    yield ']}'
+
 # ================================
 # Routes
 # ================================
@@ -68,33 +149,14 @@ def wallet(category_id=None):
         Rendered wallet template
     """
     try:
-        current_app.logger.info(f"Fetching API keys for user {current_user.id}")
+        current_app.logger.info("Fetching API keys for user %s", current_user.id)
+        # Read before the rows, so the page's first /changes call can only repeat changes
+        revision = get_data_version(current_user.id)
         categories = Category.query.filter_by(user_id=current_user.id).order_by(Category.name).all()
+        api_keys = wallet_keys_query(current_user.id, category_id).all()
+        display_grouped_keys = group_keys_by_category(api_keys)
 
-        if category_id == 0:
-            api_keys = APIKey.query.filter_by(user_id=current_user.id, category_id=None).all()
-        elif category_id:
-            api_keys = APIKey.query.filter_by(user_id=current_user.id, category_id=category_id).all()
-        else:
-            api_keys = APIKey.query.filter_by(user_id=current_user.id).all()
-
-        api_keys = sorted(api_keys, key=lambda x: x.key_name.lower())
-
-        grouped_keys = {category.name: [] for category in categories}
-        grouped_keys['Uncategorized'] = []
-
-        for key in api_keys:
-            if key.category:
-                grouped_keys[key.category.name].append(key)
-            else:
-                grouped_keys['Uncategorized'].append(key)
-
-        for category in grouped_keys:
-            grouped_keys[category] = sorted(grouped_keys[category], key=lambda x: x.key_name.lower())
-
-        display_grouped_keys = {k: v for k, v in grouped_keys.items() if v}
-
-        return render_template('wallet.html', grouped_keys=display_grouped_keys, all_categories=categories, current_category_id=category_id, debug=current_app.debug, show_add_key_button=True)
+        return render_template('wallet.html', grouped_keys=display_grouped_keys, all_categories=categories, current_category_id=category_id, revision=revision, debug=current_app.debug, show_add_key_button=True)
     except Exception as e:
         current_app.logger.error(f"Error in wallet route: {str(e)}")
         current_app.logger.error(traceback.format_exc())
@@ -119,16 +181,15 @@ def add_key():
 
     if form.validate_on_submit():
         try:
-            encrypted_key = encrypt_key(form.api_key.data)
+            ciphertext = encrypt_for_user(current_user.id, form.api_key.data)
             new_key = APIKey(
                 user_id=current_user.id,
                 key_name=form.key_name.data,
-                encrypted_key=encrypted_key,
+                ciphertext=ciphertext,
                 category_id=form.category.data if form.category.data != 0 else None
             )
             db.session.add(new_key)
-            db.session.commit()
-
+            bump_data_version(current_user.id)
             db.session.commit()
             flash('API Key added successfully.', 'success')
             return redirect(url_for('main.wallet'))
@@ -162,7 +223,7 @@ def copy_key(key_id):
         api_key = APIKey.query.filter_by(id=key_id, user_id=current_user.id).first()
         if not api_key:
             return jsonify({'error': 'API key not found or unauthorized'}), 403
-        decrypted_key = decrypt_key(api_key.encrypted_key)
+        decrypted_key = reveal(api_key)
         return jsonify({'key': decrypted_key})
     except Exception as e:
         current_app.logger.error(f'Error in copy_key route: {str(e)}')
@@ -185,6 +246,7 @@ def delete_key(key_id):
         api_key = APIKey.query.filter_by(id=key_id, user_id=current_user.id).first()
         if api_key:
             db.session.delete(api_key)
+            bump_data_version(current_user.id)
             db.session.commit()
             return jsonify({'success': True, 'message': 'API Key deleted successfully.'}), 200
         else:
@@ -212,6 +274,7 @@ def edit_key(key_id):
             new_name = request.json.get('key_name')
             if new_name:
                 api_key.key_name = new_name
+                bump_data_version(current_user.id)
                 db.session.commit()
                 return jsonify({'success': True, 'message': 'API Key name updated successfully.', 'new_name': new_name}), 200
             else:
@@ -238,7 +301,7 @@ def get_key(key_id):
     try:
         api_key = APIKey.query.filter_by(id=key_id, user_id=current_user.id).first()
         if api_key:
-            decrypted_key = decrypt_key(api_key.encrypted_key)
+            decrypted_key = reveal(api_key)
             return jsonify({'key': decrypted_key}), 200
         else:
             return jsonify({'error': 'API Key not found or unauthorized.'}), 404
@@ -246,6 +309,156 @@ def get_key(key_id):
         current_app.logger.error(f'Error in get_key route: {str(e)}')
         return jsonify({'error': 'An error occurred while retrieving the API key.'}), 500
 
+@main.route('/get_keys', methods=['POST'])
+@login_required
+def get_keys():
+    """
+    Decrypt and return several API keys in one request.
+
+    Expects JSON: {"key_ids": [1, 2, 3]}. Ownership is checked for all IDs in
+    a single query and the values are decrypted as one batch.
+
+    Returns:
+        JSON response with decrypted keys, per-ID errors and IDs not found
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    key_ids = data.get('key_ids')
+    if not _is_id_list(key_ids):
+        return jsonify({'error': 'key_ids must be a non-empty list of integers.'}), 400
+    if len(key_ids) > current_app.config['REVEAL_BATCH_MAX']:
+        return jsonify({'error': f"At most {current_app.config['REVEAL_BATCH_MAX']} keys can be requested at once."}), 400
+
+    try:
+        rows = db.session.execute(
+            select(APIKey.id, APIKey.ciphertext, APIKey.encrypted_key)
+            .where(APIKey.user_id == current_user.id, APIKey.id.in_(set(key_ids)))
+        ).all()
+        results = reveal_many(current_user.id, rows)
+
+        keys, errors = {}, {}
+        for row, result in zip(rows, results):
+            if isinstance(result, (InvalidToken, InvalidTag)):
+                errors[str(row.id)] = 'Stored key could not be decrypted.'
+            elif isinstance(result, Exception):
+                errors[str(row.id)] = 'An error occurred while decrypting the key.'
+            else:
+                keys[str(row.id)] = result
+        found = {row.id for row in rows}
+        not_found = [key_id for key_id in dict.fromkeys(key_ids) if key_id not in found]
+
+        return jsonify({'keys': keys, 'errors': errors, 'not_found': not_found}), 200
+    except Exception as e:
+        current_app.logger.error(f'Error in get_keys route: {str(e)}')
+        return jsonify({'error': 'An error occurred while retrieving the API keys.'}), 500
+
+@main.route('/bulk_keys', methods=['POST'])
+@login_required
+def bulk_keys():
+    """
+    Move, delete or rename several API keys in one request.
+
+    Expects JSON with an `action` and `key_ids`:
+        {"action": "move", "key_ids": [1, 2], "category_id": 3}   (0 or null for uncategorized)
+        {"action": "delete", "key_ids": [1, 2]}
+        {"action": "rename", "names": {"1": "New name", "2": "Other name"}}
+
+    Ownership is checked for all IDs in a single query, and the change is
+    one set-based UPDATE or DELETE, committed as a single transaction.
+
+    Returns:
+        JSON response with a result per requested key ID
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Expected a JSON object.'}), 400
+    action = data.get('action')
+    if action not in BULK_ACTIONS:
+        return jsonify({'success': False, 'error': f"action must be one of: {', '.join(BULK_ACTIONS)}."}), 400
+
+    names = {}
+    if action == 'rename':
+        raw_names = data.get('names')
+        if not isinstance(raw_names, dict) or not raw_names:
+            return jsonify({'success': False, 'error': 'names must be a non-empty object of key ID to new name.'}), 400
+        try:
+            names = {int(key_id): name for key_id, name in raw_names.items()}
+        except ValueError:
+            return jsonify({'success': False, 'error': 'names must be keyed by key ID.'}), 400
+        key_ids = list(names)
+    else:
+        key_ids = data.get('key_ids')
+        if not _is_id_list(key_ids):
+            return jsonify({'success': False, 'error': 'key_ids must be a non-empty list of integers.'}), 400
+        key_ids = list(dict.fromkeys(key_ids))
+    if len(key_ids) > current_app.config['BULK_KEYS_MAX']:
+        return jsonify({'success': False, 'error': f"At most {current_app.config['BULK_KEYS_MAX']} keys can be changed at once."}), 400
+
+    category_id = None
+    if action == 'move':
+        category_id = data.get('category_id')
+        if category_id is not None and type(category_id) is not int:
+            return jsonify({'success': False, 'error': 'category_id must be an integer, or 0 or null for uncategorized.'}), 400
+        category_id = category_id or None
+
+    try:
+        if category_id is not None:
+            owned_category = db.session.execute(
+                select(Category.id).where(Category.id == category_id, Category.user_id == current_user.id)
+            ).scalar()
+            if owned_category is None:
+                return jsonify({'success': False, 'error': 'Category not found.'}), 404
+
+        owned = {row.id: row for row in db.session.execute(
+            select(APIKey.id, APIKey.key_name, APIKey.category_id)
+            .where(APIKey.user_id == current_user.id, APIKey.id.in_(key_ids))
+        )}
+
+        results = {}
+        targets = []
+        for key_id in key_ids:
+            if key_id not in owned:
+                results[str(key_id)] = {'success': False, 'error': 'API Key not found or unauthorized.'}
+            elif action == 'rename' and (not isinstance(names[key_id], str) or not names[key_id].strip()
+                                         or len(names[key_id].strip()) > 120):
+                results[str(key_id)] = {'success': False, 'error': 'Key name must be 1 to 120 characters.'}
+            else:
+                results[str(key_id)] = {'success': True}
+                targets.append(key_id)
+
+        if targets:
+            # The search index is updated from record_changes() rather than dropped
+            scope = (APIKey.user_id == current_user.id, APIKey.id.in_(targets))
+            options = {'synchronize_session': False, TRACKED_OPTION: True}
+            if action == 'move':
+                db.session.execute(
+                    update(APIKey).where(*scope).values(category_id=category_id, revision=None)
+                    .execution_options(**options)
+                )
+                changes = [('key', key_id, owned[key_id].key_name, category_id) for key_id in targets]
+            elif action == 'delete':
+                db.session.execute(delete(APIKey).where(*scope).execution_options(**options))
+                record_deletions(current_user.id, 'key', targets)
+                changes = [('key_deleted', key_id, None, None) for key_id in targets]
+            else:
+                new_names = {key_id: names[key_id].strip() for key_id in targets}
+                db.session.execute(
+                    update(APIKey).where(*scope)
+                    .values(key_name=case(new_names, value=APIKey.id), revision=None)
+                    .execution_options(**options)
+                )
+                changes = [('key', key_id, new_names[key_id], owned[key_id].category_id) for key_id in targets]
+            record_changes(current_user.id, changes)
+            bump_data_version(current_user.id)
+            db.session.commit()
+
+        return jsonify({'success': bool(targets), 'action': action, 'results': results}), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.error(f'Database error in bulk_keys route: {str(e)}')
+        return jsonify({'success': False, 'error': 'An error occurred while updating the API keys.'}), 500
+
 @main.route('/get_categories_and_keys')
 @login_required
 def get_categories_and_keys():
@@ -285,3 +498,172 @@ def get_categories_and_keys():
     except Exception as e:
         current_app.logger.error(f"Error in get_categories_and_keys route: {str(e)}")
         return jsonify({'error': 'An error occurred while fetching categories and keys.'}), 500
+
+@main.route('/get_keys_page')
+@login_required
+def get_keys_page():
+    """
+    Fetch one page of the user's API keys using keyset pagination.
+
+    Query parameters:
+        limit (int, optional): Page size, capped at KEYS_PAGE_SIZE_MAX
+        category_id (int, optional): Filter by category; 0 selects uncategorized keys
+        cursor (str, optional): Opaque `next_cursor` from the previous page
+
+    Returns:
+        JSON response with a page of keys and the cursor for the next page
+    """
+    try:
+        limit = request.args.get('limit', current_app.config['KEYS_PAGE_SIZE'], type=int)
+        limit = max(1, min(limit, current_app.config['KEYS_PAGE_SIZE_MAX']))
+        category_id = request.args.get('category_id', type=int)
+
+        after = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                after = tuple(cursor_serializer().loads(cursor))
+            except (BadSignature, TypeError, ValueError):
+                return jsonify({'error': 'Invalid cursor.'}), 400
+
+        rows, last = keys_page(current_user.id, limit, after=after, category_id=category_id)
+        return jsonify({
+            'keys': [{
+                'id': row.id,
+                'key_name': row.key_name,
+                'category_id': row.category_id,
+                'category_name': row.category_name or 'Uncategorized',
+                'date_added': row.date_added.isoformat()
+            } for row in rows],
+            'next_cursor': cursor_serializer().dumps(list(last)) if last else None
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in get_keys_page route: {str(e)}")
+        return jsonify({'error': 'An error occurred while fetching keys.'}), 500
+
+@main.route('/search')
+@login_required
+def search_keys():
+    """
+    Type-ahead search over the user's key and category names.
+
+    Query parameters:
+        q (str): Search text; every word must appear in a matching name
+        limit (int, optional): Maximum results, capped at SEARCH_RESULTS_LIMIT_MAX
+
+    Returns:
+        JSON response with ranked results and whether the index or the database answered
+    """
+    query = request.args.get('q', '').strip()
+    if len(query) > current_app.config['SEARCH_QUERY_MAX_LENGTH']:
+        return jsonify({'error': 'Search text is too long.'}), 400
+    if not query:
+        return jsonify({'query': query, 'results': []}), 200
+    try:
+        limit = request.args.get('limit', current_app.config['SEARCH_RESULTS_LIMIT'], type=int)
+        limit = max(1, min(limit, current_app.config['SEARCH_RESULTS_LIMIT_MAX']))
+        results, source = search(current_user.id, query, limit)
+        return jsonify({'query': query, 'results': results, 'source': source}), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in search route: {str(e)}")
+        return jsonify({'error': 'An error occurred while searching.'}), 500
+
+@main.route('/changes')
+@login_required
+def changes():
+    """
+    Fetch the keys and categories created, updated or deleted since a revision.
+
+    Query parameters:
+        since (int, optional): `revision` returned by the previous sync; omit for a full snapshot
+
+    Returns:
+        JSON response with the current revision, changed rows and deleted IDs
+    """
+    try:
+        since = int(request.args.get('since', '0'))
+    except ValueError:
+        since = -1
+    if since < 0:
+        return jsonify({'error': 'since must be a non-negative integer.'}), 400
+    try:
+        return jsonify(changes_since(current_user.id, since)), 200
+    except Exception as e:
+        current_app.logger.error(f"Error in changes route: {str(e)}")
+        return jsonify({'error': 'An error occurred while fetching changes.'}), 500
+
+@main.route('/export_keys')
+@login_required
+def export_keys():
+    """
+    Stream all of the user's category and key metadata as one JSON document.
+
+    Unlike /get_categories_and_keys, the response is written incrementally,
+    so worker memory stays flat regardless of how many keys the user has.
+
+    Returns:
+        Streaming JSON response
+    """
+    generator = _stream_export(current_user.id, current_app.config['EXPORT_BATCH_SIZE'])
+    return Response(
+        stream_with_context(generator),
+        mimetype='application/json',
+        headers={'Content-Disposition': 'attachment; filename=keyguardian-keys.json'}
+    )
+
+@main.route('/backup')
+@login_required
+def backup():
+    """
+    Stream an encrypted backup archive of the user's categories and keys.
+
+    The archive is generated chunk by chunk (see backup.py), so memory use
+    does not depend on the number of keys.
+
+    Returns:
+        Streaming tar response
+    """
+    generator = iter_backup(current_user.id, current_app.config['BACKUP_CHUNK_ROWS'])
+    filename = f"keyguardian-backup-{datetime.utcnow():%Y%m%d}.tar"
+    return Response(
+        stream_with_context(generator),
+        mimetype='application/x-tar',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@main.route('/import_keys', methods=['POST'])
+@login_required
+def import_keys_upload():
+    """
+    Bulk import API keys from an uploaded JSON, CSV or .env file.
+
+    Expects multipart form data with a `file` field, an optional `format`
+    (json, csv or env; guessed from the file name if omitted) and an optional
+    `category` applied to rows without one. The upload is parsed as a stream
+    and loaded in chunked transactions (see importer.py).
+
+    Returns:
+        JSON report with created/failed counts and a per-row status list
+    """
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'No file uploaded.'}), 400
+    file_format = request.form.get('format') or detect_format(upload.filename)
+    if file_format not in FORMATS:
+        return jsonify({'error': f"Unknown import format; use one of: {', '.join(FORMATS)}."}), 400
+
+    try:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        report = import_keys(
+            current_user.id,
+            PARSERS[file_format](stream),
+            chunk_size=current_app.config['IMPORT_CHUNK_SIZE'],
+            default_category=request.form.get('category') or None
+        )
+        current_app.logger.info("User %s imported %s keys (%s failed)", current_user.id, report['created'], report['failed'])
+        return jsonify(report), 200 if report['created'] or not report['failed'] else 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error in import_keys route: {str(e)}")
+        current_app.logger.error(traceback.format_exc())
+        return jsonify({'error': 'An error occurred while importing keys.'}), 500